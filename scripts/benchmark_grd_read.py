@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark the click latency of raster time series reads against the number of reader threads.
+
+The script:
+- writes a synthetic stack of single-band compressed rasters (one file per date) to a temporary directory,
+- reads single pixels and 128x128 tiles at random positions with 1, 2, 4 and 8 threads,
+- prints the median latency per read.
+
+Usage:
+    python scripts/benchmark_grd_read.py [--bands 200] [--size 2000] [--reads 20]
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from osgeo import gdal
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.parallel_reader import ParallelStackReader  # noqa: E402
+
+
+def write_stack(directory: Path, bands: int, size: int) -> list:
+    """Write a synthetic stack with one DEFLATE compressed GeoTIFF per date."""
+    driver = gdal.GetDriverByName("GTiff")
+    rng = np.random.default_rng(0)
+    file_paths = []
+    for i in range(bands):
+        file_path = str(directory / f"2020{i:04d}_disp.tif")
+        dataset = driver.Create(file_path, size, size, 1, gdal.GDT_Float32,
+                                options=["COMPRESS=DEFLATE", "TILED=YES"])
+        dataset.SetGeoTransform((0, 1, 0, 0, 0, -1))
+        dataset.GetRasterBand(1).WriteArray(rng.normal(size=(size, size)).astype(np.float32))
+        dataset = None
+        file_paths.append(file_path)
+    return file_paths
+
+
+def time_reads(reader: ParallelStackReader, positions, window: int) -> float:
+    """Return the median latency in milliseconds of reading a window at each position."""
+    latencies = []
+    for px, py in positions:
+        start = time.perf_counter()
+        reader.readWindow(px, py, window, window)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bands", type=int, default=200)
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"Writing synthetic stack: {args.bands} bands of {args.size}x{args.size} pixels")
+        file_paths = write_stack(Path(tmp_dir), args.bands, args.size)
+
+        rng = np.random.default_rng(1)
+        pixel_positions = rng.integers(0, args.size - 1, size=(args.reads, 2))
+        tile_positions = rng.integers(0, args.size - 128, size=(args.reads, 2))
+
+        print(f"{'workers':>8} {'pixel [ms]':>12} {'tile 128x128 [ms]':>18}")
+        for workers in (1, 2, 4, 8):
+            reader = ParallelStackReader(file_paths, workers=workers)
+            reader.readPixel(0, 0)  # open the files before timing
+            pixel_ms = time_reads(reader, pixel_positions, 1)
+            tile_ms = time_reads(reader, tile_positions, 128)
+            reader.close()
+            print(f"{workers:>8} {pixel_ms:>12.2f} {tile_ms:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
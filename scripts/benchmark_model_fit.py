@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark the model fit of one clicked time series.
+
+The script:
+- generates a time series with a trend, an annual signal and noise, like a clicked persistent scatterer,
+- fits it with the closed-form least squares of FittingModels and with the former scipy curve_fit path, which
+  fitted the polynomial first and the annual terms to its residuals,
+- prints the median time per fit and the largest difference of the fitted values without annual terms.
+
+Usage:
+    python scripts/benchmark_model_fit.py [--dates 200] [--repeat 50]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.model_fitting import (  # noqa: E402
+    FittingModels, modelAnnual, modelPoly1, modelPoly2, modelPoly3, normalize, ordinalTodates,
+)
+
+
+def curve_fit_path(fitting, model, seasonal):
+    """Former implementation of FittingModels.fit for the polynomial models."""
+    from scipy.optimize import curve_fit
+
+    mask = fitting.mask
+    x = fitting.ordinal_dates
+    x_norm = normalize(x, ref=x[mask])
+    y = fitting.y
+    popt, pcov = curve_fit(model, x_norm[mask], y[mask])
+    model_x_linspace = np.linspace(min(x), max(x), 100)
+    model_x = ordinalTodates(model_x_linspace)
+    model_y = model(normalize(model_x_linspace, ref=x[mask]), *popt)
+    fit_y = model(x_norm, *popt)
+    if seasonal:
+        popt_seasonal, _ = curve_fit(modelAnnual, x[mask], (y - fit_y)[mask])
+        model_y += modelAnnual(model_x_linspace, *popt_seasonal)
+        fit_y += modelAnnual(x, *popt_seasonal)
+    return fit_y, model_x, model_y
+
+
+def median_ms(function, repeat: int) -> float:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dates", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    dates = np.datetime64("2016-01-01") + np.arange(args.dates) * 12
+    days = np.arange(args.dates) * 12.0
+    y = 2 - 0.02 * days + 5 * np.sin(days * 2 * np.pi / 365.25) + rng.normal(0, 2, args.dates)
+    y[rng.choice(args.dates, args.dates // 20, replace=False)] = np.nan
+
+    start = time.perf_counter()
+    import scipy.optimize  # noqa: F401
+    print(f"scipy.optimize import: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"{'model':>16} {'curve_fit [ms]':>15} {'least squares [ms]':>19} {'speedup':>8} {'max diff':>9}")
+    for name, model in (("poly-1", modelPoly1), ("poly-2", modelPoly2), ("poly-3", modelPoly3)):
+        for seasonal in (False, True):
+            fitting = FittingModels(dates, y, model=name)
+            old = median_ms(lambda: curve_fit_path(fitting, model, seasonal), args.repeat)
+            new = median_ms(lambda: fitting.fit(seasonal=seasonal), args.repeat)
+            if seasonal:
+                difference = "joint"  # the former path fitted the annual terms to the polynomial residuals
+            else:
+                difference = f"{np.nanmax(np.abs(fitting.fit()[0] - curve_fit_path(fitting, model, False)[0])):.1e}"
+            label = name + (" seasonal" if seasonal else "")
+            print(f"{label:>16} {old:>15.2f} {new:>19.2f} {old / new:>8.1f} {difference:>9}")
+
+if __name__ == "__main__":
+    main()
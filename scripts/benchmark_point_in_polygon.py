@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark the selection of cached points inside a drawn polygon.
+
+The script:
+- generates random points with one date value each, like a cached persistent scatterer layer,
+- selects the points inside a star-shaped polygon with a hole, with and without the grid point index,
+- checks the selection against the GEOS intersects test of QGIS for a sample of points if QGIS is available,
+- prints the timings.
+
+Usage:
+    python scripts/benchmark_point_in_polygon.py [--points 1000000] [--vertices 64] [--scale 1.0] [--repeat 5]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.point_in_polygon import pointsInPolygons  # noqa: E402
+from layer_utils.vector_columns import VectorColumns  # noqa: E402
+
+
+def star_polygon(vertices: int, scale: float = 1.0) -> list:
+    """Star-shaped exterior ring with a square hole, centred in the 1000x1000 extent of the points."""
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    radii = np.where(np.arange(vertices) % 2 == 0, 200.0, 90.0) * scale
+    exterior = np.column_stack((500 + radii * np.cos(angles), 500 + radii * np.sin(angles)))
+    hole = 500 + np.array([(-20, -20), (20, -20), (20, 20), (-20, 20)], dtype=np.float64) * scale
+    return [exterior, hole]
+
+
+def median_ms(function, repeat: int) -> float:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+def check_with_geos(x, y, polygon, selected, samples=20000) -> int:
+    """Count the sampled points where the selection differs from QgsGeometry.intersects."""
+    from qgis.core import QgsGeometry, QgsPointXY
+
+    geometry = QgsGeometry.fromPolygonXY([[QgsPointXY(*vertex) for vertex in ring] for ring in polygon])
+    rng = np.random.default_rng(2)
+    differences = 0
+    for i in rng.choice(len(x), size=min(samples, len(x)), replace=False):
+        inside = geometry.intersects(QgsGeometry.fromPointXY(QgsPointXY(x[i], y[i])))
+        differences += inside != selected[i]
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=1000000)
+    parser.add_argument("--vertices", type=int, default=64)
+    parser.add_argument("--scale", type=float, default=1.0, help="size of the polygon relative to the default")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    x = rng.uniform(0, 1000, args.points)
+    y = rng.uniform(0, 1000, args.points)
+    columns = VectorColumns(np.arange(args.points), x, y, np.zeros((args.points, 1), dtype=np.float32), None)
+    polygon = star_polygon(args.vertices, args.scale)
+
+    selected = np.zeros(args.points, dtype=bool)
+    selected[columns.rowsInPolygons([polygon])] = True
+    print(f"{args.points} points, {args.vertices} vertices, {selected.sum()} points selected")
+
+    print(f"{'method':>28} {'time [ms]':>10}")
+    print(f"{'all points':>28} {median_ms(lambda: pointsInPolygons(x, y, [polygon]), args.repeat):>10.1f}")
+    print(f"{'bounding box scan':>28} {median_ms(lambda: columns.rowsInPolygons([polygon]), args.repeat):>10.1f}")
+    start = time.perf_counter()
+    columns.buildPointIndex()
+    print(f"{'point index build':>28} {(time.perf_counter() - start) * 1000:>10.1f}")
+    print(f"{'point index':>28} {median_ms(lambda: columns.rowsInPolygons([polygon]), args.repeat):>10.1f}")
+
+    try:
+        differences = check_with_geos(x, y, polygon, selected)
+    except ImportError:
+        print("QGIS is not available, skipping the comparison with GEOS")
+    else:
+        print(f"differences to GEOS in sampled points: {differences}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from qgis.core import QgsPointXY
+from qgis.gui import QgsMapToolEmitPoint
+from qgis.PyQt.QtCore import QTimer, pyqtSignal
+
+
+class HoverPointTool(QgsMapToolEmitPoint):
+    """
+    Point tool that also emits the mouse position while hovering over the map.
+
+    Mouse moves are coalesced: only the latest position is kept and emitted at most `rate` times per second, so
+    positions that are already outdated when the timer fires are dropped instead of queued. Clicks are emitted with
+    canvasClicked as with QgsMapToolEmitPoint.
+    """
+    pointHovered = pyqtSignal(QgsPointXY)
+    hoverLeft = pyqtSignal()
+
+    def __init__(self, canvas, rate=30) -> None:
+        """
+        :param canvas: QgsMapCanvas
+        :param rate: Maximum number of hovered positions emitted per second
+        """
+        super().__init__(canvas)
+        self.hover_enabled = False
+        self._pending_point = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._emitPendingPoint)
+        self.setRate(rate)
+
+    def setRate(self, rate):
+        self._timer.setInterval(max(1, int(1000 / max(rate, 1))))
+
+    def setHoverEnabled(self, status):
+        self.hover_enabled = bool(status)
+        if not status:
+            self._pending_point = None
+            self._timer.stop()
+
+    def canvasMoveEvent(self, event) -> None:
+        if not self.hover_enabled:
+            return
+        self._pending_point = self.toMapCoordinates(event.pos())
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _emitPendingPoint(self):
+        point, self._pending_point = self._pending_point, None
+        if point is not None:
+            self.pointHovered.emit(point)
+
+    def deactivate(self) -> None:
+        self._pending_point = None
+        self._timer.stop()
+        if self.hover_enabled:
+            self.hoverLeft.emit()
+        super().deactivate()
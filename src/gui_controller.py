@@ -1,6 +1,7 @@
 import os
 
-from qgis.gui import QgsMapToolEmitPoint
+import numpy as np
+from qgis.core import QgsApplication, QgsProcessingUtils, QgsProject, QgsTask, QgsVectorLayer
 from qgis.PyQt.QtWidgets import QFileDialog, QMenu, QComboBox
 from qgis.PyQt.QtCore import QObject, QSettings, QStandardPaths, QTimer, QVariant, pyqtSignal
 from qgis.PyQt.QtGui import QIcon, QTransform
@@ -9,12 +10,19 @@ from . import map_click_handler as cph
 from . import setup_frames
 from .map_setting import InsarMap
 from .layer_utils import vector_layer as vector_layer_utils
+from .layer_utils import grd_layer as grd_layer_utils
+from .layer_utils import raster_layer as raster_layer_utils
+from .layer_utils import vector_cache as vector_cache_utils
+from .layer_utils import point_layer as point_layer_utils
+from .layer_utils import rereference as rereference_utils
+from .layer_utils import batch_fit as batch_fit_utils
 from .about import about as insar_explorer_about
 from ..external.setting_manager_ui.setting_ui import SettingsTableDialog
 from ..external.setting_manager_ui.json_settings import JsonSettings
 from .drawing_tools.polygon_drawing_tool import PolygonDrawingTool
+from .drawing_tools.hover_tool import HoverPointTool
 from .ui_windows.color_picker import ColorPicker
-from .qt_compat import RASTER_LAYER, VECTOR_LAYER
+from .qt_compat import POINT_GEOMETRY, RASTER_LAYER, VECTOR_LAYER
 
 
 class GuiController(QObject):
@@ -29,10 +37,16 @@ class GuiController(QObject):
         self.drawing_tool = None  # for polygon drawing
         self.drawing_tool_reference = None  # for reference polygon drawing
         self.selection_type = "point"  # "point" or "polygon" or "reference polygon"
+        self.compile_task = None  # background task compiling a raster time series stack
+        self.preload_task = None  # background task loading the raster time series stack of the active layer
+        self.vector_cache_task = None  # background task loading the time series of the active vector layer
+        self.field_layer_task = None  # background task computing the fields of a new layer from a cached layer
         self.initializeSelection()
         setup_frames.setupTsFrame(self.ui)
         self.insar_map = InsarMap(self.iface)
         self.settings = QSettings()
+        self.choose_point_click_handler.plot_ts.fit_memory_limit = self.settings.value(
+            'insar_explorer/batch_fit_memory_limit', 256, type=int)
         self.last_save_path = self._initialExportDirectory()
         self.last_save_ts_name = "ts_plot.png"
         self.last_export_ts_name = "ts_data.csv"
@@ -50,6 +64,7 @@ class GuiController(QObject):
 
         # add data range menu
         self.setDataRangeMenu()
+        self.setLayerToolsMenu()
 
         self.iface.currentLayerChanged.connect(self.onLayerChanged)
         self.onLayerChanged()
@@ -104,6 +119,9 @@ class GuiController(QObject):
         """Reset the click handler and the map when the active layer changes."""
         if layer is None:
             layer = self.iface.activeLayer()
+        # the stack cache is cleared below, wait for a running tile read of the preloading task
+        self.cancelStackPreload(wait=True)
+        self.cancelVectorCacheLoad()
         if layer:
             self.choose_point_click_handler.reset()
             self.insar_map.reset()
@@ -131,6 +149,110 @@ class GuiController(QObject):
                 message = ""
             self.msg_signal.emit(message, "i", 0)
 
+            if layer_type == RASTER_LAYER and is_local_raster:
+                self.startStackPreload(layer)
+            elif layer_type == VECTOR_LAYER:
+                self.startVectorCacheLoad(layer)
+
+    def startStackPreload(self, layer):
+        """Load the grd time series stack of a raster layer in a background task to speed up the first clicks."""
+        status, message = grd_layer_utils.checkGrdTimeseries(layer)
+        if status is False:
+            return
+
+        raster_layer = self.choose_point_click_handler.raster_layer
+        source = layer.source()
+        directory = grd_layer_utils.getLayerStackDirectory(layer)
+        center = self.iface.mapCanvas().mapSettings().mapToLayerCoordinates(
+            layer, self.iface.mapCanvas().extent().center())
+
+        def preloadStack(task):
+            def progress(value):
+                task.setProgress(value)
+                return not task.isCanceled()
+            return raster_layer.preloadStack(source, center=center, progress_callback=progress, directory=directory)
+
+        def onFinished(exception, result=None):
+            if self.preload_task is not task:
+                return  # a newer preloading task was started for another layer
+            self.preload_task = None
+            if exception is not None:
+                self.msg_signal.emit(f"Loading time series stack failed: {exception}", "e", 0)
+            elif result:
+                self.msg_signal.emit("Time series stack loaded.", "done", 3000)
+
+        def onProgress(value):
+            if self.preload_task is task:
+                self.msg_signal.emit(f"Loading time series stack: {value:.0f}%", "i", 0)
+
+        task = QgsTask.fromFunction("InSAR Explorer: load raster time series stack", preloadStack,
+                                    on_finished=onFinished)
+        task.progressChanged.connect(onProgress)
+        self.preload_task = task
+        QgsApplication.taskManager().addTask(task)
+
+    def cancelStackPreload(self, wait=False):
+        """
+        Cancel the preloading task of the stack.
+        :param wait: bool, wait until the task stopped reading, e.g. before the stack is closed
+        """
+        if self.preload_task is not None:
+            task = self.preload_task
+            self.preload_task = None
+            task.cancel()
+            if wait:
+                # the task stops after the tile it is reading, see RasterTimeseries.preloadStack()
+                task.waitForFinished()
+
+    def vectorCacheEnabled(self) -> bool:
+        return self.settings.value('insar_explorer/vector_cache_enabled', False, type=bool)
+
+    def startVectorCacheLoad(self, layer):
+        """Load the time series of a point layer into the vector layer cache in a background task."""
+        vector_cache = vector_cache_utils.vector_layer_cache
+        if not self.vectorCacheEnabled() or vector_cache.get(layer) is not None:
+            return
+        status, message = vector_layer_utils.checkVectorLayerTimeseries(layer)
+        if status is False or layer.geometryType() != POINT_GEOMETRY:
+            return
+        if not vector_cache.fitsInMemory(layer):
+            size = vector_cache.estimateBytes(layer) / 1024 ** 2
+            self.msg_signal.emit(f"Layer time series ({size:.0f} MB) exceed the memory limit of the vector cache.",
+                                 "w", 5000)
+            return
+
+        load, generation = vector_cache.prepareLoad(layer)
+
+        def loadColumns(task):
+            def progress(value):
+                task.setProgress(value)
+                return not task.isCanceled()
+            return load(progress_callback=progress)
+
+        def onFinished(exception, result=None):
+            if self.vector_cache_task is not task:
+                return  # a newer loading task was started for another layer
+            self.vector_cache_task = None
+            if exception is not None:
+                self.msg_signal.emit(f"Caching vector layer failed: {exception}", "e", 0)
+            elif result is not None and vector_cache.put(layer, result, generation):
+                self.msg_signal.emit(f"Vector layer cached ({result.nbytes / 1024 ** 2:.0f} MB).", "done", 3000)
+
+        def onProgress(value):
+            if self.vector_cache_task is task:
+                self.msg_signal.emit(f"Caching vector layer: {value:.0f}%", "i", 0)
+
+        task = QgsTask.fromFunction("InSAR Explorer: cache vector layer time series", loadColumns,
+                                    on_finished=onFinished)
+        task.progressChanged.connect(onProgress)
+        self.vector_cache_task = task
+        QgsApplication.taskManager().addTask(task)
+
+    def cancelVectorCacheLoad(self):
+        if self.vector_cache_task is not None:
+            self.vector_cache_task.cancel()
+            self.vector_cache_task = None
+
     def setVectorFields(self):
         layer = self.iface.activeLayer()
         if not layer:
@@ -168,8 +290,31 @@ class GuiController(QObject):
 
     def initializeClickTool(self):
         if not self.click_tool:
-            self.click_tool = QgsMapToolEmitPoint(self.iface.mapCanvas())
+            self.click_tool = HoverPointTool(self.iface.mapCanvas(),
+                                             rate=self.settings.value('insar_explorer/hover_preview_rate', 30,
+                                                                      type=int))
             self.click_tool.canvasClicked.connect(lambda point: self.onMapClicked(point=point))
+            self.click_tool.pointHovered.connect(self.onMapHovered)
+            self.click_tool.hoverLeft.connect(self.choose_point_click_handler.plot_ts.clearPreview)
+            self.click_tool.setHoverEnabled(self.hoverPreviewEnabled())
+
+    def hoverPreviewEnabled(self) -> bool:
+        return self.settings.value('insar_explorer/hover_preview', False, type=bool)
+
+    def onMapHovered(self, point):
+        self.choose_point_click_handler.previewPointHovered(point)
+
+    def hoverPreviewToggled(self, status):
+        self.settings.setValue('insar_explorer/hover_preview', status)
+        if self.click_tool is not None:
+            self.click_tool.setHoverEnabled(status)
+        if not status:
+            self.choose_point_click_handler.plot_ts.clearPreview()
+        elif not self.vectorCacheEnabled():
+            self.msg_signal.emit("Hover preview needs the vector layer cache: enable `Cache vector layers in memory`.",
+                                 "w", 5000)
+        else:
+            self.msg_signal.emit("Move the mouse over cached point layers to preview their time series.", "i", 3000)
 
     def onMapClicked(self, point):
         self.msg_signal.emit("", "i", 0)
@@ -297,6 +442,7 @@ class GuiController(QObject):
         # TS fit handler
         self.ui.gb_ts_fit.buttonClicked.connect(self.timeseriesPlotFit)
         self.ui.pb_ts_fit_seasonal.clicked.connect(self.seasonalFitClicked)
+        self.ui.pb_ts_fit_robust.clicked.connect(self.robustFitClicked)
         self.ui.pb_plot_residuals.toggled.connect(self.residualPlotClicked)
         # Plot setting
         self.ui.gb_y_axis.buttonClicked.connect(self.plotYAxis)
@@ -340,8 +486,254 @@ class GuiController(QObject):
         menu.addAction("1xStd", self.setSymbologyRangeFromData)
         menu.addAction("2xStd", self.setSymbologyRangeFromData)
         menu.addAction("3xStd", self.setSymbologyRangeFromData)
+        menu.addAction("2-98%", self.setSymbologyRangeFromData)
+        menu.addAction("5-95%", self.setSymbologyRangeFromData)
         self.ui.pb_range_from_data.setMenu(menu)
 
+    def setLayerToolsMenu(self):
+        """create a menu for layer caches and raster stack compilation"""
+        menu = QMenu(self.ui)
+        menu.addAction("Compile raster time series stack", self.compileRasterStack)
+        menu.addSeparator()
+        cache_action = menu.addAction("Cache vector layers in memory")
+        cache_action.setCheckable(True)
+        cache_action.setChecked(self.vectorCacheEnabled())
+        cache_action.toggled.connect(self.vectorCacheToggled)
+        hover_action = menu.addAction("Preview time series on hover")
+        hover_action.setCheckable(True)
+        hover_action.setChecked(self.hoverPreviewEnabled())
+        hover_action.toggled.connect(self.hoverPreviewToggled)
+        menu.addAction("Re-reference layer", self.rereferenceLayer)
+        fit_menu = menu.addMenu("Fit layer time series")
+        fit_menu.addAction("Linear", lambda: self.fitLayerTimeSeries(degree=1))
+        fit_menu.addAction("Linear + seasonal", lambda: self.fitLayerTimeSeries(degree=1, seasonal=True))
+        fit_menu.addAction("Quadratic + seasonal", lambda: self.fitLayerTimeSeries(degree=2, seasonal=True))
+        fit_menu.addSeparator()
+        fit_menu.addAction("Linear (robust)", lambda: self.fitLayerTimeSeries(degree=1, robust=True))
+        fit_menu.addAction("Linear + seasonal (robust)",
+                           lambda: self.fitLayerTimeSeries(degree=1, seasonal=True, robust=True))
+        menu.addAction("Drop cache", self.dropVectorCache)
+        menu.addAction("Delete cached files", self.deleteVectorDiskCache)
+        cache_size_action = menu.addAction("")
+        cache_size_action.setEnabled(False)
+        menu.aboutToShow.connect(lambda: cache_size_action.setText(self.vectorCacheSizeText()))
+        self.ui.pb_layer_tools.setMenu(menu)
+
+    def vectorCacheSizeText(self) -> str:
+        vector_cache = vector_cache_utils.vector_layer_cache
+        stats = vector_cache.stats()
+        text = (f"Cache: {stats['nbytes'] / 1024 ** 2:.1f} of {stats['memory_limit'] / 1024 ** 2:.0f} MB, "
+                f"{stats['layers']} layer(s)")
+        if vector_cache.sidecar is not None:
+            text += f", {vector_cache.sidecar.nbytes() / 1024 ** 2:.1f} MB on disk"
+        return text
+
+    def vectorCacheToggled(self, status):
+        self.settings.setValue('insar_explorer/vector_cache_enabled', status)
+        if status:
+            self.msg_signal.emit("Time series of vector point layers are cached in memory.", "i", 3000)
+            layer = self.iface.activeLayer()
+            if layer and layer.type() == VECTOR_LAYER:
+                self.startVectorCacheLoad(layer)
+        else:
+            self.dropVectorCache()
+
+    def dropVectorCache(self):
+        self.cancelVectorCacheLoad()
+        vector_cache_utils.vector_layer_cache.drop()
+        vector_cache_utils.point_indices.clear()
+        self.insar_map.reset()
+        self.msg_signal.emit("Vector layer cache dropped.", "i", 3000)
+
+    def deleteVectorDiskCache(self):
+        sidecar = vector_cache_utils.vector_layer_cache.sidecar
+        if sidecar is None:
+            self.msg_signal.emit("The disk cache of vector layers is disabled.", "i", 3000)
+            return
+        self.dropVectorCache()
+        sidecar.clear()
+        self.msg_signal.emit("Cached files of vector layers deleted.", "i", 3000)
+
+    def rereferenceLayer(self):
+        """
+        Compute the velocity of every point of the active layer relative to the current reference in a background
+        task, and add it as a new layer. The source layer is not modified.
+        """
+        layer = self.iface.activeLayer()
+        columns = vector_cache_utils.vector_layer_cache.get(layer)
+        plot_ts = self.choose_point_click_handler.plot_ts
+        if columns is None:
+            self.msg_signal.emit("Re-referencing needs the layer in the vector layer cache: enable `Cache vector "
+                                 "layers in memory` and wait until the layer is cached.", "w", 5000)
+            return
+        if plot_ts.ref_coords is None or plot_ts.dates is None:
+            self.msg_signal.emit("Set a reference point or polygon first.", "w", 5000)
+            return
+        if not np.array_equal(np.asarray(plot_ts.dates, dtype="datetime64[D]"), columns.dates):
+            self.msg_signal.emit("The dates of the reference do not match the dates of the layer.", "w", 5000)
+            return
+
+        reference = rereference_utils.referenceSeries(plot_ts.ref_values)
+
+        def computeVelocity(progress_callback):
+            velocity = rereference_utils.rereferencedVelocity(columns.dates, columns.values, reference,
+                                                              progress_callback=progress_callback)
+            return None if velocity is None else {"velocity": velocity}
+
+        self.startFieldLayerTask(layer, columns, computeVelocity, ["velocity"], f"{layer.name()} (re-referenced)",
+                                 "Re-referencing layer")
+
+    def fitLayerTimeSeries(self, degree=1, seasonal=False, robust=False):
+        """
+        Fit a model to the time series of every point of the active cached layer in a background task, and add the
+        velocity, acceleration, seasonal amplitude and phase and RMSE as a new layer.
+        :param robust: bool, fit by iteratively reweighted least squares with the robust loss of the plot settings,
+        and add the number of outlier dates of each point
+        """
+        layer = self.iface.activeLayer()
+        columns = vector_cache_utils.vector_layer_cache.get(layer)
+        if columns is None:
+            self.msg_signal.emit("Fitting the layer needs the layer in the vector layer cache: enable `Cache vector "
+                                 "layers in memory` and wait until the layer is cached.", "w", 5000)
+            return
+
+        chunk_size = batch_fit_utils.chunkRows(
+            len(columns.dates), self.settings.value('insar_explorer/batch_fit_memory_limit', 256, type=int),
+            robust=robust)
+        loss = (self.choose_point_click_handler.plot_ts.parms['model fit'].get('robust loss') or 'huber'
+                if robust else None)
+        field_names = ["velocity"] + (["acceleration"] if degree >= 2 else [])
+        field_names += ["seasonal_amplitude", "seasonal_phase"] if seasonal else []
+        field_names += ["rmse"]
+        field_names += ["outliers"] if robust else []
+
+        def computeFit(progress_callback):
+            return batch_fit_utils.fitLayerTimeSeries(columns.dates, columns.values, degree=degree,
+                                                      seasonal=seasonal, chunk_size=chunk_size,
+                                                      progress_callback=progress_callback, robust=loss)
+
+        self.startFieldLayerTask(layer, columns, computeFit, field_names, f"{layer.name()} (fit poly-{degree}"
+                                 f"{' seasonal' if seasonal else ''}{f' {loss}' if robust else ''})", "Fitting layer")
+
+    def startFieldLayerTask(self, layer, columns, compute, field_names, layer_name, description):
+        """
+        Compute fields for every point of a cached layer in a background task and add them as a new layer.
+        The columns are written in bulk to a GeoPackage in the temporary folder of QGIS, the source is not rewritten.
+        :param layer: Source layer, it is not modified
+        :param columns: VectorColumns of the layer
+        :param compute: Function with a progress_callback argument returning arrays by field name, or None if canceled
+        :param field_names: Names of the fields, the first one is used for the symbology
+        :param layer_name: Name of the new layer
+        :param description: Description of the task for the messages
+        """
+        if self.field_layer_task is not None:
+            self.msg_signal.emit("A layer is already being computed.", "i", 3000)
+            return
+        crs = layer.crs()
+        crs_wkt = crs.toWkt()
+        file_path = QgsProcessingUtils.generateTempFilename("insar_explorer_layer.gpkg")
+
+        def computeLayer(task):
+            def progress(offset):
+                def callback(value):
+                    task.setProgress(offset + value / 2)
+                    return not task.isCanceled()
+                return callback
+            field_values = compute(progress(0))
+            if field_values is None:
+                return None
+            field_values = {field_name: field_values[field_name] for field_name in field_names}
+            written = point_layer_utils.writePointGeoPackage(file_path, crs_wkt, columns.feature_ids, columns.x,
+                                                             columns.y, field_values,
+                                                             progress_callback=progress(50))
+            if not written:
+                return None
+            # the symbology range of the new layer is the range of its own values, not of the active layer
+            values = np.asarray(field_values[field_names[0]], dtype=np.float64)
+            values = values[np.isfinite(values)]
+            value_range = (float(values.min()), float(values.max())) if values.size else None
+            return file_path, value_range
+
+        def onFinished(exception, result=None):
+            self.field_layer_task = None
+            if exception is not None:
+                self.msg_signal.emit(f"{description} failed: {exception}", "e", 0)
+                return
+            if result is None:
+                return
+            result_path, value_range = result
+            new_layer = QgsVectorLayer(f"{result_path}|layername={point_layer_utils.POINT_TABLE_NAME}", layer_name,
+                                       "ogr")
+            if not new_layer.isValid():
+                self.msg_signal.emit(f"{description} failed: unable to open {result_path}.", "e", 0)
+                return
+            new_layer.setCrs(crs)
+            QgsProject.instance().addMapLayer(new_layer)
+            if value_range is not None:
+                min_value, max_value = value_range
+                if self.ui.cb_symbol_range_sync.isChecked():
+                    max_value = max(abs(min_value), abs(max_value))
+                    min_value = -max_value
+                self.insar_map.min_value, self.insar_map.max_value = min_value, max_value
+                for spin_box, value in ((self.ui.sb_symbol_lower_range, min_value),
+                                        (self.ui.sb_symbol_upper_range, max_value)):
+                    spin_box.blockSignals(True)
+                    spin_box.setValue(value)
+                    spin_box.blockSignals(False)
+            # the computed values are not shifted by the reference offset of the active layer
+            self.insar_map.setSymbology(layer=new_layer, field_name=field_names[0], offset_value=0)
+            self.msg_signal.emit(f"Layer '{layer_name}' added.", "done", 5000)
+
+        def onProgress(value):
+            if self.field_layer_task is task:
+                self.msg_signal.emit(f"{description}: {value:.0f}%", "i", 0)
+
+        task = QgsTask.fromFunction(f"InSAR Explorer: {description.lower()}", computeLayer,
+                                    on_finished=onFinished)
+        task.progressChanged.connect(onProgress)
+        self.field_layer_task = task
+        QgsApplication.taskManager().addTask(task)
+
+    def compileRasterStack(self):
+        """Compile the grd time series of the active layer to a pixel-major cube in a background task."""
+        if self.compile_task is not None:
+            self.msg_signal.emit("Raster time series stack is already being compiled.", "w", 0)
+            return
+
+        layer = self.iface.activeLayer()
+        status, message = grd_layer_utils.checkGrdTimeseries(layer)
+        if status is False:
+            self.msg_signal.emit(message, "i", 0)
+            return
+
+        directory = grd_layer_utils.getLayerStackDirectory(layer)
+        raster_file_paths, _ = grd_layer_utils.getGrdInfo(directory)
+        if not raster_file_paths:
+            self.msg_signal.emit("Only time series of grd files need compiling.", "i", 0)
+            return
+
+        def compileStack(task):
+            def progress(value):
+                task.setProgress(value)
+                return not task.isCanceled()
+            return raster_layer_utils.compileGrdStack(directory, progress_callback=progress)
+
+        def onFinished(exception, result=None):
+            self.compile_task = None
+            if exception is not None:
+                self.msg_signal.emit(f"Compiling raster time series stack failed: {exception}", "e", 0)
+            elif not result:
+                self.msg_signal.emit("Compiling raster time series stack cancelled.", "w", 0)
+            else:
+                self.msg_signal.emit("Raster time series stack compiled.", "done", 5000)
+
+        self.compile_task = QgsTask.fromFunction("InSAR Explorer: compile raster time series stack", compileStack,
+                                                 on_finished=onFinished)
+        self.compile_task.progressChanged.connect(
+            lambda value: self.msg_signal.emit(f"Compiling raster time series stack: {value:.0f}%", "i", 0))
+        QgsApplication.taskManager().addTask(self.compile_task)
+        self.msg_signal.emit("Compiling raster time series stack in the background.", "i", 0)
+
     def settingsWidgetPopup(self):
         self.msg_signal.emit("", "", 0)
         json_file = "config/config.json"
@@ -398,6 +790,10 @@ class GuiController(QObject):
         elif button.text() == "3xStd":
             message = self.insar_map.setSymbologyRangeFromData(n_std=3)
             message = "Symbology range set to mean±3σ."
+        elif button.text() in ("2-98%", "5-95%"):
+            lower, upper = (float(value) for value in button.text().rstrip("%").split("-"))
+            message = self.insar_map.setSymbologyRangeFromData(percentiles=(lower, upper))
+            message = f"Symbology range set to the {button.text()} percentiles."
 
         self.msg_signal.emit(message, 'i', 0)
         min_value = self.insar_map.min_value
@@ -465,9 +861,19 @@ class GuiController(QObject):
         self.msg_signal.emit("Seasonal fit enabled: a seasonal component will be added to the selected model.",
                              "i", 0)
 
+    def robustFitClicked(self, status):
+        if status and self.ui.pb_ts_nofit.isChecked():
+            self.ui.pb_ts_fit_poly1.setChecked(True)
+        self.timeseriesPlotFit()
+        if status:
+            self.msg_signal.emit("Robust fit enabled: outliers are down-weighted and marked on the plot.", "i", 0)
+        else:
+            self.msg_signal.emit("Robust fit disabled.", "i", 0)
+
     def timeseriesPlotFit(self):
         if self.ui.pb_ts_nofit.isChecked():
             self.ui.pb_ts_fit_seasonal.setChecked(False)
+            self.ui.pb_ts_fit_robust.setChecked(False)
             self.ui.pb_plot_residuals.setChecked(False)
 
         selected_buttons = [button for button in self.ui.gb_ts_fit.buttons() if
@@ -486,8 +892,11 @@ class GuiController(QObject):
             self.choose_point_click_handler.plot_ts.fit_models = fit_models
             seasonal_flag = self.ui.pb_ts_fit_seasonal.isChecked()
             self.choose_point_click_handler.plot_ts.fit_seasonal_flag = seasonal_flag
+            robust_flag = self.ui.pb_ts_fit_robust.isChecked()
+            self.choose_point_click_handler.plot_ts.fit_robust_flag = robust_flag
             msg = f"Fit model selected: {', '.join(fit_models)}"
             msg = msg + " Seasonal component will be added." if seasonal_flag else msg
+            msg = msg + " Robust fit." if robust_flag else msg
             self.msg_signal.emit(msg, "i", 0)
 
         self.timeseriesPlotResiduals()
@@ -721,7 +1130,6 @@ class GuiController(QObject):
         for layer in selected_layers:
             self.ui.lw_layers.takeItem(self.ui.lw_layers.row(layer))
 
-
     def _initialExportDirectory(self):
         """Return the initial directory used by plot and data export dialogs."""
         saved_path = self.settings.value('insar_explorer/export_directory', '', type=str)
@@ -750,7 +1158,6 @@ class GuiController(QObject):
         self.last_save_path = export_dir
         self.settings.setValue('insar_explorer/export_directory', export_dir)
 
-
     @staticmethod
     def _extensionFromFilter(selected_filter):
         """Return the first file extension advertised by a QFileDialog filter."""
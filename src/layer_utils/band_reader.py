@@ -0,0 +1,71 @@
+import threading
+import numpy as np
+from osgeo import gdal
+
+
+class BandReader:
+    """
+    Opened first band of a raster layer with its inverse geotransform.
+
+    The reader is kept open per layer source, so that reference clicks and symbology updates do not reopen the file.
+    Several points are converted to pixel indices with one vectorized call.
+
+    Attributes:
+        source: Layer source.
+        signature: File signature used to detect changes of the file on disk.
+        cache_key: Key identifying the band and its file signature in the tile cache.
+        x_size, y_size: Raster size in pixels.
+        geo_transform: GDAL geotransform of the raster.
+    """
+    def __init__(self, source, signature=()):
+        self.source = source
+        self.signature = signature
+        self.cache_key = ("band", source, hash(signature))
+        self.dataset = gdal.Open(source)
+        self.inv_transform = None
+        self._lock = threading.Lock()
+        if self.dataset is None:
+            return
+        self.band = self.dataset.GetRasterBand(1)
+        self.nodata = self.band.GetNoDataValue()
+        self.x_size = self.dataset.RasterXSize
+        self.y_size = self.dataset.RasterYSize
+        self.geo_transform = self.dataset.GetGeoTransform()
+        self.inv_transform = gdal.InvGeoTransform(self.geo_transform)
+
+    def isValid(self) -> bool:
+        return self.dataset is not None and self.inv_transform is not None
+
+    def pixelsFromPoints(self, x, y) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        Convert map coordinates to pixel indices.
+        :param x: Array of x coordinates in the raster CRS
+        :param y: Array of y coordinates in the raster CRS
+        :return: pixel columns, pixel rows and a mask of the points inside the raster
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        a0, a1, a2, b0, b1, b2 = self.inv_transform
+        px = np.floor(a0 + a1 * x + a2 * y).astype(np.int64)
+        py = np.floor(b0 + b1 * x + b2 * y).astype(np.int64)
+        inside = (px >= 0) & (px < self.x_size) & (py >= 0) & (py < self.y_size)
+        return px, py, inside
+
+    def readWindow(self, x_off, y_off, x_count, y_count) -> np.ndarray:
+        """
+        Read a pixel window of the band with NaN for nodata.
+        :return: Array with shape (1, rows, columns)
+        """
+        with self._lock:
+            data = self.band.ReadAsArray(x_off, y_off, x_count, y_count)
+        if data is None:
+            return None
+        data = data.astype(np.float32).reshape(1, y_count, x_count)
+        if self.nodata is not None and np.isfinite(self.nodata):
+            data[data == self.nodata] = np.nan
+        return data
+
+    def close(self):
+        with self._lock:
+            self.dataset = None
+            self.band = None
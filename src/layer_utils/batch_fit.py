@@ -0,0 +1,200 @@
+import numpy as np
+
+from ..models.least_squares import POLYNOMIAL_FACTORS, designMatrix, fitChunk
+
+
+def chunkRows(num_dates, memory_limit=256, robust=False) -> int:
+    """
+    Get the number of rows fitted at once so that the float64 work arrays of a chunk fit in the memory limit.
+    :param num_dates: Number of dates
+    :param memory_limit: int in Mb
+    :param robust: bool, the chunks are fitted by robustFitChunk(), which needs twice the work arrays
+    :return: int
+    """
+    work_arrays = 12 if robust else 6
+    return max(1024, int(memory_limit * 1024 * 1024 // (max(num_dates, 1) * 8 * work_arrays)))
+
+
+# tuning constants of the weight functions for 95% efficiency with normal errors
+ROBUST_TUNING = {"huber": 1.345, "tukey": 4.685}
+# residuals larger than this number of robust standard deviations are flagged as outliers
+OUTLIER_THRESHOLD = 3.0
+
+
+def robustWeights(residuals, scale, loss="huber"):
+    """
+    Get the weights of residuals for iteratively reweighted least squares.
+    :param residuals: Matrix of residuals with shape (rows, dates)
+    :param scale: Robust standard deviation of the residuals of each row
+    :param loss: "huber" or "tukey" (bisquare)
+    :return: Matrix of weights between 0 and 1
+    """
+    if loss not in ROBUST_TUNING:
+        raise ValueError(f"unknown robust loss: {loss}")
+    scale = np.asarray(scale, dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        inverse = np.where(scale > 0, 1 / (ROBUST_TUNING[loss] * scale), 0)
+    u = np.abs(residuals) * inverse[:, np.newaxis]
+    if loss == "huber":
+        return 1 / np.maximum(u, 1, out=u)
+    u = np.maximum(1 - u * u, 0)
+    return np.multiply(u, u, out=u)
+
+
+def _rowMedian(values, count):
+    """Median of the finite values of each row, with NaN and infinite values sorted to the end."""
+    ordered = np.sort(values, axis=1)
+    rows = np.arange(len(values))
+    low, high = np.maximum(count - 1, 0) // 2, np.maximum(count, 1) // 2
+    with np.errstate(invalid="ignore"):
+        return np.where(count > 0, 0.5 * (ordered[rows, low] + ordered[rows, high]), np.nan)
+
+
+def robustScale(residuals, finite):
+    """Robust standard deviation of each row from the median absolute deviation of the finite residuals."""
+    count = finite.sum(axis=1)
+    residuals = np.where(finite, residuals, np.inf)
+    with np.errstate(invalid="ignore"):
+        deviation = np.abs(residuals - _rowMedian(residuals, count)[:, np.newaxis])
+    return 1.4826 * _rowMedian(np.where(finite, deviation, np.inf), count)
+
+
+def _solveWeighted(design, products, y, weights):
+    """Solve the weighted normal equations of each row, products are the flattened outer products of the design rows."""
+    num_parameters = design.shape[1]
+    normal = (weights @ products).reshape(-1, num_parameters, num_parameters)
+    right = (weights * y) @ design
+    try:
+        return np.linalg.solve(normal, right[:, :, np.newaxis])[:, :, 0]
+    except np.linalg.LinAlgError:
+        return np.einsum("rpq,rq->rp", np.linalg.pinv(normal), right)
+
+
+def robustFitChunk(design, values, loss="huber", max_iterations=30, tolerance=1e-5):
+    """
+    Fit the linear model to each row of a value matrix by iteratively reweighted least squares, ignoring NaN values.
+
+    All rows are iterated together: each iteration computes the weights of all residuals from the robust scale of
+    their row and solves the weighted normal equations of all rows at once. Rows stop changing once their
+    coefficients converged, and the iteration stops when all rows converged. Values with a residual larger than
+    OUTLIER_THRESHOLD robust standard deviations are flagged as outliers.
+    :param design: Design matrix with shape (dates, parameters)
+    :param values: Matrix with shape (rows, dates)
+    :param loss: "huber" or "tukey" (bisquare)
+    :param max_iterations: Maximum number of reweighting iterations
+    :param tolerance: Relative change of the coefficients below which a row converged
+    :return: Coefficients with shape (rows, parameters), weights with shape (rows, dates), robust standard deviation
+    of the residuals per row, and outlier flags with shape (rows, dates). Rows with less values than parameters have
+    NaN coefficients.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    y = np.where(finite, values, 0)
+    weights = finite.astype(np.float64)
+    products = (design[:, :, np.newaxis] * design[:, np.newaxis, :]).reshape(len(design), -1)
+    active = finite.sum(axis=1) >= design.shape[1]
+    coefficients = np.full((len(values), design.shape[1]), np.nan)
+    coefficients[active] = _solveWeighted(design, products, y[active], weights[active])
+    for _ in range(max_iterations):
+        rows = np.flatnonzero(active)
+        if len(rows) == 0:
+            break
+        # slicing instead of indexing avoids copies while all rows are iterated
+        rows = slice(None) if len(rows) == len(values) else rows
+        residuals = y[rows] - coefficients[rows] @ design.T
+        row_weights = robustWeights(residuals, robustScale(residuals, finite[rows]), loss=loss)
+        row_weights *= finite[rows]
+        weights[rows] = row_weights
+        updated = _solveWeighted(design, products, y[rows], row_weights)
+        change = np.max(np.abs(updated - coefficients[rows]), axis=1)
+        size = np.max(np.abs(updated), axis=1)
+        coefficients[rows] = updated
+        active[np.arange(len(values))[rows][~(change > tolerance * (size + tolerance))]] = False
+
+    residuals = y - coefficients @ design.T
+    scale = robustScale(residuals, finite)
+    return coefficients, weights, scale, flagOutliers(residuals, scale, finite)
+
+
+def flagOutliers(residuals, scale, finite):
+    """
+    Flag the finite residuals larger than OUTLIER_THRESHOLD robust standard deviations of their row.
+    Rows with a zero scale have no outliers, e.g. piecewise-constant or quantized series with more than half of their
+    residuals exactly zero, as their weights in robustWeights().
+    :param residuals: Matrix of residuals with shape (rows, dates)
+    :param scale: Robust standard deviation of the residuals of each row
+    :param finite: Matrix of flags of the finite values
+    :return: Matrix of outlier flags
+    """
+    scale = np.asarray(scale, dtype=np.float64)[:, np.newaxis]
+    with np.errstate(invalid="ignore"):
+        return finite & (scale > 0) & (np.abs(residuals) > OUTLIER_THRESHOLD * scale)
+
+
+def fitLayerTimeSeries(dates, values, degree=1, seasonal=False, chunk_size=65536, progress_callback=None,
+                       robust=None) -> dict:
+    """
+    Fit a polynomial and optional annual model to every time series of a layer.
+    The matrix is fitted in chunks of rows with the design matrix of the shared dates, see fitChunk().
+    :param dates: Dates of the columns of the matrix
+    :param values: Matrix with shape (features, dates), e.g. the cached or memory-mapped values of a vector layer
+    :param degree: Degree of the polynomial, 1 to 3
+    :param seasonal: bool, fit annual sine and cosine terms jointly with the polynomial
+    :param chunk_size: Number of rows fitted at once, see chunkRows()
+    :param progress_callback: Function called with the progress in percent. Fitting stops if it returns False.
+    :param robust: None for least squares, or the loss of a robust fit, "huber" or "tukey", see robustFitChunk()
+    :return: Arrays with one value per row by name, or None if canceled: velocity (per year), acceleration (per
+    year^2, degree >= 2), seasonal_amplitude and seasonal_phase (radians of A * sin(2 pi day / 365.25 + phase) with
+    the ordinal day, if seasonal), rmse, and outliers (number of outlier dates, if robust). The RMSE of a robust fit
+    excludes the outliers.
+    """
+    design, names = designMatrix(dates, degree=degree, seasonal=seasonal)
+    num_rows = len(values)
+    coefficients = np.empty((num_rows, design.shape[1]))
+    rmse = np.empty(num_rows)
+    outlier_count = np.zeros(num_rows) if robust else None
+    for start in range(0, num_rows, chunk_size):
+        stop = min(start + chunk_size, num_rows)
+        if robust:
+            chunk = np.asarray(values[start:stop], dtype=np.float64)
+            coefficients[start:stop], _, _, outliers = robustFitChunk(design, chunk, loss=robust)
+            rmse[start:stop] = _rmse(chunk - coefficients[start:stop] @ design.T, np.isfinite(chunk) & ~outliers)
+            outlier_count[start:stop] = outliers.sum(axis=1)
+        else:
+            coefficients[start:stop], rmse[start:stop] = fitChunk(design, values[start:stop])
+        if progress_callback and progress_callback(100 * stop / num_rows) is False:
+            return None
+
+    results = {}
+    for i in range(1, degree + 1):
+        results[names[i]] = coefficients[:, i] * POLYNOMIAL_FACTORS[i]
+    if seasonal:
+        sine, cosine = coefficients[:, -2], coefficients[:, -1]
+        results["seasonal_amplitude"] = np.hypot(sine, cosine)
+        results["seasonal_phase"] = np.arctan2(cosine, sine)
+    results["rmse"] = rmse
+    if robust:
+        results["outliers"] = outlier_count
+    return results
+
+
+def _rmse(residuals, valid):
+    """RMSE of the valid residuals of each row."""
+    count = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, np.sqrt(np.where(valid, residuals * residuals, 0).sum(axis=1) / count), np.nan)
+
+
+def velocitySummary(velocity) -> dict:
+    """
+    Summarize the velocities of many time series, e.g. of the points in a polygon.
+    :param velocity: Array of velocities, NaN values are ignored
+    :return: dict with count, median, q25, q75 and iqr, NaN statistics without values
+    """
+    velocity = np.asarray(velocity, dtype=np.float64)
+    velocity = velocity[np.isfinite(velocity)]
+    if len(velocity) == 0:
+        return {"count": 0, "median": np.nan, "q25": np.nan, "q75": np.nan, "iqr": np.nan}
+    q25, median, q75 = np.percentile(velocity, [25, 50, 75])
+    return {"count": len(velocity), "median": float(median), "q25": float(q25), "q75": float(q75),
+            "iqr": float(q75 - q25)}
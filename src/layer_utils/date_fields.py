@@ -0,0 +1,76 @@
+import re
+from dataclasses import dataclass
+import numpy as np
+
+from .date_utils import datesFromStrings
+
+DATE_FIELD_PATTERNS = [re.compile(pattern) for pattern in (r'^D(\d{8})$', r'(\d{8})$', r'^D_(\d{8})$')]
+
+
+@dataclass(frozen=True)
+class DateFieldSchema:
+    """
+    Date fields of a vector time series layer, sorted by date.
+
+    Attributes:
+        field_indices: Indices of the date fields in the layer fields.
+        field_names: Names of the date fields.
+        dates: Dates of the fields as datetime64[D] array.
+    """
+    field_indices: np.ndarray
+    field_names: tuple
+    dates: np.ndarray
+
+    def __len__(self):
+        return len(self.field_indices)
+
+
+def buildDateFieldSchema(field_names) -> DateFieldSchema:
+    """
+    Find the fields with names in the format 'DYYYYMMDD', 'YYYYMMDD' or 'D_YYYYMMDD'.
+    :param field_names: Names of all fields of the layer
+    :return: DateFieldSchema with the date fields sorted by date
+    """
+    indices = []
+    date_strings = []
+    for index, field_name in enumerate(field_names):
+        for pattern in DATE_FIELD_PATTERNS:
+            match = pattern.match(field_name)
+            if match:
+                indices.append(index)
+                date_strings.append(match.group(1))
+                break
+
+    dates = datesFromStrings(date_strings)
+    order = np.argsort(dates, kind="stable")
+    return DateFieldSchema(field_indices=np.array(indices, dtype=np.int64)[order],
+                           field_names=tuple(field_names[indices[i]] for i in order),
+                           dates=dates[order])
+
+
+def toFloat(value) -> float:
+    """Convert an attribute value to float. NULL values and values that are not numbers are converted to NaN."""
+    if value is None:
+        return np.nan
+    is_null = getattr(value, "isNull", None)
+    if is_null is not None and is_null():
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def attributesToFloat(attributes, field_indices) -> np.ndarray:
+    """
+    Gather the values of fields from the attribute list of a feature.
+    :param attributes: List of attribute values, e.g. from QgsFeature.attributes()
+    :param field_indices: Indices of the fields to gather
+    :return: Array of float64 values, NaN for NULL values
+    """
+    values = [attributes[i] for i in field_indices]
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        # NULL values, fall back to converting the values one by one
+        return np.array([toFloat(value) for value in values], dtype=np.float64)
@@ -0,0 +1,30 @@
+import re
+import numpy as np
+
+
+def datesFromStrings(date_strings) -> np.ndarray:
+    """
+    Convert date strings in the format 'YYYYMMDD' to a datetime64 array.
+    :param date_strings: List of date strings
+    :return: Array of dtype datetime64[D]
+    """
+    return np.array([f"{s[:4]}-{s[4:6]}-{s[6:8]}" for s in date_strings], dtype='datetime64[D]')
+
+
+def datesFromTimeValues(values, units) -> np.ndarray:
+    """
+    Convert CF-style time coordinates to a datetime64 array.
+    :param values: Time values, e.g. from the NETCDF_DIM_time band metadata
+    :param units: Units in the format '<days|hours|minutes|seconds> since YYYY-MM-DD[ HH:MM:SS]'
+    :return: Array of dtype datetime64[D] or None if the units are not supported
+    """
+    match = re.match(r'^\s*(days|hours|minutes|seconds)\s+since\s+(\d{1,4})-(\d{1,2})-(\d{1,2})'
+                     r'(?:[ T](\d{1,2}):(\d{1,2})(?::(\d{1,2}))?)?', units or "")
+    if match is None:
+        return None
+    unit, year, month, day, hour, minute, second = match.groups()
+    origin = np.datetime64(f"{int(year):04d}-{int(month):02d}-{int(day):02d}T"
+                           f"{int(hour or 0):02d}:{int(minute or 0):02d}:{int(second or 0):02d}", 's')
+    seconds_per_unit = {"days": 86400, "hours": 3600, "minutes": 60, "seconds": 1}[unit]
+    offsets = np.round(np.asarray(values, dtype=np.float64) * seconds_per_unit).astype(np.int64)
+    return (origin + offsets.astype('timedelta64[s]')).astype('datetime64[D]')
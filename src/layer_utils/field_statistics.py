@@ -0,0 +1,131 @@
+import numpy as np
+
+
+class FieldStatistics:
+    """
+    Streaming statistics of the values of one field.
+
+    Values are added in chunks. Mean and variance are accumulated with Welford's algorithm, combining the mean and sum
+    of squared deviations of each chunk, so that no value is kept in memory. A histogram with a fixed number of bins
+    gives percentiles with a resolution of (max - min) / bins. The histogram range starts at the range of the first
+    chunk and doubles by merging neighbouring bins whenever a value falls outside of it, so that one pass is enough.
+
+    Attributes:
+        bins: Number of histogram bins.
+        count: Number of finite values.
+        mean: Mean of the values.
+        min, max: Min and max of the values. NaN without values.
+    """
+    def __init__(self, bins=4096):
+        """
+        :param bins: int, even number of histogram bins
+        """
+        self.bins = int(bins) + int(bins) % 2
+        self.count = 0
+        self.mean = np.nan
+        self._m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+        self._histogram = np.zeros(self.bins, dtype=np.int64)
+        self._lower = None
+        self._width = None
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the values, as np.var."""
+        return self._m2 / self.count if self.count > 0 else np.nan
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation of the values, as np.std."""
+        return float(np.sqrt(self.variance))
+
+    def add(self, values):
+        """
+        Add a chunk of values. Values that are not finite are ignored.
+        :param values: Array of values
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+
+        # combine the chunk with the previous values (Chan et al. parallel form of Welford's algorithm)
+        count = values.size
+        mean = float(values.mean())
+        m2 = float(np.square(values - mean).sum())
+        if self.count == 0:
+            self.mean, self._m2 = mean, m2
+        else:
+            total = self.count + count
+            delta = mean - self.mean
+            self.mean += delta * count / total
+            self._m2 += m2 + delta * delta * self.count * count / total
+        self.count += count
+
+        chunk_min, chunk_max = float(values.min()), float(values.max())
+        self.min = chunk_min if np.isnan(self.min) else min(self.min, chunk_min)
+        self.max = chunk_max if np.isnan(self.max) else max(self.max, chunk_max)
+        self._addHistogram(values, chunk_min, chunk_max)
+
+    def _addHistogram(self, values, chunk_min, chunk_max):
+        if self._lower is None:
+            self._lower = chunk_min
+            span = chunk_max - chunk_min
+            self._width = span / self.bins if span > 0 else max(abs(chunk_min), 1.0) * 1e-9
+        # double the histogram range until it covers the chunk
+        while chunk_max > self._lower + self._width * self.bins:
+            self._mergeBins(extend_lower=False)
+        while chunk_min < self._lower:
+            self._mergeBins(extend_lower=True)
+
+        bin_index = np.clip(((values - self._lower) / self._width).astype(np.int64), 0, self.bins - 1)
+        self._histogram += np.bincount(bin_index, minlength=self.bins)
+
+    def _mergeBins(self, extend_lower):
+        merged = self._histogram.reshape(-1, 2).sum(axis=1)
+        half = self.bins // 2
+        if extend_lower:
+            self._histogram = np.concatenate((np.zeros(half, dtype=np.int64), merged))
+            self._lower -= self._width * self.bins
+        else:
+            self._histogram = np.concatenate((merged, np.zeros(half, dtype=np.int64)))
+        self._width *= 2
+
+    def percentile(self, q):
+        """
+        Get percentiles from the histogram, interpolated inside the bins.
+        :param q: Percentile or sequence of percentiles in the range 0 to 100
+        :return: float or array like q, NaN without values
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)[()]
+        cumulative = np.cumsum(self._histogram)
+        rank = q / 100 * (self.count - 1)
+        # first bin whose cumulative count exceeds the rank
+        bin_index = np.clip(np.searchsorted(cumulative, rank, side="right"), 0, self.bins - 1)
+        before = np.where(bin_index > 0, cumulative[bin_index - 1], 0)
+        in_bin = np.maximum(self._histogram[bin_index], 1)
+        fraction = np.clip((rank - before + 0.5) / in_bin, 0, 1)
+        value = self._lower + (bin_index + fraction) * self._width
+        value = np.clip(value, self.min, self.max)
+        # the extreme percentiles are known exactly
+        value = np.where(q <= 0, self.min, np.where(q >= 100, self.max, value))
+        return value[()]
+
+
+def providerMinMax(min_max):
+    """
+    Convert the min and max of a field served by a data provider, e.g. from QgsVectorLayer.minimumAndMaximumValue.
+    :param min_max: (min, max) of the provider
+    :return: (min, max) floats, or None if the provider has no min and max, e.g. None or NULL values of providers
+        without an index or cached min and max. The values of the features have to be read in that case.
+    """
+    try:
+        minimum, maximum = (float(value) for value in min_max)
+    except (TypeError, ValueError):
+        return None
+    if not (np.isfinite(minimum) and np.isfinite(maximum)):
+        return None
+    return minimum, maximum
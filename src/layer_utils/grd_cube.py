@@ -0,0 +1,211 @@
+import os
+import json
+import numpy as np
+
+from .date_utils import datesFromStrings
+
+CUBE_FILE_NAME = "insar_explorer_cube.dat"
+HEADER_FILE_NAME = "insar_explorer_cube.json"
+CUBE_VERSION = 1
+
+
+def getCubePaths(directory) -> (str, str):
+    """
+    Get the paths of the compiled cube and its header in a grd time series directory.
+    :param directory: Directory of the grd time series files
+    :return: cube file path, header file path
+    """
+    return os.path.join(directory, CUBE_FILE_NAME), os.path.join(directory, HEADER_FILE_NAME)
+
+
+def signatureToHeader(signature) -> list:
+    """Convert a grd stack signature to a JSON serializable list that does not depend on the directory location."""
+    return [[os.path.basename(file_path), int(mtime), int(size)] for file_path, mtime, size in signature]
+
+
+def findCompiledCube(directory, signature=None):
+    """
+    Find a compiled cube next to the grd time series files.
+    :param directory: Directory of the grd time series files
+    :param signature: Signature of the grd files. If given, a cube compiled from other files is ignored.
+    :return: GrdCube or None if no valid cube is found
+    """
+    cube_path, header_path = getCubePaths(directory)
+    if not (os.path.isfile(cube_path) and os.path.isfile(header_path)):
+        return None
+
+    try:
+        cube = GrdCube(header_path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+    if signature is not None and cube.source_signature != signatureToHeader(signature):
+        cube.close()
+        return None
+
+    return cube
+
+
+def compileGrdCube(stack, *, block_size=64, memory_limit=256, progress_callback=None) -> str:
+    """
+    Convert a grd stack to a pixel-major cube on disk.
+    The cube is split into square blocks of pixels. Inside each block, the values of a pixel for all dates are stored
+    contiguously, so that the time series of a pixel is read with one contiguous read.
+    :param stack: GrdStack to compile
+    :param block_size: Size of the square pixel blocks
+    :param memory_limit: int in Mb, maximum size of the data read from the grd files at once
+    :param progress_callback: Function called with the progress in percent. Compilation stops if it returns False.
+    :return: Path of the cube header or an empty string if the compilation was cancelled
+    """
+    dataset = stack.dataset
+    x_size = dataset.RasterXSize
+    y_size = dataset.RasterYSize
+    num_bands = dataset.RasterCount
+    num_blocks_y = -(-y_size // block_size)
+    num_blocks_x = -(-x_size // block_size)
+
+    nodata_values = [dataset.GetRasterBand(i).GetNoDataValue() for i in range(1, num_bands + 1)]
+
+    # number of blocks read from the stack at once
+    block_bytes = block_size * block_size * num_bands * np.dtype(np.float32).itemsize
+    blocks_per_chunk = int(np.clip(memory_limit * 1024 * 1024 // block_bytes, 1, num_blocks_x))
+
+    cube_path, header_path = getCubePaths(stack.directory)
+    tmp_cube_path = cube_path + ".tmp"
+    total_steps = num_blocks_y * (-(-num_blocks_x // blocks_per_chunk))
+    step = 0
+    cube = None
+    completed = False
+    try:
+        cube = np.memmap(tmp_cube_path, dtype=np.float32, mode="w+",
+                         shape=(num_blocks_y, num_blocks_x, block_size, block_size, num_bands))
+        for block_y in range(num_blocks_y):
+            y_off = block_y * block_size
+            y_count = min(block_size, y_size - y_off)
+            for block_x in range(0, num_blocks_x, blocks_per_chunk):
+                n_blocks = min(blocks_per_chunk, num_blocks_x - block_x)
+                x_off = block_x * block_size
+                x_count = min(n_blocks * block_size, x_size - x_off)
+
+                data = stack.readWindow(x_off, y_off, x_count, y_count).astype(np.float32, copy=False)
+                data = data.reshape(num_bands, y_count, x_count)
+                for i, nodata in enumerate(nodata_values):
+                    if nodata is not None and np.isfinite(nodata):
+                        data[i][data[i] == nodata] = np.nan
+
+                padded = np.full((num_bands, block_size, n_blocks * block_size), np.nan, dtype=np.float32)
+                padded[:, :y_count, :x_count] = data
+                # (bands, rows, blocks, cols) -> (blocks, rows, cols, bands)
+                padded = padded.reshape(num_bands, block_size, n_blocks, block_size).transpose(2, 1, 3, 0)
+                cube[block_y, block_x:block_x + n_blocks] = padded
+
+                step += 1
+                if progress_callback is not None:
+                    if progress_callback(100 * step / total_steps) is False:
+                        raise InterruptedError
+        cube.flush()
+        cube = None  # release the memmap before renaming its file
+
+        header = {
+            "version": CUBE_VERSION,
+            "width": x_size,
+            "height": y_size,
+            "bands": num_bands,
+            "block_size": block_size,
+            "dtype": "float32",
+            "nodata": "nan",
+            "geotransform": list(dataset.GetGeoTransform()),
+            "projection": dataset.GetProjection(),
+            "band_names": list(stack.band_names),
+            "source_files": signatureToHeader(stack.signature),
+        }
+        os.replace(tmp_cube_path, cube_path)
+        completed = True
+    except InterruptedError:
+        return ""
+    finally:
+        # a canceled or failed compilation, e.g. by a read error or a full disk, leaves no partial cube behind
+        cube = None
+        if not completed and os.path.exists(tmp_cube_path):
+            os.remove(tmp_cube_path)
+
+    with open(header_path, "w") as f:
+        json.dump(header, f, indent=1)
+
+    return header_path
+
+
+class GrdCube:
+    """
+    Read-only access to a compiled pixel-major cube of a grd time series.
+
+    Attributes:
+        directory: Directory of the cube.
+        band_names: Band names in the format 'DYYYYMMDD'.
+        dates: Dates of the bands as datetime64[D] array.
+        source_signature: Name, modification time and size of the grd files the cube was compiled from.
+    """
+    def __init__(self, header_path):
+        with open(header_path) as f:
+            header = json.load(f)
+        if header["version"] != CUBE_VERSION:
+            raise ValueError(f"Unsupported cube version: {header['version']}")
+
+        self.directory = os.path.dirname(header_path)
+        self.x_size = int(header["width"])
+        self.y_size = int(header["height"])
+        self.num_bands = int(header["bands"])
+        self.block_size = int(header["block_size"])
+        self.geo_transform = tuple(header["geotransform"])
+        self.projection = header.get("projection", "")
+        self.band_names = header["band_names"]
+        self.source_signature = header["source_files"]
+        self.dates = datesFromStrings([band_name[1:] for band_name in self.band_names])
+
+        num_blocks_y = -(-self.y_size // self.block_size)
+        num_blocks_x = -(-self.x_size // self.block_size)
+        cube_path, _ = getCubePaths(self.directory)
+        self.data = np.memmap(cube_path, dtype=np.dtype(header["dtype"]), mode="r",
+                              shape=(num_blocks_y, num_blocks_x, self.block_size, self.block_size, self.num_bands))
+
+    def close(self):
+        self.data = None
+
+    def pixelFromPoint(self, x, y) -> (int, int):
+        """
+        Get the pixel indices of a point in the cube coordinates.
+        :return: pixel column, pixel row or (None, None) if the point is outside the cube
+        """
+        x0, dx, rx, y0, ry, dy = self.geo_transform
+        det = dx * dy - rx * ry
+        if det == 0:
+            return None, None
+        px = int(np.floor((dy * (x - x0) - rx * (y - y0)) / det))
+        py = int(np.floor((dx * (y - y0) - ry * (x - x0)) / det))
+        if not (0 <= px < self.x_size and 0 <= py < self.y_size):
+            return None, None
+        return px, py
+
+    def readPixel(self, px, py) -> np.ndarray:
+        """Read the time series of one pixel with a single contiguous read."""
+        bs = self.block_size
+        return np.array(self.data[py // bs, px // bs, py % bs, px % bs, :])
+
+    def readWindow(self, x_off, y_off, x_count, y_count) -> np.ndarray:
+        """
+        Read the time series of a pixel window.
+        :return: Array with shape (bands, rows, columns)
+        """
+        bs = self.block_size
+        out = np.empty((self.num_bands, y_count, x_count), dtype=self.data.dtype)
+        for block_y in range(y_off // bs, (y_off + y_count - 1) // bs + 1):
+            row_start = max(y_off, block_y * bs)
+            row_end = min(y_off + y_count, (block_y + 1) * bs)
+            for block_x in range(x_off // bs, (x_off + x_count - 1) // bs + 1):
+                col_start = max(x_off, block_x * bs)
+                col_end = min(x_off + x_count, (block_x + 1) * bs)
+                block = self.data[block_y, block_x,
+                                  row_start - block_y * bs:row_end - block_y * bs,
+                                  col_start - block_x * bs:col_end - block_x * bs, :]
+                out[:, row_start - y_off:row_end - y_off, col_start - x_off:col_end - x_off] = block.transpose(2, 0, 1)
+        return out
@@ -2,6 +2,17 @@ import os
 import re
 from osgeo import gdal
 from ..qt_compat import VECTOR_LAYER
+from .layer_capabilities import LayerCapabilityCache
+
+GRD_FILE_PATTERN = re.compile(r'^\d{8}_.*\.grd$|timeseries-\d{8}.*\.grd$')
+
+# time series cubes with one band per date, e.g. MintPy timeseries.h5 or NetCDF cubes
+CUBE_DRIVERS = ['netCDF', 'HDF5', 'HDF5Image']
+CUBE_EXTENSIONS = ['.h5', '.he5', '.nc', '.nc4']
+CUBE_FILE_PATTERN = re.compile(r'^(geo_)?timeseries.*\.(h5|he5|nc)$')
+
+# results of the layer checks, shared by all call sites
+layer_capabilities = LayerCapabilityCache()
 
 
 def checkGrdLayer(layer):
@@ -16,18 +27,29 @@ def checkGrdLayer(layer):
                    '</span>')
         return False, message
 
+    capabilities = layer_capabilities.get(layer, _unwrap_netcdf_path(layer.source()))
+    if capabilities.grd_status is None:
+        capabilities.grd_status = _checkGrdDriver(layer, capabilities)
+    return capabilities.grd_status
+
+
+def _checkGrdDriver(layer, capabilities):
     file_path = layer.source()
     dataset = gdal.Open(file_path)
 
     if dataset is None:
+        capabilities.driver = ""
         message = '<span style="color:red;">Invalid Layer: Unable to open the file with GDAL.</span>'
         return False, message
 
     driver = dataset.GetDriver().ShortName
+    capabilities.driver = driver
     if driver in ['netCDF', 'GMT']:  # for GMTSAR and MintPy files converted to grd
         return True, ""
+    elif driver in CUBE_DRIVERS:  # for MintPy HDF5 files and time series cubes
+        return True, ""
     else:
-        message = '<span style="color:red;">Invalid Layer: The file is not a GMT grd file.</span>'
+        message = '<span style="color:red;">Invalid Layer: The file is not a GMT grd or time series cube file.</span>'
         return False, message
 
 
@@ -38,13 +60,21 @@ def checkGrdTimeseries(layer):
     if status is False:
         return status, message
 
+    capabilities = layer_capabilities.get(layer, _unwrap_netcdf_path(layer.source()))
+    if capabilities.timeseries_status is None:
+        capabilities.timeseries_status = _checkGrdTimeseriesFiles(layer, capabilities)
+    return capabilities.timeseries_status
+
+
+def _checkGrdTimeseriesFiles(layer, capabilities):
+    message = ""
     file_path = layer.source()
 
     # remove NETCDF: wrapper if present and get an actual filesystem path
     file_path = _unwrap_netcdf_path(file_path)
 
-    directory = os.path.dirname(file_path)
-    pattern = re.compile(r'^\d{8}_.*\.grd$|timeseries-\d{8}.*\.grd$')
+    directory = getLayerStackDirectory(layer)
+    pattern = GRD_FILE_PATTERN
 
     try:
         grd_files = [f for f in os.listdir(directory) if pattern.match(f)]
@@ -56,6 +86,8 @@ def checkGrdTimeseries(layer):
 
     if count > 0:
         status = True
+    elif getTimeseriesCubeSource(layer.source()) or findTimeseriesCubeFile(directory):
+        status = True
     else:
         message = ('<span style="color:red;">Invalid Layer: Please select a vector or raster layer with valid '
                    'timeseries data.')
@@ -64,19 +96,80 @@ def checkGrdTimeseries(layer):
     return status, message
 
 
-def getGrdInfo(directory) -> (list, list):
+def getLayerStackDirectory(layer) -> str:
     """
-    Get the list of grd time series files and their dates
+    Get the directory of the time series files of a raster layer. It is resolved once per layer and kept with the
+    layer capabilities, so that clicks, preloading and compiling do not resolve it again.
+    """
+    capabilities = layer_capabilities.get(layer, _unwrap_netcdf_path(layer.source()))
+    if capabilities.stack_directory is None:
+        capabilities.stack_directory = getGrdDirectory(layer.source())
+    return capabilities.stack_directory
+
+
+def getTimeseriesCubeSource(source) -> str:
     """
-    pattern = re.compile(r'^\d{8}_.*\.grd$|timeseries-\d{8}.*\.grd$')
+    Get the GDAL source of a time series cube with one band per date, e.g. a NetCDF variable with a time dimension or
+    the timeseries dataset of a MintPy HDF5 file.
+    :param source: Layer source or file path
+    :return: GDAL source of the cube or an empty string if the source is not a time series cube
+    """
+    file_path = _unwrap_netcdf_path(source)
+    if os.path.splitext(file_path)[1].lower() not in CUBE_EXTENSIONS:
+        return ""
+
+    dataset = gdal.Open(source)
+    if dataset is None or dataset.GetDriver().ShortName not in CUBE_DRIVERS:
+        return ""
+    if dataset.RasterCount > 1:
+        return source
+
+    # container file: use its time series subdataset, e.g. HDF5:"/path/to/timeseries.h5"://timeseries
+    for subdataset_name, _ in dataset.GetSubDatasets():
+        if re.search(r'[:/]timeseries$', subdataset_name):
+            subdataset = gdal.Open(subdataset_name)
+            if subdataset is not None and subdataset.RasterCount > 1:
+                return subdataset_name
+    return ""
+
+
+def findTimeseriesCubeFile(directory) -> str:
+    """
+    Find a MintPy time series cube (e.g. timeseries.h5 or geo_timeseries_ERA5_demErr.h5) in a directory.
+    If there are several cubes, the most recently modified one is used, which is typically the most corrected one.
+    :return: File path or an empty string if no cube is found
+    """
+    try:
+        cube_files = [os.path.join(directory, f) for f in os.listdir(directory) if CUBE_FILE_PATTERN.match(f)]
+    except OSError:
+        return ""
+    if not cube_files:
+        return ""
+    return max(cube_files, key=os.path.getmtime)
 
+
+def getGrdDirectory(path) -> str:
+    """
+    Get the directory of the grd time series files from a layer source, file path or directory.
+    """
     # remove NETCDF: wrapper if present and get actual filesystem path
-    directory = _unwrap_netcdf_path(directory)
+    directory = _unwrap_netcdf_path(path)
 
     # If a file path was passed instead of a directory, use its containing directory
     if os.path.isfile(directory):
         directory = os.path.dirname(directory)
 
+    return os.path.abspath(directory)
+
+
+def getGrdInfo(directory) -> (list, list):
+    """
+    Get the list of grd time series files and their dates
+    """
+    pattern = GRD_FILE_PATTERN
+
+    directory = getGrdDirectory(directory)
+
     if not os.path.isdir(directory):
         return [], []
 
@@ -112,14 +205,15 @@ def _unwrap_netcdf_path(uri: str) -> str:
     """
     If uri is a GDAL NETCDF-style string (e.g. NETCDF:"/path/to/file.nc":var),
     return the inner path (/path/to/file.nc). Otherwise return uri unchanged.
+    HDF5 subdataset strings (e.g. HDF5:"/path/to/timeseries.h5"://timeseries) are unwrapped the same way.
 
     Also handles simple NETCDF:/path/without/quotes fallback and Windows paths.
     """
     if not isinstance(uri, str):
         return uri
 
-    prefix = 'NETCDF:'
-    if not uri.startswith(prefix):
+    prefix = next((prefix for prefix in ('NETCDF:', 'HDF5:') if uri.startswith(prefix)), None)
+    if prefix is None:
         return uri
 
     # remainder after the NETCDF: prefix
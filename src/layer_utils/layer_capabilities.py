@@ -0,0 +1,103 @@
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class LayerCapabilities:
+    """
+    Results of the checks of a layer. Fields that are None have not been checked yet.
+
+    Attributes:
+        layer_type: QGIS layer type.
+        driver: GDAL driver short name of a raster layer, or an empty string if GDAL cannot open the layer.
+        grd_status: (status, message) of checkGrdLayer.
+        timeseries_status: (status, message) of checkGrdTimeseries.
+        stack_directory: Directory of the time series files of a raster layer.
+    """
+    layer_type: Optional[int] = None
+    driver: Optional[str] = None
+    grd_status: Optional[tuple] = None
+    timeseries_status: Optional[tuple] = None
+    stack_directory: Optional[str] = None
+
+
+def getSourceModificationTimes(file_path) -> tuple:
+    """
+    Get the modification times of a layer file and its directory.
+    Adding or removing time series files changes the directory modification time.
+    :return: (file mtime, directory mtime), None for paths that do not exist (e.g. database sources)
+    """
+    mtimes = []
+    for path in (file_path, os.path.dirname(file_path)):
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except (OSError, ValueError):
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+class LayerCapabilityCache:
+    """
+    Cache of layer checks keyed by layer id.
+
+    The checks of raster layers open the layer file with GDAL and list the time series files in its directory. They
+    are run on every click and on every change of the symbology range, so their results are cached. A cached entry is
+    reused as long as the layer source and the modification times of the layer file and its directory are unchanged.
+    Entries are removed when the layer is modified or deleted.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._connected_layers = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, layer, file_path) -> LayerCapabilities:
+        """
+        Get the cached capabilities of a layer. A new empty entry is created if the layer changed.
+        :param layer: QgsMapLayer
+        :param file_path: File path of the layer source
+        :return: LayerCapabilities, whose fields are filled by the layer checks
+        """
+        layer_id = layer.id()
+        key = (layer.source(), getSourceModificationTimes(file_path))
+        with self._lock:
+            entry = self._entries.get(layer_id)
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            capabilities = LayerCapabilities(layer_type=layer.type())
+            self._entries[layer_id] = (key, capabilities)
+
+        self._connectLayer(layer)
+        return capabilities
+
+    def _connectLayer(self, layer):
+        layer_id = layer.id()
+        if layer_id in self._connected_layers:
+            return
+        self._connected_layers.add(layer_id)
+        layer.willBeDeleted.connect(lambda: self.invalidate(layer_id, disconnect=True))
+        for signal_name in ("layerModified", "dataSourceChanged", "dataChanged"):
+            signal = getattr(layer, signal_name, None)
+            if signal is not None:
+                signal.connect(lambda *args: self.invalidate(layer_id))
+
+    def invalidate(self, layer_id, disconnect=False):
+        with self._lock:
+            self._entries.pop(layer_id, None)
+        if disconnect:
+            self._connected_layers.discard(layer_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {"layers": len(self._entries), "hits": self.hits, "misses": self.misses}
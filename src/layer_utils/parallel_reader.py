@@ -0,0 +1,87 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from osgeo import gdal
+
+
+class ParallelStackReader:
+    """
+    Read pixel windows of a stack of single-band raster files concurrently.
+
+    The files are split into one contiguous chunk per worker. Each chunk keeps its own GDAL dataset handles, so that
+    every file is opened only once and no handle is used by two threads at the same time. GDAL releases the GIL while
+    reading and decompressing, so the chunks are read in parallel.
+
+    Attributes:
+        raster_file_paths: List of raster file paths, one band per file.
+        workers: Number of threads used for reading.
+    """
+    def __init__(self, raster_file_paths, workers=4, dtype=np.float32):
+        self.raster_file_paths = list(raster_file_paths)
+        self.workers = int(max(1, min(workers, len(self.raster_file_paths))))
+        self.dtype = dtype
+        chunk_bounds = np.linspace(0, len(self.raster_file_paths), self.workers + 1).astype(int)
+        self._chunks = [(int(start), int(end)) for start, end in zip(chunk_bounds[:-1], chunk_bounds[1:])]
+        self._chunk_datasets = [{} for _ in self._chunks]
+        self._executor = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _band(self, chunk_index, file_index):
+        datasets = self._chunk_datasets[chunk_index]
+        dataset = datasets.get(file_index)
+        if dataset is None:
+            dataset = gdal.Open(self.raster_file_paths[file_index])
+            if dataset is None:
+                raise IOError(f"Unable to open {self.raster_file_paths[file_index]} with GDAL.")
+            datasets[file_index] = dataset
+        return dataset.GetRasterBand(1)
+
+    def _readChunk(self, chunk_index, out, x_off, y_off, x_count, y_count):
+        start, end = self._chunks[chunk_index]
+        for file_index in range(start, end):
+            band = self._band(chunk_index, file_index)
+            # a failed read leaves the buffer uninitialized, the window must not be used or cached
+            if band.ReadAsArray(x_off, y_off, x_count, y_count, buf_obj=out[file_index]) is None:
+                raise IOError(f"Unable to read window ({x_off}, {y_off}, {x_count}, {y_count}) of "
+                              f"{self.raster_file_paths[file_index]} with GDAL.")
+            nodata = band.GetNoDataValue()
+            if nodata is not None and np.isfinite(nodata):
+                out[file_index][out[file_index] == nodata] = np.nan
+
+    def readWindow(self, x_off, y_off, x_count, y_count) -> np.ndarray:
+        """
+        Read a pixel window of all files.
+        :return: Array with shape (bands, rows, columns)
+        :raises IOError: if a file cannot be opened or read, or if the reader is closed
+        """
+        out = np.empty((len(self.raster_file_paths), y_count, x_count), dtype=self.dtype)
+        with self._lock:
+            if self._closed:
+                # e.g. a cancelled preloading task that still reads while the stack cache is cleared
+                raise IOError("The reader of the stack is closed.")
+            if self._executor is None:
+                for i in range(len(self._chunks)):
+                    self._readChunk(i, out, x_off, y_off, x_count, y_count)
+            else:
+                futures = [self._executor.submit(self._readChunk, i, out, x_off, y_off, x_count, y_count)
+                           for i in range(len(self._chunks))]
+                for future in futures:
+                    future.result()
+        return out
+
+    def readPixel(self, px, py) -> np.ndarray:
+        """Read the values of one pixel of all files."""
+        return self.readWindow(px, py, 1, 1)[:, 0, 0]
+
+    def close(self):
+        """
+        Stop the worker threads and close all dataset handles.
+        The lock waits for a running read, so the stack can be closed while a background task is reading it.
+        """
+        with self._lock:
+            self._closed = True
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            self._chunk_datasets = [{} for _ in self._chunks]
@@ -0,0 +1,78 @@
+import numpy as np
+
+
+def _ringArrays(ring) -> (np.ndarray, np.ndarray):
+    ring = np.asarray(ring, dtype=np.float64).reshape(-1, 2)
+    return ring[:, 0], ring[:, 1]
+
+
+def _ringEdges(ring):
+    """Iterate over the edges (x1, y1, x2, y2) of a ring, skipping edges of zero length."""
+    ring_x, ring_y = _ringArrays(ring)
+    for x1, y1, x2, y2 in zip(ring_x, ring_y, np.roll(ring_x, -1), np.roll(ring_y, -1)):
+        if x1 != x2 or y1 != y2:
+            yield x1, y1, x2, y2
+
+
+def pointsInPolygon(x, y, rings) -> np.ndarray:
+    """
+    Test whether points are inside a polygon or on its boundary, matching the result of a GEOS intersects test.
+
+    A ray is cast from each point in +x direction and its crossings with the edges of all rings are counted, so that
+    holes are excluded by the even-odd rule. Edges are half-open in y, so that a ray through a vertex is counted once
+    and horizontal edges are not counted. The side of an edge is taken from the sign of a cross product, which is
+    zero for points on the edge. The points are sorted by y, so that each edge only tests the points within its
+    y range.
+    :param x, y: Arrays of point coordinates
+    :param rings: Exterior ring followed by the interior rings (holes), each a sequence of (x, y) vertices
+    :return: Boolean array
+    """
+    shape = np.shape(x)
+    x = np.asarray(x, dtype=np.float64).ravel()
+    y = np.asarray(y, dtype=np.float64).ravel()
+    order = np.argsort(y, kind="stable")
+    sorted_x, sorted_y = x[order], y[order]
+    crossings = np.zeros(len(order), dtype=np.int64)
+    on_boundary = np.zeros(len(order), dtype=bool)
+
+    for ring in rings:
+        for x1, y1, x2, y2 in _ringEdges(ring):
+            start = np.searchsorted(sorted_y, min(y1, y2), side="left")
+            end = np.searchsorted(sorted_y, max(y1, y2), side="right")
+            if start == end:
+                continue
+            px, py = sorted_x[start:end], sorted_y[start:end]
+            cross = (x2 - x1) * (py - y1) - (y2 - y1) * (px - x1)
+            on_boundary[start:end] |= (cross == 0) & (px >= min(x1, x2)) & (px <= max(x1, x2))
+            crossings[start:end] += ((y1 > py) != (y2 > py)) & (cross * (y2 - y1) > 0)
+
+    inside = np.empty(len(order), dtype=bool)
+    inside[order] = (crossings % 2 == 1) | on_boundary
+    return inside.reshape(shape)
+
+
+def pointsInPolygons(x, y, polygons) -> np.ndarray:
+    """
+    Test whether points are inside any polygon of a multi polygon or on its boundary.
+    :param x, y: Arrays of point coordinates
+    :param polygons: Sequence of polygons, each a sequence of rings as in pointsInPolygon
+    :return: Boolean array
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    inside = np.zeros(x.shape, dtype=bool)
+    for rings in polygons:
+        if not rings:
+            continue
+        # only test the points in the bounding box of the exterior ring
+        ring_x, ring_y = _ringArrays(rings[0])
+        candidates = np.flatnonzero(~inside & (x >= ring_x.min()) & (x <= ring_x.max())
+                                    & (y >= ring_y.min()) & (y <= ring_y.max()))
+        inside[candidates] = pointsInPolygon(x[candidates], y[candidates], rings)
+    return inside
+
+
+def polygonsBounds(polygons) -> (float, float, float, float):
+    """Get the bounding box (x min, y min, x max, y max) of the exterior rings of polygons."""
+    exteriors = np.concatenate([np.asarray(rings[0], dtype=np.float64).reshape(-1, 2) for rings in polygons if rings])
+    return exteriors[:, 0].min(), exteriors[:, 1].min(), exteriors[:, 0].max(), exteriors[:, 1].max()
@@ -0,0 +1,114 @@
+import sqlite3
+import numpy as np
+from osgeo import ogr, osr
+
+SOURCE_ID_FIELD = "source_fid"
+POINT_TABLE_NAME = "points"
+
+# GeoPackage geometry blob of a point: header without envelope followed by a little-endian WKB point
+GPKG_POINT_DTYPE = np.dtype([("magic", "S2"), ("version", "u1"), ("flags", "u1"), ("srs_id", "<i4"),
+                             ("byte_order", "u1"), ("wkb_type", "<u4"), ("x", "<f8"), ("y", "<f8")])
+
+
+def _quote(name) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def pointGeometryBlobs(x, y, srs_id) -> list:
+    """
+    Encode point coordinates as GeoPackage geometry blobs in one vectorized pass.
+    :param x: x coordinates, NaN for features without geometry
+    :param y: y coordinates
+    :param srs_id: Spatial reference id of the GeoPackage table
+    :return: List of bytes, None for features without geometry
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    records = np.empty(len(x), dtype=GPKG_POINT_DTYPE)
+    records["magic"] = b"GP"
+    records["version"] = 0
+    records["flags"] = 1  # little-endian header, no envelope
+    records["srs_id"] = srs_id
+    records["byte_order"] = 1
+    records["wkb_type"] = ogr.wkbPoint
+    records["x"] = x
+    records["y"] = y
+    blobs = records.view(f"V{GPKG_POINT_DTYPE.itemsize}").tolist()
+    for i in np.flatnonzero(~(np.isfinite(x) & np.isfinite(y))).tolist():
+        blobs[i] = None
+    return blobs
+
+
+def writePointGeoPackage(file_path, crs_wkt, feature_ids, x, y, field_values: dict, table_name=POINT_TABLE_NAME,
+                         progress_callback=None, chunk_size=100000) -> bool:
+    """
+    Write columns of points to a new GeoPackage, e.g. in a background task.
+
+    The table is created with OGR and filled with bulk inserts of chunks of rows, without building a feature object
+    per point. The spatial index is built once after all rows are written.
+    :param file_path: Path of the new GeoPackage
+    :param crs_wkt: WKT of the coordinate reference system of the points
+    :param feature_ids: Ids of the source features, written to the SOURCE_ID_FIELD field
+    :param x: x coordinates, NaN for features without geometry
+    :param y: y coordinates
+    :param field_values: Arrays of values by field name, written as real fields. NaN values become NULL.
+    :param table_name: Name of the table of the points
+    :param progress_callback: Function called with the progress in percent. Writing stops if it returns False.
+    :param chunk_size: Number of rows inserted at once
+    :return: True if written, False if canceled
+    :raises IOError: If the GeoPackage cannot be created
+    """
+    dataset = ogr.GetDriverByName("GPKG").CreateDataSource(file_path)
+    if dataset is None:
+        raise IOError(f"Unable to create {file_path} with OGR.")
+    srs = None
+    if crs_wkt:
+        srs = osr.SpatialReference()
+        srs.ImportFromWkt(crs_wkt)
+    layer = dataset.CreateLayer(table_name, srs, ogr.wkbPoint, options=["SPATIAL_INDEX=NO", "GEOMETRY_NAME=geom"])
+    if layer is None:
+        raise IOError(f"Unable to create the table {table_name} in {file_path} with OGR.")
+    layer.CreateField(ogr.FieldDefn(SOURCE_ID_FIELD, ogr.OFTInteger64))
+    for field_name in field_values:
+        layer.CreateField(ogr.FieldDefn(field_name, ogr.OFTReal))
+    dataset = layer = None  # close the dataset before writing the rows with sqlite
+
+    feature_ids = np.asarray(feature_ids, dtype=np.int64)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    columns = [np.asarray(values, dtype=np.float64) for values in field_values.values()]
+    column_names = ["geom", SOURCE_ID_FIELD] + list(field_values)
+    insert = (f"INSERT INTO {_quote(table_name)} ({', '.join(_quote(name) for name in column_names)}) "
+              f"VALUES ({', '.join('?' * len(column_names))})")
+
+    connection = sqlite3.connect(file_path)
+    try:
+        srs_id = connection.execute("SELECT srs_id FROM gpkg_geometry_columns WHERE table_name = ?",
+                                    (table_name,)).fetchone()[0]
+        num_features = len(feature_ids)
+        for start in range(0, num_features, chunk_size):
+            end = min(start + chunk_size, num_features)
+            blobs = pointGeometryBlobs(x[start:end], y[start:end], srs_id)
+            # sqlite stores NaN values as NULL
+            connection.executemany(insert, zip(blobs, feature_ids[start:end].tolist(),
+                                               *(values[start:end].tolist() for values in columns)))
+            if progress_callback and progress_callback(100 * end / num_features) is False:
+                connection.rollback()
+                return False
+        finite = np.isfinite(x) & np.isfinite(y)
+        if finite.any():
+            connection.execute("UPDATE gpkg_contents SET min_x = ?, min_y = ?, max_x = ?, max_y = ? "
+                               "WHERE table_name = ?",
+                               (float(np.min(x[finite])), float(np.min(y[finite])), float(np.max(x[finite])),
+                                float(np.max(y[finite])), table_name))
+        connection.commit()
+    finally:
+        connection.close()
+
+    dataset = ogr.Open(file_path, 1)
+    if dataset is not None:
+        result = dataset.ExecuteSQL(f"SELECT CreateSpatialIndex('{table_name}', 'geom')")
+        if result is not None:
+            dataset.ReleaseResultSet(result)
+        dataset = None
+    return True
@@ -1,9 +1,130 @@
 import os
-from datetime import datetime
+import threading
 import numpy as np
-from osgeo import gdal
+from osgeo import gdal, ogr
 
 from . import grd_layer as grd_layer_utils
+from . import grd_cube as grd_cube_utils
+from . import timeseries_cube as timeseries_cube_utils
+from .date_utils import datesFromStrings
+from .tile_cache import TileCache
+from .band_reader import BandReader
+from .parallel_reader import ParallelStackReader
+from .zonal_stats import ZonalStatistics, zonalMemoryBudget
+
+
+def emptyTimeseries() -> (np.ndarray, np.ndarray):
+    """Return empty dates and values arrays for a point without time series data."""
+    return np.array([], dtype='datetime64[D]'), np.array([], dtype=np.float64)
+
+
+def maskedTimeseries(dates, values) -> (np.ndarray, np.ndarray):
+    """
+    Remove the dates without valid values from a time series.
+    :param dates: datetime64 array of band dates
+    :param values: Array of values with NaN for missing data
+    :return: dates as datetime64[D] array, values as float64 array
+    """
+    values = np.asarray(values, dtype=np.float64)
+    mask = np.isfinite(values)
+    return np.asarray(dates, dtype='datetime64[D]')[mask], values[mask]
+
+
+def polygonWindow(geo_transform, extent, x_size, y_size):
+    """
+    Get the pixel window covering the bounding box of a polygon.
+    :param geo_transform: GDAL geotransform of the raster
+    :param extent: Bounding box of the polygon as (x min, y min, x max, y max) in the raster coordinates
+    :param x_size: Number of raster columns
+    :param y_size: Number of raster rows
+    :return: x offset, y offset, x count, y count or None if the polygon is outside the raster
+    """
+    inv_transform = gdal.InvGeoTransform(geo_transform)
+    x_min, y_min, x_max, y_max = extent
+    corners = [gdal.ApplyGeoTransform(inv_transform, x, y) for x in (x_min, x_max) for y in (y_min, y_max)]
+    px = [corner[0] for corner in corners]
+    py = [corner[1] for corner in corners]
+    x_start = max(0, int(np.floor(min(px))))
+    y_start = max(0, int(np.floor(min(py))))
+    x_end = min(x_size, int(np.ceil(max(px))))
+    y_end = min(y_size, int(np.ceil(max(py))))
+    if x_end <= x_start or y_end <= y_start:
+        return None
+    return x_start, y_start, x_end - x_start, y_end - y_start
+
+
+def createPolygonLayer(polygon_wkt):
+    """
+    Create an in-memory OGR layer with one polygon for rasterization.
+    :param polygon_wkt: WKT of the polygon in the raster coordinates
+    :return: OGR data source and layer. The data source must be kept alive while the layer is used.
+    """
+    data_source = ogr.GetDriverByName("Memory").CreateDataSource("")
+    ogr_layer = data_source.CreateLayer("polygon", geom_type=ogr.wkbPolygon)
+    feature = ogr.Feature(ogr_layer.GetLayerDefn())
+    feature.SetGeometry(ogr.CreateGeometryFromWkt(polygon_wkt))
+    ogr_layer.CreateFeature(feature)
+    return data_source, ogr_layer
+
+
+def rasterizePolygon(ogr_layer, geo_transform, x_off, y_off, x_count, y_count) -> np.ndarray:
+    """
+    Rasterize a polygon layer to a mask of a pixel window. Pixels with their center inside the polygon are masked.
+    :return: Boolean array with shape (rows, columns)
+    """
+    x0, dx, rx, y0, ry, dy = geo_transform
+    window_transform = (x0 + x_off * dx + y_off * rx, dx, rx, y0 + x_off * ry + y_off * dy, ry, dy)
+    mask_dataset = gdal.GetDriverByName("MEM").Create("", x_count, y_count, 1, gdal.GDT_Byte)
+    mask_dataset.SetGeoTransform(window_transform)
+    gdal.RasterizeLayer(mask_dataset, [1], ogr_layer, burn_values=[1])
+    return mask_dataset.GetRasterBand(1).ReadAsArray().astype(bool)
+
+
+def computePolygonStatistics(*, read_window, num_bands, geo_transform, x_size, y_size, polygon_wkt, extent,
+                             percentiles=(5, 50, 95), memory_limit=256) -> (dict, int):
+    """
+    Compute per-date statistics of the raster pixels inside a polygon.
+    Only the bounding window of the polygon is read, in blocks of rows. The memory limit is shared by the blocks with
+    their work arrays and the values kept for exact percentiles, see zonalMemoryBudget(). Blocks without pixels inside
+    the polygon are not read.
+    :param read_window: Function reading a (bands, rows, columns) pixel window
+    :param num_bands: Number of bands returned by read_window
+    :param geo_transform: GDAL geotransform of the raster
+    :param x_size: Number of raster columns
+    :param y_size: Number of raster rows
+    :param polygon_wkt: WKT of the polygon in the raster coordinates
+    :param extent: Bounding box of the polygon as (x min, y min, x max, y max)
+    :param percentiles: Percentiles in the range 0 to 100
+    :param memory_limit: int in Mb, maximum size of the data read and kept in memory
+    :return: Statistics from ZonalStatistics.result() and number of pixels inside the polygon, or (None, 0) if the
+        polygon is outside the raster
+    """
+    window = polygonWindow(geo_transform, extent, x_size, y_size)
+    if window is None:
+        return None, 0
+    x_off, y_off, x_count, y_count = window
+
+    data_source, ogr_layer = createPolygonLayer(polygon_wkt)
+    block_rows, values_limit = zonalMemoryBudget(x_count, num_bands, memory_limit)
+
+    def maskedBlocks():
+        for block_y in range(y_off, y_off + y_count, block_rows):
+            rows = min(block_rows, y_off + y_count - block_y)
+            mask = rasterizePolygon(ogr_layer, geo_transform, x_off, block_y, x_count, rows)
+            if not mask.any():
+                continue
+            data = read_window(x_off, block_y, x_count, rows)
+            yield data.reshape(num_bands, rows, x_count)[:, mask]
+
+    statistics = ZonalStatistics(num_bands, percentiles=percentiles, memory_limit=values_limit)
+    for values in maskedBlocks():
+        statistics.add(values)
+    if statistics.needsHistogramPass():
+        for values in maskedBlocks():
+            statistics.addHistogram(values)
+
+    del data_source
+    return statistics.result(), statistics.num_pixels
 
 
 def createVrtFromFiles(*, raster_file_paths, band_names=None, out_file="") -> gdal.Dataset:
@@ -30,12 +151,340 @@ def createVrtFromFiles(*, raster_file_paths, band_names=None, out_file="") -> gd
     return vrt_dataset
 
 
+def readVrtWindow(vrt_dataset, x_off, y_off, x_count, y_count) -> np.ndarray:
+    """
+    Read a pixel window of all bands of a VRT dataset.
+    :return: Array with shape (bands, rows, columns) or None if reading failed
+    """
+    data = vrt_dataset.ReadAsArray(x_off, y_off, x_count, y_count)
+    if data is None:
+        return None
+    return data.reshape(vrt_dataset.RasterCount, y_count, x_count)
+
+
+def getGrdStackSignature(raster_file_paths) -> tuple:
+    """
+    Get a signature of the grd files that changes whenever a file is added, removed or modified.
+    :param raster_file_paths: List of .grd file paths
+    :return: Tuple of (file path, modification time, file size) for each file
+    """
+    signature = []
+    for file_path in raster_file_paths:
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return ()
+        signature.append((file_path, file_stat.st_mtime_ns, file_stat.st_size))
+    return tuple(signature)
+
+
+class GrdStack:
+    """
+    Opened VRT handle and parsed metadata of a directory with grd time series files.
+
+    Attributes:
+        directory: Directory that contains the grd files.
+        raster_file_paths: Sorted list of grd file paths.
+        band_names: Band names in the format 'DYYYYMMDD'.
+        signature: File signature used to detect changes of the stack on disk.
+        cache_key: Key identifying the stack and its file signature in data caches.
+        dataset: In-memory VRT dataset with one band per date.
+        reader: Reader of pixel windows from the grd files with multiple threads.
+        dates: Dates of the bands as datetime64[D] array, parsed once per stack.
+        cube: Compiled pixel-major cube of the stack or None if the stack is not compiled.
+    """
+    def __init__(self, *, directory, raster_file_paths, band_names, signature, directory_mtime=None, workers=4):
+        self.directory = directory
+        self.raster_file_paths = raster_file_paths
+        self.band_names = band_names
+        self.signature = signature
+        self.cache_key = (directory, hash(signature))
+        self.directory_mtime = directory_mtime
+        self.dataset = createVrtFromFiles(raster_file_paths=raster_file_paths, band_names=band_names, out_file="")
+        self.reader = ParallelStackReader(raster_file_paths, workers=workers)
+        self.dates = datesFromStrings([band_name[1:] for band_name in band_names])
+        self.cube = grd_cube_utils.findCompiledCube(directory, signature)
+
+    def isValid(self) -> bool:
+        return self.dataset is not None
+
+    def readWindow(self, x_off, y_off, x_count, y_count) -> np.ndarray:
+        """
+        Read a pixel window of all dates in parallel.
+        :return: Array with shape (bands, rows, columns)
+        """
+        return self.reader.readWindow(x_off, y_off, x_count, y_count)
+
+    def close(self):
+        self.dataset = None
+        self.reader.close()
+        if self.cube is not None:
+            self.cube.close()
+            self.cube = None
+
+
+class GrdStackCache:
+    """
+    Cache of opened grd stacks keyed by directory and of opened time series cubes keyed by layer source.
+
+    A cached stack is reused as long as the list of grd files, their modification times and sizes are unchanged.
+    Otherwise, the stack is rebuilt from the files on disk. Cubes are reused as long as the cube file is unchanged.
+
+    Attributes:
+        hits: Number of requests served from the cache.
+        misses: Number of requests that required building a new VRT.
+    """
+    def __init__(self, workers=4):
+        """
+        :param workers: Number of threads used for reading the grd files of a stack
+        """
+        self.workers = workers
+        self._stacks = {}
+        self._cubes = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def getStack(self, source, directory=None):
+        """
+        Get the cached time series of a layer source or build a new one if the files changed.
+        The time series is taken from the first of:
+        - the layer itself, if it is a NetCDF or HDF5 time series cube,
+        - the grd time series files in the directory of the layer,
+        - a MintPy time series cube in the directory of the layer.
+        :param source: Layer source, file path or directory of the time series
+        :param directory: Directory of the time series files, e.g. from grd_layer.getLayerStackDirectory(). Default is
+            None to resolve it from the source.
+        :return: GrdStack, TimeseriesCube or None if no time series is found
+        """
+        cube = self.getCube(source)
+        if cube is not None:
+            return cube
+
+        if directory is None:
+            directory = grd_layer_utils.getGrdDirectory(source)
+
+        try:
+            directory_mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            self.removeStack(directory)
+            return None
+
+        # the stack may be requested by a background preloading task and by clicks at the same time
+        with self._lock:
+            stack = self._stacks.get(directory)
+            if stack is not None and stack.directory_mtime == directory_mtime:
+                # the file list is unchanged, only check the files themselves
+                if getGrdStackSignature(stack.raster_file_paths) == stack.signature:
+                    self.hits += 1
+                    return stack
+            self.misses += 1
+
+        # build the stack without holding the lock, so that clearing the cache is not blocked
+        raster_file_paths, band_names = grd_layer_utils.getGrdInfo(directory)
+        if not raster_file_paths:
+            self.removeStack(directory)
+            cube_file_path = grd_layer_utils.findTimeseriesCubeFile(directory)
+            return self.getCube(cube_file_path) if cube_file_path else None
+
+        stack = GrdStack(directory=directory, raster_file_paths=raster_file_paths, band_names=band_names,
+                         signature=getGrdStackSignature(raster_file_paths), directory_mtime=directory_mtime,
+                         workers=self.workers)
+        if not stack.isValid():
+            stack.close()
+            return None
+
+        with self._lock:
+            existing = self._stacks.get(directory)
+            if existing is not None and existing.signature == stack.signature:
+                # the same stack was built concurrently
+                existing.directory_mtime = directory_mtime
+                stack.close()
+                return existing
+            self._stacks[directory] = stack
+
+        if existing is not None:
+            existing.close()
+        return stack
+
+    def getCube(self, source):
+        """
+        Get the cached time series cube of a layer source or open it if the cube file changed.
+        Sources that are not time series cubes, e.g. a single band velocity.h5, are cached as well.
+        :param source: Layer source or file path of a NetCDF or HDF5 file
+        :return: TimeseriesCube or None if the source is not a time series cube
+        """
+        file_path = grd_layer_utils._unwrap_netcdf_path(source)
+        if os.path.splitext(file_path)[1].lower() not in grd_layer_utils.CUBE_EXTENSIONS:
+            return None
+
+        signature = getGrdStackSignature([file_path])
+        if not signature:
+            self.removeStack(source)
+            return None
+
+        with self._lock:
+            cached = self._cubes.get(source)
+            if cached is not None and cached[0] == signature:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        cube = timeseries_cube_utils.openTimeseriesCube(source, signature=signature)
+
+        with self._lock:
+            existing = self._cubes.get(source)
+            self._cubes[source] = (signature, cube)
+        if existing is not None and existing[1] is not None:
+            existing[1].close()
+        return cube
+
+    def removeStack(self, key):
+        """Remove the stack of a directory or the cube of a layer source."""
+        with self._lock:
+            stack = self._stacks.pop(key, None)
+            cached = self._cubes.pop(key, None)
+        if stack is not None:
+            stack.close()
+        if cached is not None and cached[1] is not None:
+            cached[1].close()
+
+    def clear(self):
+        """Close all cached dataset handles."""
+        with self._lock:
+            stacks = list(self._stacks.values()) + [cube for _, cube in self._cubes.values() if cube is not None]
+            self._stacks = {}
+            self._cubes = {}
+        for stack in stacks:
+            stack.close()
+
+    def stats(self) -> dict:
+        return {"stacks": len(self._stacks), "cubes": len(self._cubes), "hits": self.hits, "misses": self.misses}
+
+
+def compileGrdStack(directory, progress_callback=None, workers=4) -> str:
+    """
+    Compile the grd time series of a directory to a pixel-major cube next to the grd files.
+    A separate VRT handle is opened, so that the compilation can run in a background task.
+    :param directory: Directory or file path of the grd time series
+    :param progress_callback: Function called with the progress in percent. Compilation stops if it returns False.
+    :param workers: Number of threads used for reading the grd files
+    :return: Path of the cube header or an empty string if the compilation was cancelled or failed
+    """
+    directory = grd_layer_utils.getGrdDirectory(directory)
+    raster_file_paths, band_names = grd_layer_utils.getGrdInfo(directory)
+    if not raster_file_paths:
+        return ""
+
+    stack = GrdStack(directory=directory, raster_file_paths=raster_file_paths, band_names=band_names,
+                     signature=getGrdStackSignature(raster_file_paths), workers=workers)
+    if not stack.isValid():
+        return ""
+
+    try:
+        return grd_cube_utils.compileGrdCube(stack, progress_callback=progress_callback)
+    finally:
+        stack.close()
+
+
 class RasterTimeseries:
-    def __init__(self):
-        self.time_series_data = None
+    def __init__(self, tile_size=128, memory_limit=256, workers=4):
+        """
+        :param tile_size: int, size of the square tiles read around clicked pixels
+        :param memory_limit: int in Mb, maximum size of the cached tiles
+        :param workers: int, number of threads used for reading the grd files
+        """
+        self.stack_cache = GrdStackCache(workers=workers)
+        self.tile_cache = TileCache(tile_size=tile_size, memory_limit=memory_limit)
+        self.memory_limit = memory_limit
+        self._band_readers = {}
+        self._band_readers_lock = threading.Lock()
 
     def reset(self):
-        self.time_series_data = None
+        self.tile_cache.clear()
+        self.stack_cache.clear()
+        with self._band_readers_lock:
+            band_readers = list(self._band_readers.values())
+            self._band_readers = {}
+        for band_reader in band_readers:
+            band_reader.close()
+
+    def getBandReader(self, source) -> BandReader:
+        """
+        Get the cached reader of the first band of a layer source or open it if the file changed.
+        :param source: Layer source
+        :return: BandReader or None if the source cannot be opened
+        """
+        file_path = grd_layer_utils._unwrap_netcdf_path(source)
+        signature = getGrdStackSignature([file_path])
+        with self._band_readers_lock:
+            band_reader = self._band_readers.get(source)
+            if band_reader is not None and band_reader.signature == signature:
+                return band_reader
+
+        band_reader = BandReader(source, signature=signature)
+        if not band_reader.isValid():
+            band_reader.close()
+            return None
+
+        with self._band_readers_lock:
+            existing = self._band_readers.get(source)
+            self._band_readers[source] = band_reader
+        if existing is not None:
+            existing.close()
+        return band_reader
+
+    def preloadStack(self, source, center=None, progress_callback=None, directory=None) -> int:
+        """
+        Open the grd stack of a layer and fill the tile cache, starting with the tiles closest to the center point.
+        At most as many tiles as fit into the tile cache are read. Clicks are served from the cached tiles while the
+        preloading is running.
+        :param source: Layer source of a grd time series file
+        :param center: Point (QgsPointXY) around which the tiles are loaded first. Default is None for the stack center.
+        :param progress_callback: Function called with the progress in percent. Preloading stops if it returns False.
+        :param directory: Directory of the time series files, see GrdStackCache.getStack()
+        :return: Number of tiles read
+        """
+        stack = self.stack_cache.getStack(source, directory=directory)
+        if stack is None or stack.cube is not None:
+            # a compiled cube is read directly from disk and needs no preloading
+            return 0
+
+        dataset = stack.dataset
+        if dataset is None:
+            return 0  # the stack was closed, e.g. when the active layer changed
+        x_size, y_size = dataset.RasterXSize, dataset.RasterYSize
+        tile_size = self.tile_cache.tile_size
+        num_rows = -(-y_size // tile_size)
+        num_cols = -(-x_size // tile_size)
+
+        if center is not None:
+            inv_transform = gdal.InvGeoTransform(dataset.GetGeoTransform())
+            center_px, center_py = gdal.ApplyGeoTransform(inv_transform, center.x(), center.y())
+        else:
+            center_px, center_py = x_size / 2, y_size / 2
+
+        rows, cols = np.meshgrid(np.arange(num_rows), np.arange(num_cols), indexing="ij")
+        rows, cols = rows.ravel(), cols.ravel()
+        distance = np.hypot((rows + 0.5) * tile_size - center_py, (cols + 0.5) * tile_size - center_px)
+        order = np.argsort(distance, kind="stable")
+
+        tile_bytes = tile_size * tile_size * dataset.RasterCount * np.dtype(stack.reader.dtype).itemsize
+        max_tiles = int(max(1, self.tile_cache.memory_limit // tile_bytes))
+        order = order[:max_tiles]
+
+        loaded = 0
+        for i, index in enumerate(order):
+            tile_row, tile_col = int(rows[index]), int(cols[index])
+            key = (stack.cache_key, tile_row, tile_col)
+            if key not in self.tile_cache:
+                x_off, y_off, x_count, y_count = self.tile_cache.tileWindow(tile_row, tile_col, x_size, y_size)
+                self.tile_cache.put(key, stack.readWindow(x_off, y_off, x_count, y_count))
+                loaded += 1
+            if progress_callback is not None and progress_callback(100 * (i + 1) / len(order)) is False:
+                break
+
+        return loaded
 
     def getClickedPixelValue(self, layer, point):
         """
@@ -44,57 +493,147 @@ class RasterTimeseries:
         :param point: The clicked point (QgsPointXY)
         :return: Pixel value at the clicked point or None if not found
         """
-        file_path = layer.source()
-
-        dataset = createVrtFromFiles(raster_file_paths=file_path, out_file="")
+        band_reader = self.getBandReader(layer.source())
+        if band_reader is None:
+            return None
 
-        if not dataset:
+        _, _, inside = band_reader.pixelsFromPoints([point.x()], [point.y()])
+        if not inside[0]:
             return None
 
-        transform = dataset.GetGeoTransform()
-        inv_transform = gdal.InvGeoTransform(transform)
+        return self.getPixelValues(layer, [point])[0]
 
-        x, y = point.x(), point.y()
-        px, py = gdal.ApplyGeoTransform(inv_transform, x, y)
-        px, py = int(px), int(py)
+    def getPixelValues(self, layer, points) -> np.ndarray:
+        """
+        Get the pixel values of several points from the first band of the raster layer.
+        The points are converted to pixels with one vectorized call and each tile containing one of the points is read
+        once through the tile cache. If the layer is one of the files of a grd time series, the cached tiles of the
+        stack are used.
+        :param layer: The raster layer
+        :param points: List of points (QgsPointXY) in the layer CRS
+        :return: Array of float64 values, NaN for points outside the raster or without data
+        """
+        values = np.full(len(points), np.nan)
+        band_reader = self.getBandReader(layer.source())
+        if band_reader is None or len(points) == 0:
+            return values
+
+        x = np.fromiter((point.x() for point in points), dtype=np.float64, count=len(points))
+        y = np.fromiter((point.y() for point in points), dtype=np.float64, count=len(points))
+        px, py, inside = band_reader.pixelsFromPoints(x, y)
+
+        cache_key, read_function, band_index = band_reader.cache_key, band_reader.readWindow, 0
+        stack = self._getStackOfBand(band_reader)
+        if stack is not None:
+            cache_key, read_function = stack.cache_key, stack.readWindow
+            band_index = stack.raster_file_paths.index(grd_layer_utils._unwrap_netcdf_path(band_reader.source))
+
+        values[inside] = self.tile_cache.readPoints(cache_key, read_function, px[inside], py[inside],
+                                                    band_reader.x_size, band_reader.y_size, band_index=band_index)
+        return values
+
+    def _getStackOfBand(self, band_reader):
+        """Get the grd stack that contains the file of a band reader, or None if the file is not part of a stack."""
+        file_path = grd_layer_utils._unwrap_netcdf_path(band_reader.source)
+        if not grd_layer_utils.GRD_FILE_PATTERN.match(os.path.basename(file_path)):
+            return None
+        stack = self.stack_cache.getStack(band_reader.source)
+        if not isinstance(stack, GrdStack) or file_path not in stack.raster_file_paths:
+            return None
+        if (stack.dataset.RasterXSize, stack.dataset.RasterYSize) != (band_reader.x_size, band_reader.y_size):
+            return None
+        return stack
 
-        band = dataset.GetRasterBand(1)
-        x_size = band.XSize
-        y_size = band.YSize
-        if not (0 <= px < x_size and 0 <= py < y_size):
+    def getPolygonPixelValue(self, layer, polygon):
+        """
+        Get the mean pixel value of the raster layer inside a polygon.
+        :param layer: The raster layer
+        :param polygon: QgsGeometry in the layer CRS
+        :return: Mean value or None if the polygon contains no valid pixels
+        """
+        band_reader = self.getBandReader(layer.source())
+        if band_reader is None:
             return None
 
-        pixel_value = band.ReadAsArray(px, py, 1, 1)
-        if pixel_value is not None:
-            return pixel_value[0, 0]
+        bbox = polygon.boundingBox()
+        statistics, num_pixels = computePolygonStatistics(
+            read_window=band_reader.readWindow, num_bands=1, geo_transform=band_reader.geo_transform,
+            x_size=band_reader.x_size, y_size=band_reader.y_size, polygon_wkt=polygon.asWkt(),
+            extent=(bbox.xMinimum(), bbox.yMinimum(), bbox.xMaximum(), bbox.yMaximum()), percentiles=(),
+            memory_limit=self.memory_limit)
+        if num_pixels == 0:
+            return None
+        return statistics["mean"][0]
 
-        return None
+    def getPolygonTimeseriesStatistics(self, layer, polygon, percentiles=(5, 50, 95)):
+        """
+        Get per-date statistics of the time series of all pixels inside a polygon from the GMTSAR grd files.
+        The bounding window of the polygon is streamed in blocks of rows from the compiled cube if available, or from
+        the grd files read in parallel.
+        :param layer: The raster layer
+        :param polygon: QgsGeometry in the layer CRS
+        :param percentiles: Percentiles in the range 0 to 100
+        :return: dates as datetime64[D] array, statistics from ZonalStatistics.result() and number of pixels inside
+            the polygon. dates and statistics are None if the polygon contains no pixels.
+        """
+        stack = self.stack_cache.getStack(layer.source(), directory=grd_layer_utils.getLayerStackDirectory(layer))
+        if stack is None:
+            return None, None, 0
+
+        source = stack.cube if stack.cube is not None else stack
+        dataset = stack.dataset
+        bbox = polygon.boundingBox()
+        statistics, num_pixels = computePolygonStatistics(
+            read_window=source.readWindow, num_bands=dataset.RasterCount, geo_transform=dataset.GetGeoTransform(),
+            x_size=dataset.RasterXSize, y_size=dataset.RasterYSize, polygon_wkt=polygon.asWkt(),
+            extent=(bbox.xMinimum(), bbox.yMinimum(), bbox.xMaximum(), bbox.yMaximum()), percentiles=percentiles,
+            memory_limit=self.memory_limit)
+        if num_pixels == 0:
+            return None, None, 0
+        return stack.dates, statistics, num_pixels
 
     def getRasterTimeseriesAttributes(self, layer, point):
         """
-        Get the timeseries values of the clicked point from the GMTSAR grd files.
-        The grd files should be in the same directory as the layer (typically velocity) file.
+        Get the timeseries values of the clicked point from the GMTSAR grd files or a time series cube.
+        The grd files or the MintPy timeseries cube should be in the same directory as the layer (typically
+        velocity) file, unless the layer is the cube itself.
+        :return: dates as datetime64[D] array, values as float64 array. Dates with NaN values are removed.
         """
-        file_path = layer.source()
-        directory = os.path.dirname(file_path)
+        stack = self.stack_cache.getStack(layer.source(), directory=grd_layer_utils.getLayerStackDirectory(layer))
+        if stack is None:
+            return emptyTimeseries()
 
-        raster_file_paths, band_names = grd_layer_utils.getGrdInfo(directory)
-        dataset = createVrtFromFiles(raster_file_paths=raster_file_paths,
-                                     band_names=band_names, out_file="")
+        if stack.cube is not None:
+            return self.getCubeTimeseriesAttributes(stack.cube, point)
+
+        return self.getVrtTimeseriesAttributes(stack.dataset, point, dates=stack.dates,
+                                               cache_key=stack.cache_key, window_reader=stack.readWindow)
 
-        if not dataset:
-            return np.array([])
+    def getCubeTimeseriesAttributes(self, cube, point):
+        """
+        Get the timeseries values of the clicked point from a compiled cube of the time series data.
+        :param cube: GrdCube
+        :param point: QgsPointXY
+        """
+        px, py = cube.pixelFromPoint(point.x(), point.y())
+        if px is None:
+            return emptyTimeseries()
 
-        date_value_list = self.getVrtTimeseriesAttributes(dataset, point)
-        return date_value_list
+        return maskedTimeseries(cube.dates, cube.readPixel(px, py))
 
-    def getVrtTimeseriesAttributes(self, vrt_dataset, point, memory_limit=500):
+    def getVrtTimeseriesAttributes(self, vrt_dataset, point, dates=None, cache_key=None, window_reader=None):
         """
         Get the timeseries values of the clicked point from a vrt file that consists of time series data.
         The vrt file should have description for each band in the format 'DYYYYMMDD'.
+        All dates of the tile around the clicked pixel are read and cached, so that clicks on neighbouring pixels are
+        served from memory.
         :param vrt_dataset: VRT dataset
         :param point: QgsPointXY
-        :param memory_limit: int in Mb
+        :param dates: datetime64 array of band dates. Default is None to parse them from the band descriptions.
+        :param cache_key: Key of the dataset in the tile cache. Default is None to use the dataset object identity.
+        :param window_reader: Function reading a (bands, rows, columns) pixel window. Default is None to read the
+            window from the vrt dataset.
+        :return: dates as datetime64[D] array, values as float64 array. Dates with NaN values are removed.
         """
 
         transform = vrt_dataset.GetGeoTransform()
@@ -108,32 +647,24 @@ class RasterTimeseries:
         x_size = band.XSize
         y_size = band.YSize
         if not (0 <= px < x_size and 0 <= py < y_size):
-            return np.array([])
-
-        num_bands = vrt_dataset.RasterCount
-        data_type_size = gdal.GetDataTypeSize(band.DataType) // 8  # Size in bytes
-        expected_size = x_size * y_size * num_bands * data_type_size
-
-        if expected_size > memory_limit * 1024 * 1024:
-            pixel_values = vrt_dataset.ReadAsArray(px, py, 1, 1)
-            if pixel_values is None:
-                return np.array([])
-            pixel_values = pixel_values[:, 0, 0]
-
-        else:  # read full data at once
-            if self.time_series_data is None:
-                self.time_series_data = vrt_dataset.ReadAsArray()
-            pixel_values = self.time_series_data[:, py, px]
-
-        if pixel_values is None:
-            return np.array([])
-
-        date_value_list = []
-        date_objs = [datetime.strptime(vrt_dataset.GetRasterBand(i).GetDescription()[1:], '%Y%m%d') for i in
-                     range(1, vrt_dataset.RasterCount + 1)]
-
-        for date_obj, pixel_value in zip(date_objs, pixel_values):
-            if not np.isnan(pixel_value):
-                date_value_list.append((date_obj, pixel_value))
-
-        return np.array(date_value_list, dtype=object)
+            return emptyTimeseries()
+
+        if cache_key is None:
+            cache_key = id(vrt_dataset)
+        if window_reader is None:
+            def window_reader(x_off, y_off, x_count, y_count):
+                return readVrtWindow(vrt_dataset, x_off, y_off, x_count, y_count)
+
+        tile_row, tile_col = self.tile_cache.tileIndex(px, py)
+        x_off, y_off, x_count, y_count = self.tile_cache.tileWindow(tile_row, tile_col, x_size, y_size)
+        tile = self.tile_cache.getTile((cache_key, tile_row, tile_col),
+                                       lambda: window_reader(x_off, y_off, x_count, y_count))
+        if tile is None:
+            return emptyTimeseries()
+        pixel_values = tile[:, py - y_off, px - x_off]
+
+        if dates is None:
+            dates = datesFromStrings([vrt_dataset.GetRasterBand(i).GetDescription()[1:] for i in
+                                      range(1, vrt_dataset.RasterCount + 1)])
+
+        return maskedTimeseries(dates, pixel_values)
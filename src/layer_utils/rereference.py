@@ -0,0 +1,47 @@
+import numpy as np
+
+from ..models.least_squares import designMatrix, fitChunk
+
+
+def referenceSeries(reference_values) -> np.ndarray:
+    """
+    Reduce the time series of a reference point or polygon to one series.
+    :param reference_values: Values with shape (dates,) or (dates, series), e.g. the ref_values of a plotted series
+    :return: float64 array with one value per date, the mean of the series ignoring NaN values
+    """
+    values = np.asarray(reference_values, dtype=np.float64)
+    if values.ndim == 1:
+        return values.copy()
+    finite = np.isfinite(values)
+    count = finite.sum(axis=1)
+    total = np.where(finite, values, 0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+def rereferencedVelocity(dates, values, reference, chunk_size=65536, progress_callback=None) -> np.ndarray:
+    """
+    Compute the velocity of every time series relative to a reference series.
+    The matrix is processed in chunks of rows, so that the float64 copy of the re-referenced values stays small.
+    :param dates: Dates of the columns of the matrix
+    :param values: Matrix with shape (features, dates), e.g. the cached values of a vector layer
+    :param reference: Reference series with one value per date
+    :param chunk_size: Number of rows processed at once
+    :param progress_callback: Function called with the progress in percent. Processing stops if it returns False.
+    :return: float64 array with one velocity per row in value units per year, or None if canceled
+    """
+    # the line of the layer fits, see batch_fit.fitLayerTimeSeries()
+    design, _ = designMatrix(dates, degree=1)
+    reference = np.asarray(reference, dtype=np.float64)
+    if reference.shape != (len(design),):
+        raise ValueError("reference series must have one value per date")
+
+    num_rows = len(values)
+    velocity = np.empty(num_rows, dtype=np.float64)
+    for start in range(0, num_rows, chunk_size):
+        stop = min(start + chunk_size, num_rows)
+        coefficients, _ = fitChunk(design, np.asarray(values[start:stop], dtype=np.float64) - reference)
+        velocity[start:stop] = coefficients[:, 1]
+        if progress_callback and progress_callback(100 * stop / num_rows) is False:
+            return None
+    return velocity
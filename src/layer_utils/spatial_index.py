@@ -0,0 +1,202 @@
+import numpy as np
+
+
+class GridIndex:
+    """
+    Uniform grid index of points for nearest neighbour and radius queries.
+
+    The points are sorted by grid cell, so that the points of a range of cells in one grid row are a contiguous slice.
+    A query only visits the cells around the query point. Inserted, moved and removed points are kept aside and
+    merged by rebuilding the grid once they exceed a fraction of the indexed points.
+
+    Attributes:
+        cell_size: Size of the square grid cells in the units of the coordinates.
+        rebuild_fraction: Fraction of edited points that triggers rebuilding the grid.
+    """
+    def __init__(self, x, y, ids=None, cell_size=None, points_per_cell=4, rebuild_fraction=0.1):
+        """
+        :param x, y: Coordinates of the points, points with NaN coordinates are not indexed
+        :param ids: Ids of the points, e.g. feature ids. Default is None to use the positions in x and y
+        :param cell_size: Size of the grid cells. Default is None to choose it from the density of the points
+        :param points_per_cell: Average number of points per cell used to choose the cell size
+        :param rebuild_fraction: Fraction of edited points that triggers rebuilding the grid
+        """
+        x = np.asarray(x, dtype=np.float64).ravel()
+        y = np.asarray(y, dtype=np.float64).ravel()
+        ids = np.arange(len(x), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64).ravel()
+        self.points_per_cell = points_per_cell
+        self.rebuild_fraction = rebuild_fraction
+        self._fixed_cell_size = cell_size
+        self._build(x, y, ids)
+
+    def _build(self, x, y, ids):
+        valid = np.isfinite(x) & np.isfinite(y)
+        x, y, ids = x[valid], y[valid], ids[valid]
+        num_points = len(x)
+
+        if num_points:
+            self._x_min, self._y_min = float(x.min()), float(y.min())
+            width, height = float(x.max()) - self._x_min, float(y.max()) - self._y_min
+        else:
+            self._x_min = self._y_min = 0.0
+            width = height = 0.0
+        cell_size = self._fixed_cell_size
+        if cell_size is None:
+            extent = max(width, height)
+            area = width * height if width > 0 and height > 0 else extent * extent
+            cell_size = np.sqrt(area * self.points_per_cell / max(num_points, 1))
+        self.cell_size = float(cell_size) if cell_size > 0 else 1.0
+        self._nx = int(width // self.cell_size) + 1
+        self._ny = int(height // self.cell_size) + 1
+
+        ix = ((x - self._x_min) // self.cell_size).astype(np.int64)
+        iy = ((y - self._y_min) // self.cell_size).astype(np.int64)
+        order = np.argsort(iy * self._nx + ix, kind="stable")
+        self._keys = (iy * self._nx + ix)[order]
+        self._x, self._y, self._ids = x[order], y[order], ids[order]
+        self._deleted = np.zeros(num_points, dtype=bool)
+        self._num_deleted = 0
+
+        # rows of the ids, to mark removed points
+        self._id_order = np.argsort(self._ids, kind="stable")
+        self._sorted_ids = self._ids[self._id_order]
+
+        # points inserted or moved since the grid was built
+        self._extra = {}
+        self._extra_arrays = None
+
+    def __len__(self):
+        return len(self._ids) - self._num_deleted + len(self._extra)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self._keys, self._x, self._y, self._ids, self._deleted, self._id_order, self._sorted_ids]
+        return int(sum(array.nbytes for array in arrays))
+
+    # ---- editing ----
+
+    def insert(self, ids, x, y):
+        """Add points or move points that are already indexed."""
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+        self._removeFromGrid(ids)
+        for point_id, point_x, point_y in zip(ids.tolist(), x.tolist(), y.tolist()):
+            if np.isfinite(point_x) and np.isfinite(point_y):
+                self._extra[point_id] = (point_x, point_y)
+            else:
+                self._extra.pop(point_id, None)
+        self._extra_arrays = None
+        self._rebuildIfNeeded()
+
+    def remove(self, ids):
+        """Remove points by id. Unknown ids are ignored."""
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        self._removeFromGrid(ids)
+        for point_id in ids.tolist():
+            self._extra.pop(point_id, None)
+        self._extra_arrays = None
+        self._rebuildIfNeeded()
+
+    def _removeFromGrid(self, ids):
+        if len(self._sorted_ids) == 0:
+            return
+        positions = np.minimum(np.searchsorted(self._sorted_ids, ids), len(self._sorted_ids) - 1)
+        rows = self._id_order[positions[self._sorted_ids[positions] == ids]]
+        rows = rows[~self._deleted[rows]]
+        self._deleted[rows] = True
+        self._num_deleted += len(rows)
+
+    def _rebuildIfNeeded(self):
+        num_edits = self._num_deleted + len(self._extra)
+        if num_edits > max(64, self.rebuild_fraction * len(self._ids)):
+            self.rebuild()
+
+    def rebuild(self):
+        """Merge the edited points into the grid."""
+        live = ~self._deleted
+        extra_ids, extra_x, extra_y = self._extraArrays()
+        self._build(np.concatenate((self._x[live], extra_x)), np.concatenate((self._y[live], extra_y)),
+                    np.concatenate((self._ids[live], extra_ids)))
+
+    def _extraArrays(self):
+        if self._extra_arrays is None:
+            ids = np.fromiter(self._extra.keys(), dtype=np.int64, count=len(self._extra))
+            coordinates = np.array(list(self._extra.values()), dtype=np.float64).reshape(-1, 2)
+            self._extra_arrays = (ids, coordinates[:, 0], coordinates[:, 1])
+        return self._extra_arrays
+
+    # ---- queries ----
+
+    def _candidates(self, x_min, y_min, x_max, y_max):
+        """Get the grid rows of the points in the cells overlapping a rectangle."""
+        ix0 = max(int((x_min - self._x_min) // self.cell_size), 0)
+        ix1 = min(int((x_max - self._x_min) // self.cell_size), self._nx - 1)
+        iy0 = max(int((y_min - self._y_min) // self.cell_size), 0)
+        iy1 = min(int((y_max - self._y_min) // self.cell_size), self._ny - 1)
+        if ix0 > ix1 or iy0 > iy1 or len(self._keys) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        row_keys = np.arange(iy0, iy1 + 1, dtype=np.int64) * self._nx
+        starts = np.searchsorted(self._keys, row_keys + ix0, side="left")
+        ends = np.searchsorted(self._keys, row_keys + ix1, side="right")
+        rows = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+        return rows[~self._deleted[rows]]
+
+    def rectangle(self, x_min, y_min, x_max, y_max) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        Find the points inside a rectangle, including its boundary.
+        :return: ids, x and y coordinates of the points
+        """
+        rows = self._candidates(x_min, y_min, x_max, y_max)
+        extra_ids, extra_x, extra_y = self._extraArrays()
+        ids = np.concatenate((self._ids[rows], extra_ids))
+        x = np.concatenate((self._x[rows], extra_x))
+        y = np.concatenate((self._y[rows], extra_y))
+        inside = (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
+        return ids[inside], x[inside], y[inside]
+
+    def radius(self, x, y, radius) -> (np.ndarray, np.ndarray):
+        """
+        Find the points within a distance of a point.
+        :param x, y: Coordinates of the query point
+        :param radius: Search distance, points at exactly this distance are included
+        :return: ids and distances of the points, sorted by distance
+        """
+        rows = self._candidates(x - radius, y - radius, x + radius, y + radius)
+        extra_ids, extra_x, extra_y = self._extraArrays()
+        ids = np.concatenate((self._ids[rows], extra_ids))
+        distances = np.hypot(np.concatenate((self._x[rows], extra_x)) - x,
+                             np.concatenate((self._y[rows], extra_y)) - y)
+        inside = distances <= radius
+        ids, distances = ids[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return ids[order], distances[order]
+
+    def nearest(self, x, y, k=1, max_distance=np.inf) -> (np.ndarray, np.ndarray):
+        """
+        Find the k points closest to a point.
+        :param x, y: Coordinates of the query point
+        :param k: Number of points to find
+        :param max_distance: Maximum distance of the points
+        :return: ids and distances of up to k points, sorted by distance
+        """
+        extra_ids, extra_x, extra_y = self._extraArrays()
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # distance beyond which no more points can be found
+        x_max = self._x_min + self._nx * self.cell_size
+        y_max = self._y_min + self._ny * self.cell_size
+        reach = np.hypot(max(abs(x - self._x_min), abs(x - x_max)), max(abs(y - self._y_min), abs(y - y_max)))
+        if len(extra_ids):
+            reach = max(reach, float(np.hypot(extra_x - x, extra_y - y).max()))
+
+        search_radius = self.cell_size
+        while True:
+            search_radius = min(search_radius, max_distance, reach)
+            ids, distances = self.radius(x, y, search_radius)
+            # all points closer than the search radius are found, so the closest k of them are the nearest points
+            if len(ids) >= k or search_radius >= max_distance or search_radius >= reach:
+                return ids[:k], distances[:k]
+            search_radius *= 2
@@ -0,0 +1,130 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class TileCache:
+    """
+    LRU cache of band-stacked spatial tiles of raster time series.
+
+    Each tile holds all dates of a square pixel window. Least recently used tiles are evicted when the cached tiles
+    exceed the memory limit, so that the memory usage stays bounded for large stacks. The cache can be filled from a
+    background task while clicks are served from the main thread.
+
+    Attributes:
+        tile_size: Size of the square tiles in pixels.
+        memory_limit: Maximum size of the cached tiles in bytes.
+        nbytes: Current size of the cached tiles in bytes.
+        hits: Number of tile requests served from the cache.
+        misses: Number of tile requests that required reading the tile.
+    """
+    def __init__(self, tile_size=128, memory_limit=256):
+        """
+        :param tile_size: int, size of the square tiles in pixels
+        :param memory_limit: int in Mb
+        """
+        self.tile_size = int(tile_size)
+        self.memory_limit = int(memory_limit * 1024 * 1024)
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def tileIndex(self, px, py) -> (int, int):
+        """Get the tile row and column of a pixel."""
+        return py // self.tile_size, px // self.tile_size
+
+    def tileWindow(self, tile_row, tile_col, x_size, y_size) -> (int, int, int, int):
+        """
+        Get the pixel window of a tile clipped to the raster size.
+        :return: x offset, y offset, x count, y count
+        """
+        x_off = tile_col * self.tile_size
+        y_off = tile_row * self.tile_size
+        return x_off, y_off, min(self.tile_size, x_size - x_off), min(self.tile_size, y_size - y_off)
+
+    def get(self, key):
+        """Get a cached tile or None, counting the request as hit or miss."""
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, key, tile: np.ndarray):
+        """Add a tile and evict the least recently used tiles if the memory limit is exceeded."""
+        with self._lock:
+            if key in self._tiles:
+                self.nbytes -= self._tiles.pop(key).nbytes
+            if tile.nbytes > self.memory_limit:
+                # a tile larger than the whole budget is never cached
+                return
+            self._tiles[key] = tile
+            self.nbytes += tile.nbytes
+            while self.nbytes > self.memory_limit:
+                _, evicted = self._tiles.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def getTile(self, key, read_function) -> np.ndarray:
+        """
+        Get a tile from the cache or read it with read_function and cache it.
+        :param key: Hashable tile key
+        :param read_function: Function without arguments returning the tile as a (bands, rows, columns) array
+        """
+        tile = self.get(key)
+        if tile is not None:
+            return tile
+        tile = read_function()
+        if tile is not None:
+            self.put(key, tile)
+        return tile
+
+    def readPoints(self, key, read_function, px, py, x_size, y_size, band_index=0) -> np.ndarray:
+        """
+        Read the values of several pixels through the cache. Each tile containing one of the pixels is read once.
+        :param key: Hashable key of the raster, the tiles are cached as (key, tile row, tile column)
+        :param read_function: Function reading a (bands, rows, columns) pixel window from x offset, y offset, x count
+            and y count
+        :param px: Array of pixel columns inside the raster
+        :param py: Array of pixel rows inside the raster
+        :param x_size: Number of raster columns
+        :param y_size: Number of raster rows
+        :param band_index: Band of the tiles to read the values from
+        :return: Array of float64 values, NaN where a tile could not be read
+        """
+        px = np.asarray(px, dtype=np.int64)
+        py = np.asarray(py, dtype=np.int64)
+        values = np.full(len(px), np.nan)
+        if len(px) == 0:
+            return values
+
+        tile_rows, tile_cols = self.tileIndex(px, py)
+        tiles, tile_of_point = np.unique(np.stack((tile_rows, tile_cols), axis=1), axis=0, return_inverse=True)
+        tile_of_point = tile_of_point.reshape(-1)
+        for i, (tile_row, tile_col) in enumerate(tiles.tolist()):
+            x_off, y_off, x_count, y_count = self.tileWindow(tile_row, tile_col, x_size, y_size)
+            tile = self.getTile((key, tile_row, tile_col), lambda: read_function(x_off, y_off, x_count, y_count))
+            if tile is None:
+                continue
+            in_tile = tile_of_point == i
+            values[in_tile] = tile[band_index, py[in_tile] - y_off, px[in_tile] - x_off]
+        return values
+
+    def __contains__(self, key):
+        return key in self._tiles
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def clear(self):
+        with self._lock:
+            self._tiles = OrderedDict()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tiles": len(self._tiles), "nbytes": self.nbytes, "hits": self.hits, "misses": self.misses}
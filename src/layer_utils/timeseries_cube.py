@@ -0,0 +1,151 @@
+import os
+import re
+import threading
+import numpy as np
+from osgeo import gdal
+
+from . import grd_layer as grd_layer_utils
+from .date_utils import datesFromStrings, datesFromTimeValues
+
+
+def datesFromDataset(dataset, file_path=None):
+    """
+    Get the dates of the bands of a time series cube from its metadata.
+    The dates are taken from the first source that provides one date per band:
+    - the NETCDF_DIM_<dim> band metadata and the '<dim>#units' metadata of NetCDF cubes,
+    - 'YYYYMMDD' dates in the band descriptions (e.g. 'D20200101'),
+    - the 'date' dataset of MintPy HDF5 files, read with the GDAL multidimensional API.
+    :param dataset: GDAL dataset with one band per date
+    :param file_path: Path of the file of the dataset. Default is None to skip the MintPy date dataset.
+    :return: Array of dtype datetime64[D] or None if no dates are found
+    """
+    num_bands = dataset.RasterCount
+    if num_bands == 0:
+        return None
+
+    metadata = dataset.GetMetadata() or {}
+    band_metadata = dataset.GetRasterBand(1).GetMetadata() or {}
+    for key in band_metadata:
+        if not key.startswith('NETCDF_DIM_'):
+            continue
+        dimension = key[len('NETCDF_DIM_'):]
+        units = metadata.get(f'{dimension}#units') or metadata.get(f'NC_GLOBAL#{dimension}#units')
+        values = [dataset.GetRasterBand(i).GetMetadataItem(key) for i in range(1, num_bands + 1)]
+        if units and None not in values:
+            dates = datesFromTimeValues([float(value) for value in values], units)
+            if dates is not None:
+                return dates
+
+    descriptions = [dataset.GetRasterBand(i).GetDescription() for i in range(1, num_bands + 1)]
+    matches = [re.search(r'(\d{8})', description) for description in descriptions]
+    if all(matches):
+        return datesFromStrings([match.group(1) for match in matches])
+
+    if file_path is not None:
+        dates = _readMintpyDates(file_path)
+        if dates is not None and len(dates) == num_bands:
+            return dates
+
+    return None
+
+
+def _readMintpyDates(file_path):
+    """Read the 'date' dataset with 'YYYYMMDD' strings of a MintPy HDF5 file."""
+    try:
+        dataset = gdal.OpenEx(file_path, gdal.OF_MULTIDIM_RASTER)
+        if dataset is None:
+            return None
+        date_array = dataset.GetRootGroup().OpenMDArray('date')
+        if date_array is None:
+            return None
+        values = date_array.Read()
+    except (RuntimeError, AttributeError):
+        return None
+
+    date_strings = [value.decode() if isinstance(value, bytes) else str(value) for value in values]
+    if not all(re.match(r'^\d{8}$', date_string) for date_string in date_strings):
+        return None
+    return datesFromStrings(date_strings)
+
+
+class TimeseriesCube:
+    """
+    Time series cube stored in a single multi-band HDF5 or NetCDF dataset, e.g. a MintPy timeseries.h5 file.
+
+    The cube is opened once and pixel windows of all dates are read with one hyperslab read, without the per-file
+    overhead of a stack of grd files. The attributes match GrdStack, so that a cube is used for clicks, tile caching
+    and polygons in the same way as a grd stack.
+
+    Attributes:
+        source: GDAL source of the cube with one band per date.
+        file_path: Path of the cube file.
+        directory: Directory of the cube file.
+        band_names: Band names in the format 'DYYYYMMDD'.
+        signature: File signature used to detect changes of the cube on disk.
+        cache_key: Key identifying the cube and its file signature in data caches.
+        dataset: GDAL dataset of the cube.
+        dates: Dates of the bands as datetime64[D] array.
+        cube: Always None, a time series cube needs no compiling.
+    """
+    def __init__(self, source, signature=()):
+        self.source = source
+        self.file_path = grd_layer_utils._unwrap_netcdf_path(source)
+        self.directory = os.path.dirname(os.path.abspath(self.file_path))
+        self.raster_file_paths = [self.file_path]
+        self.signature = signature
+        self.cache_key = (source, hash(signature))
+        self.cube = None
+        self._lock = threading.Lock()
+
+        self.dataset = gdal.Open(source)
+        self.dates = None
+        if self.dataset is not None:
+            self.dates = datesFromDataset(self.dataset, self.file_path)
+        self.band_names = [] if self.dates is None else \
+            [f"D{date.replace('-', '')}" for date in np.datetime_as_string(self.dates, unit='D')]
+        self._nodata_values = [] if self.dataset is None else \
+            [self.dataset.GetRasterBand(i).GetNoDataValue() for i in range(1, self.dataset.RasterCount + 1)]
+
+    def isValid(self) -> bool:
+        return self.dataset is not None and self.dates is not None
+
+    def readWindow(self, x_off, y_off, x_count, y_count) -> np.ndarray:
+        """
+        Read a pixel window of all dates with one read of the dataset.
+        :return: Array with shape (bands, rows, columns)
+        """
+        # GDAL dataset handles must not be used by two threads at the same time
+        with self._lock:
+            data = self.dataset.ReadAsArray(x_off, y_off, x_count, y_count)
+        if data is None:
+            return None
+        data = data.astype(np.float32, copy=False).reshape(self.dataset.RasterCount, y_count, x_count)
+        for i, nodata in enumerate(self._nodata_values):
+            if nodata is not None and np.isfinite(nodata):
+                data[i][data[i] == nodata] = np.nan
+        return data
+
+    def readPixel(self, px, py) -> np.ndarray:
+        """Read the values of one pixel of all dates."""
+        return self.readWindow(px, py, 1, 1)[:, 0, 0]
+
+    def close(self):
+        with self._lock:
+            self.dataset = None
+
+
+def openTimeseriesCube(source, signature=()):
+    """
+    Open the time series cube of a layer source.
+    :param source: Layer source of a NetCDF or HDF5 time series cube
+    :param signature: File signature of the cube file
+    :return: TimeseriesCube or None if the source is not a time series cube with dates
+    """
+    cube_source = grd_layer_utils.getTimeseriesCubeSource(source)
+    if not cube_source:
+        return None
+    cube = TimeseriesCube(cube_source, signature=signature)
+    if not cube.isValid():
+        cube.close()
+        return None
+    return cube
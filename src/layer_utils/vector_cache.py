@@ -0,0 +1,329 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from qgis.core import QgsFeatureRequest, QgsPoint, QgsVectorLayerFeatureSource
+from qgis.PyQt.QtCore import QStandardPaths
+
+from ..qt_compat import CACHE_LOCATION, FEATURE_REQUEST_NO_GEOMETRY
+from .date_fields import attributesToFloat, toFloat
+from .vector_columns import VectorColumns, columnsBytes
+from .vector_sidecar import SidecarCache, layerDataFiles, sidecarKey
+from . import vector_layer as vector_layer_utils
+
+
+def _featurePoint(geometry) -> (float, float):
+    """Get the coordinates of a point feature, or the centroid of other geometries."""
+    if geometry is None or geometry.isNull():
+        return np.nan, np.nan
+    point = geometry.constGet()
+    if not isinstance(point, QgsPoint):
+        point = geometry.centroid().constGet()
+        if point is None:
+            return np.nan, np.nan
+    return point.x(), point.y()
+
+
+def readVectorColumns(source, schema, feature_count, dtype=np.float32, progress_callback=None) -> VectorColumns:
+    """
+    Read the coordinates and date values of all features of a vector layer.
+    :param source: QgsVectorLayerFeatureSource of the layer, which can be read from a background task
+    :param schema: DateFieldSchema of the layer
+    :param feature_count: Number of features of the layer, used to preallocate the arrays
+    :param dtype: Data type of the date values
+    :param progress_callback: Function called with the progress in percent, returning False to cancel
+    :return: VectorColumns or None if cancelled
+    """
+    capacity = max(int(feature_count), 1)
+    feature_ids = np.empty(capacity, dtype=np.int64)
+    coordinates = np.empty((capacity, 2), dtype=np.float64)
+    values = np.empty((capacity, len(schema)), dtype=dtype)
+
+    request = QgsFeatureRequest().setSubsetOfAttributes([int(index) for index in schema.field_indices])
+    field_indices = schema.field_indices
+    row = 0
+    for feature in source.getFeatures(request):
+        if row == capacity:
+            # the feature count of some providers is an estimate
+            capacity *= 2
+            feature_ids = np.resize(feature_ids, capacity)
+            coordinates = np.resize(coordinates, (capacity, 2))
+            values = np.resize(values, (capacity, len(schema)))
+        feature_ids[row] = feature.id()
+        coordinates[row] = _featurePoint(feature.geometry())
+        values[row] = attributesToFloat(feature.attributes(), field_indices)
+        row += 1
+        if progress_callback is not None and row % 10000 == 0:
+            if progress_callback(min(100.0, 100.0 * row / capacity)) is False:
+                return None
+
+    return VectorColumns(feature_ids[:row].copy(), coordinates[:row, 0].copy(), coordinates[:row, 1].copy(),
+                         values[:row].copy(), schema.dates)
+
+
+def createSidecarCache(directory="", size_limit=4096) -> SidecarCache:
+    """
+    Create the on-disk cache of vector layer columns.
+    :param directory: Cache directory. Default is an empty string to use the user cache directory.
+    :param size_limit: int in Mb
+    """
+    if not directory:
+        directory = os.path.join(QStandardPaths.writableLocation(CACHE_LOCATION), "insar_explorer", "vector_layers")
+    return SidecarCache(directory, size_limit=size_limit)
+
+
+def layerSidecarKey(layer, dtype=np.float32) -> dict:
+    """
+    Build the key of the cached columns of a file based vector layer.
+    The data file, its data siblings (e.g. the .dbf of a shapefile or the write-ahead log of a GeoPackage) and the
+    subset string are part of the key, so that edits of the data invalidate the cached columns, but saving a style or
+    other files with the same name does not.
+    :return: Key for SidecarCache or None if the layer is not stored in a file
+    """
+    uri = layer.dataProvider().dataSourceUri()
+    file_path = uri.split('|')[0]
+    if not os.path.isfile(file_path):
+        return None
+    return sidecarKey(uri, layerDataFiles(file_path), subset_string=layer.subsetString(), dtype=dtype)
+
+
+class VectorLayerCache:
+    """
+    Memory-budgeted cache of the time series of whole vector layers, keyed by layer id.
+
+    Coordinates, feature ids and date values of a layer are read once into contiguous arrays, so that clicks, polygon
+    selections and symbology ranges are served from memory instead of the data provider. Least recently used layers
+    are evicted when the cached layers exceed the memory limit. Layers are removed when they are edited or deleted.
+
+    Attributes:
+        memory_limit: Maximum size of the cached layers in bytes.
+        dtype: Data type of the cached date values.
+        sidecar: SidecarCache storing the columns on disk, or None. Columns found on disk are memory-mapped instead
+            of being read from the data provider.
+    """
+    def __init__(self, memory_limit=1024, dtype=np.float32):
+        """
+        :param memory_limit: int in Mb
+        :param dtype: Data type of the cached date values
+        """
+        self.memory_limit = int(memory_limit * 1024 * 1024)
+        self.dtype = np.dtype(dtype)
+        self.sidecar = None
+        self._columns = OrderedDict()
+        self._generations = {}
+        self._connected_layers = set()
+        self._lock = threading.Lock()
+
+    def setMemoryLimit(self, memory_limit):
+        """:param memory_limit: int in Mb"""
+        with self._lock:
+            self.memory_limit = int(memory_limit * 1024 * 1024)
+            self._evict()
+
+    def estimateBytes(self, layer) -> int:
+        schema = vector_layer_utils.getDateFieldSchema(layer)
+        return columnsBytes(max(layer.featureCount(), 0), len(schema), self.dtype.itemsize)
+
+    def fitsInMemory(self, layer) -> bool:
+        return self.estimateBytes(layer) <= self.memory_limit
+
+    def get(self, layer) -> VectorColumns:
+        """Get the cached columns of a layer, or None if the layer is not cached."""
+        if layer is None:
+            return None
+        with self._lock:
+            columns = self._columns.get(layer.id())
+            if columns is not None:
+                self._columns.move_to_end(layer.id())
+            return columns
+
+    def prepareLoad(self, layer):
+        """
+        Prepare reading the columns of a layer in a background task.
+        :return: Function with a progress_callback argument returning the VectorColumns, and the generation of the
+        layer to pass to put()
+        """
+        self._connectLayer(layer)
+        source = QgsVectorLayerFeatureSource(layer)
+        schema = vector_layer_utils.getDateFieldSchema(layer)
+        feature_count = layer.featureCount()
+        generation = self._generations.get(layer.id(), 0)
+        dtype = self.dtype
+        sidecar = self.sidecar
+        key = layerSidecarKey(layer, dtype) if sidecar is not None else None
+
+        def load(progress_callback=None):
+            columns = sidecar.load(key) if key is not None else None
+            if columns is None:
+                columns = readVectorColumns(source, schema, feature_count, dtype=dtype,
+                                            progress_callback=progress_callback)
+                if columns is not None and key is not None:
+                    try:
+                        sidecar.save(key, columns)
+                    except OSError:
+                        pass  # the layer stays cached in memory only
+            if columns is not None:
+                columns.buildPointIndex()
+            return columns
+        return load, generation
+
+    def put(self, layer, columns: VectorColumns, generation=0) -> bool:
+        """
+        Add the columns of a layer and evict the least recently used layers if the memory limit is exceeded.
+        :param generation: Generation returned by prepareLoad, columns of a layer edited since are not added
+        :return: True if the columns were cached
+        """
+        layer_id = layer.id()
+        with self._lock:
+            if self._generations.get(layer_id, 0) != generation or columns.nbytes > self.memory_limit:
+                return False
+            self._columns.pop(layer_id, None)
+            self._columns[layer_id] = columns
+            self._evict()
+            return layer_id in self._columns
+
+    def fieldValues(self, layer, field_name) -> np.ndarray:
+        """
+        Get the values of a numeric field of a cached layer. The field is read once and kept with the columns.
+        :return: Array of float64 values in the order of the cached features, or None if the layer is not cached
+        """
+        columns = self.get(layer)
+        if columns is None:
+            return None
+        values = columns.fields.get(field_name)
+        if values is not None:
+            return values
+
+        field_index = layer.fields().indexFromName(field_name)
+        if field_index < 0:
+            return None
+        request = QgsFeatureRequest().setSubsetOfAttributes([field_index])
+        request.setFlags(FEATURE_REQUEST_NO_GEOMETRY)
+        field_ids = []
+        field_values = []
+        for feature in layer.getFeatures(request):
+            field_ids.append(feature.id())
+            field_values.append(toFloat(feature.attributes()[field_index]))
+        values = np.full(len(columns), np.nan)
+        rows = columns.rowsOfIds(field_ids)
+        values[rows[rows >= 0]] = np.asarray(field_values)[rows >= 0]
+
+        with self._lock:
+            if self._columns.get(layer.id()) is columns:
+                columns.fields[field_name] = values
+                self._evict()
+        return values
+
+    def _evict(self):
+        while self._columns and self._nbytes() > self.memory_limit:
+            self._columns.popitem(last=False)
+
+    def _nbytes(self) -> int:
+        return sum(columns.nbytes for columns in self._columns.values())
+
+    def _connectLayer(self, layer):
+        layer_id = layer.id()
+        if layer_id in self._connected_layers:
+            return
+        self._connected_layers.add(layer_id)
+        layer.willBeDeleted.connect(lambda: self.invalidate(layer_id, disconnect=True))
+        for signal_name in ("dataChanged", "featureAdded", "featuresDeleted", "geometryChanged",
+                            "attributeValueChanged", "updatedFields"):
+            getattr(layer, signal_name).connect(lambda *args: self.invalidate(layer_id))
+
+    def invalidate(self, layer_id, disconnect=False):
+        with self._lock:
+            self._columns.pop(layer_id, None)
+            self._generations[layer_id] = self._generations.get(layer_id, 0) + 1
+        if disconnect:
+            self._connected_layers.discard(layer_id)
+
+    def drop(self):
+        """Remove all cached layers."""
+        with self._lock:
+            for layer_id in self._columns:
+                self._generations[layer_id] = self._generations.get(layer_id, 0) + 1
+            self._columns = OrderedDict()
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return self._nbytes()
+
+    def __len__(self):
+        return len(self._columns)
+
+    def stats(self) -> dict:
+        return {"layers": len(self._columns), "nbytes": self.nbytes, "memory_limit": self.memory_limit}
+
+
+class PointIndexCache:
+    """
+    Grid index of the points of vector layers keyed by layer id.
+
+    The index of a layer is taken from the vector layer cache, where it is built in the background together with the
+    cached columns. It is kept up to date while features are added, moved or deleted in an edit session, and removed
+    when the edits are committed or rolled back, when the layer leaves the vector layer cache or when it is deleted.
+    """
+    def __init__(self, layer_cache: VectorLayerCache):
+        self.layer_cache = layer_cache
+        self._indices = {}
+        self._connected_layers = set()
+
+    def getIndex(self, layer):
+        """
+        Get the point index of a layer.
+        :return: GridIndex with feature ids, or None if the layer is not cached
+        """
+        layer_id = layer.id()
+        index = self._indices.get(layer_id)
+        columns = self.layer_cache.get(layer)
+        if columns is None and not layer.isEditable():
+            # the layer was dropped or evicted from the cache, edited layers keep their updated index
+            self.invalidate(layer_id)
+            return None
+        if index is None:
+            if columns is None:
+                return None
+            index = columns.point_index or columns.buildPointIndex()
+            self._indices[layer_id] = index
+            self._connectLayer(layer)
+        return index
+
+    def _connectLayer(self, layer):
+        layer_id = layer.id()
+        if layer_id in self._connected_layers:
+            return
+        self._connected_layers.add(layer_id)
+        layer.willBeDeleted.connect(lambda: self.invalidate(layer_id, disconnect=True))
+        for signal_name in ("afterCommitChanges", "afterRollBack", "dataSourceChanged"):
+            getattr(layer, signal_name).connect(lambda *args: self.invalidate(layer_id))
+        layer.featureAdded.connect(lambda feature_id: self._moveFeature(layer, feature_id))
+        layer.geometryChanged.connect(lambda feature_id, geometry: self._moveFeature(layer, feature_id, geometry))
+        layer.featureDeleted.connect(lambda feature_id: self._removeFeature(layer_id, feature_id))
+
+    def _moveFeature(self, layer, feature_id, geometry=None):
+        index = self._indices.get(layer.id())
+        if index is None:
+            return
+        if geometry is None:
+            geometry = layer.getFeature(feature_id).geometry()
+        x, y = _featurePoint(geometry)
+        index.insert([feature_id], [x], [y])
+
+    def _removeFeature(self, layer_id, feature_id):
+        index = self._indices.get(layer_id)
+        if index is not None:
+            index.remove([feature_id])
+
+    def invalidate(self, layer_id, disconnect=False):
+        self._indices.pop(layer_id, None)
+        if disconnect:
+            self._connected_layers.discard(layer_id)
+
+    def clear(self):
+        self._indices = {}
+
+
+vector_layer_cache = VectorLayerCache()
+point_indices = PointIndexCache(vector_layer_cache)
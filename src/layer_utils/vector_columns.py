@@ -0,0 +1,114 @@
+import numpy as np
+
+from .spatial_index import GridIndex
+from .point_in_polygon import pointsInPolygons, polygonsBounds
+
+# bytes per feature of the ids, coordinates, id lookup and point index
+FEATURE_BYTES = 128
+
+
+def columnsBytes(num_features, num_dates, itemsize=4) -> int:
+    """
+    Estimate the memory of the columns of a vector layer.
+    :param num_features: Number of features
+    :param num_dates: Number of date fields
+    :param itemsize: Size of a date value in bytes, 4 for float32
+    :return: Size in bytes of the date values and of the ids, coordinates, id lookup and point index of the features
+    """
+    return int(num_features) * (FEATURE_BYTES + int(num_dates) * int(itemsize))
+
+
+class VectorColumns:
+    """
+    Time series of all features of a vector layer in contiguous arrays.
+
+    Attributes:
+        feature_ids: Feature ids as int64 array.
+        x, y: Coordinates of the features in the layer CRS as float64 arrays, NaN for features without geometry.
+        values: Values of the date fields with shape (features, dates), float32 by default.
+        dates: Dates of the date fields as datetime64[D] array.
+        fields: Values of other numeric fields loaded on demand, by field name.
+        point_index: GridIndex of the coordinates, or None if it is not built.
+    """
+    def __init__(self, feature_ids, x, y, values, dates, order=None):
+        """
+        :param order: Order that sorts the feature ids, e.g. stored with the columns. Default is None to sort the ids.
+        """
+        self.feature_ids = np.asarray(feature_ids, dtype=np.int64)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.values = values
+        self.dates = dates
+        self.fields = {}
+        self.point_index = None
+        self._order = np.argsort(self.feature_ids, kind="stable") if order is None else np.asarray(order)
+        self._sorted_ids = self.feature_ids[self._order]
+
+    @property
+    def order(self) -> np.ndarray:
+        """Order that sorts the feature ids."""
+        return self._order
+
+    def __len__(self):
+        return len(self.feature_ids)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.feature_ids, self.x, self.y, self.values, self._order, self._sorted_ids]
+        nbytes = sum(array.nbytes for array in arrays) + sum(array.nbytes for array in self.fields.values())
+        if self.point_index is not None:
+            nbytes += self.point_index.nbytes
+        return int(nbytes)
+
+    def rowsOfIds(self, feature_ids) -> np.ndarray:
+        """
+        Get the rows of features.
+        :param feature_ids: Feature ids
+        :return: Array of rows, -1 for ids that are not in the columns
+        """
+        feature_ids = np.asarray(feature_ids, dtype=np.int64).ravel()
+        if len(self) == 0:
+            return np.full(feature_ids.shape, -1, dtype=np.int64)
+        positions = np.searchsorted(self._sorted_ids, feature_ids)
+        positions = np.minimum(positions, len(self) - 1)
+        found = self._sorted_ids[positions] == feature_ids
+        return np.where(found, self._order[positions], -1)
+
+    def valuesOfIds(self, feature_ids) -> np.ndarray:
+        """
+        Get the date values of features.
+        :return: Matrix with shape (features, dates), NaN rows for ids that are not in the columns
+        """
+        rows = self.rowsOfIds(feature_ids)
+        if len(self) == 0:
+            return np.full((len(rows), self.values.shape[1]), np.nan, dtype=self.values.dtype)
+        values = self.values[np.maximum(rows, 0)]
+        values[rows < 0] = np.nan
+        return values
+
+    def rowsInRectangle(self, x_min, y_min, x_max, y_max) -> np.ndarray:
+        """Get the rows of the features inside a rectangle, including its boundary."""
+        inside = (self.x >= x_min) & (self.x <= x_max) & (self.y >= y_min) & (self.y <= y_max)
+        return np.flatnonzero(inside)
+
+    def rowsInPolygons(self, polygons) -> np.ndarray:
+        """
+        Get the rows of the features inside polygons or on their boundary.
+        The candidates are taken from the point index if it is built, otherwise from a scan of the coordinates.
+        :param polygons: Sequence of polygons, each a sequence of rings with the exterior ring first
+        :return: Sorted array of rows
+        """
+        polygons = [rings for rings in polygons if rings]
+        if not polygons or len(self) == 0:
+            return np.empty(0, dtype=np.int64)
+        bounds = polygonsBounds(polygons)
+        if self.point_index is not None:
+            ids, x, y = self.point_index.rectangle(*bounds)
+            rows = np.sort(self.rowsOfIds(ids[pointsInPolygons(x, y, polygons)]))
+            return rows[rows >= 0]
+        rows = self.rowsInRectangle(*bounds)
+        return rows[pointsInPolygons(self.x[rows], self.y[rows], polygons)]
+
+    def buildPointIndex(self) -> GridIndex:
+        self.point_index = GridIndex(self.x, self.y, ids=self.feature_ids)
+        return self.point_index
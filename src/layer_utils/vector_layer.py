@@ -1,9 +1,49 @@
-import re
-from datetime import datetime
 import numpy as np
-from qgis.core import QgsFeature
-from ..qt_compat import VECTOR_LAYER
+from qgis.core import QgsFeature, QgsFeatureRequest
+from ..qt_compat import VECTOR_LAYER, FEATURE_REQUEST_NO_GEOMETRY
 from qgis.PyQt.QtCore import QVariant
+from .date_fields import DateFieldSchema, buildDateFieldSchema, attributesToFloat
+
+
+class DateFieldSchemaCache:
+    """
+    Cache of the date field schema of vector layers keyed by layer id.
+
+    The field names are parsed once per layer instead of once per clicked feature. A schema is removed when fields
+    are added to or deleted from the layer, or when the layer is deleted.
+    """
+    def __init__(self):
+        self._schemas = {}
+        self._connected_layers = set()
+
+    def getSchema(self, layer) -> DateFieldSchema:
+        layer_id = layer.id()
+        schema = self._schemas.get(layer_id)
+        if schema is None:
+            schema = buildDateFieldSchema([field.name() for field in layer.fields()])
+            self._schemas[layer_id] = schema
+            self._connectLayer(layer)
+        return schema
+
+    def _connectLayer(self, layer):
+        layer_id = layer.id()
+        if layer_id in self._connected_layers:
+            return
+        self._connected_layers.add(layer_id)
+        layer.willBeDeleted.connect(lambda: self.invalidate(layer_id, disconnect=True))
+        for signal_name in ("attributeAdded", "attributeDeleted", "updatedFields"):
+            getattr(layer, signal_name).connect(lambda *args: self.invalidate(layer_id))
+
+    def invalidate(self, layer_id, disconnect=False):
+        self._schemas.pop(layer_id, None)
+        if disconnect:
+            self._connected_layers.discard(layer_id)
+
+    def clear(self):
+        self._schemas = {}
+
+
+date_field_schemas = DateFieldSchemaCache()
 
 
 def checkVectorLayer(layer):
@@ -46,20 +86,13 @@ def getVectorVelocityFieldName(layer):
 
 def checkVectorLayerTimeseries(layer):
     """ check layer is a valid vector with velocity """
-    pattern_options = [r'^D(\d{8})$', r'(\d{8})$', r'^D_(\d{8})$']
-    date_field_patterns = [re.compile(pattern) for pattern in pattern_options]
-
-    count = 0
     message = ""
 
     status, message = checkVectorLayer(layer)
     if status is False:
         return status, message
 
-    for field in layer.fields():
-        match = [pattern.match(field.name()) for pattern in date_field_patterns]
-        if any(match):
-            count += 1
+    count = len(date_field_schemas.getSchema(layer))
 
     if count > 0:
         status = True
@@ -80,31 +113,65 @@ def getFeatureAttributes(feature: QgsFeature) -> dict:
     return {field.name(): feature[field.name()] for field in feature.fields()}
 
 
-def extractDateValueAttributes(attributes: dict) -> list:
+def getDateFieldSchema(layer) -> DateFieldSchema:
     """
-    Extract attributes with keys in the format 'DYYYYMMDD' or 'YYYYMMDD' and return a list of tuples with datetime and
-    float value.
-    :param attributes: Dictionary of feature attributes
-    :return: List of tuples (datetime, float)
+    Get the cached date fields of a vector layer, sorted by date.
+    :param layer: QgsVectorLayer
+    :return: DateFieldSchema
     """
-    pattern_options = [r'^D(\d{8})$', r'(\d{8})$', r'^D_(\d{8})$']
-    date_value_patterns = [re.compile(pattern) for pattern in pattern_options]
-    date_value_list = []
+    return date_field_schemas.getSchema(layer)
+
 
-    for key, value in attributes.items():
-        match = [pattern.match(key) for pattern in date_value_patterns]
-        if any(match):
-            date_str = next(m.group(1) for m in match if m)
-            date_obj = datetime.strptime(date_str, '%Y%m%d')
+def extractDateValues(feature: QgsFeature, schema: DateFieldSchema) -> np.ndarray:
+    """
+    Extract the values of the date fields of a feature.
+    :param feature: QgsFeature of the layer of the schema
+    :param schema: DateFieldSchema of the layer
+    :return: Array of float64 values ordered like schema.dates, NaN for NULL values
+    """
+    return attributesToFloat(feature.attributes(), schema.field_indices)
 
-            # check if field value is NULL
-            if isinstance(value, QVariant):
-                if value.isNull():
-                    value = np.nan
 
-            date_value_list.append((date_obj, value))
+def extractDateValueMatrix(layer, feature_ids, schema: DateFieldSchema, dtype=np.float64,
+                           progress_callback=None, progress_step=10000) -> np.ndarray:
+    """
+    Extract the values of the date fields of many features into one matrix.
+    The features are fetched with a single request that reads only the date fields and no geometry.
+    :param layer: QgsVectorLayer
+    :param feature_ids: Ids of the features to extract, e.g. from a spatial filter
+    :param schema: DateFieldSchema of the layer
+    :param dtype: Data type of the matrix, float64 or float32
+    :param progress_callback: Function called with (number of extracted features, number of features)
+    :param progress_step: Number of features between two calls of progress_callback
+    :return: Matrix with shape (features, dates) in the order of feature_ids, NaN for NULL values
+    """
+    feature_ids = list(feature_ids)
+    matrix = np.full((len(feature_ids), len(schema)), np.nan, dtype=dtype)
+    if not feature_ids or len(schema) == 0:
+        return matrix
 
-    return np.array(date_value_list, dtype=object)
+    request = QgsFeatureRequest().setFilterFids(feature_ids)
+    request.setSubsetOfAttributes([int(index) for index in schema.field_indices])
+    request.setFlags(FEATURE_REQUEST_NO_GEOMETRY)
+
+    rows = {feature_id: row for row, feature_id in enumerate(feature_ids)}
+    field_indices = schema.field_indices
+    for count, feature in enumerate(layer.getFeatures(request), start=1):
+        matrix[rows[feature.id()]] = attributesToFloat(feature.attributes(), field_indices)
+        if progress_callback is not None and count % progress_step == 0:
+            progress_callback(count, len(feature_ids))
+    return matrix
+
+
+def polygonRings(geometry) -> list:
+    """
+    Get the vertices of a polygon or multi polygon geometry.
+    :param geometry: QgsGeometry of a polygon
+    :return: List of polygons, each a list of (vertices, 2) arrays with the exterior ring first
+    """
+    polygons = geometry.asMultiPolygon() if geometry.isMultipart() else [geometry.asPolygon()]
+    return [[np.array([(point.x(), point.y()) for point in ring], dtype=np.float64).reshape(-1, 2)
+             for ring in polygon] for polygon in polygons]
 
 
 def getFeatureFieldValue(attributes: dict, field_name: str) -> float:
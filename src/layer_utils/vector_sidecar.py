@@ -0,0 +1,178 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+
+from .vector_columns import VectorColumns
+
+SIDECAR_VERSION = 1
+HEADER_FILE_NAME = "header.json"
+ARRAY_NAMES = ("feature_ids", "x", "y", "values", "dates", "order")
+
+
+# files whose content is read with the data file, by extension of the data file. Other files with the same name, e.g.
+# .qml styles or .aux.xml metadata, do not change the cached columns.
+DATA_FILE_SIBLINGS = {
+    ".shp": (".dbf", ".shx", ".prj", ".cpg"),
+    ".gpkg": ("-wal",),
+    ".sqlite": ("-wal",),
+    ".db": ("-wal",),
+}
+
+
+def layerDataFiles(file_path) -> list:
+    """
+    Get the files of a vector layer that determine its features: the data file and its known data siblings, e.g. the
+    .dbf of a shapefile or the write-ahead log of a GeoPackage.
+    :param file_path: Path of the data file
+    :return: List of paths, including siblings that do not exist yet
+    """
+    stem, extension = os.path.splitext(file_path)
+    file_paths = [file_path]
+    for sibling in DATA_FILE_SIBLINGS.get(extension.lower(), ()):
+        if sibling.startswith("."):
+            # the siblings of a shapefile have the case of its extension
+            file_paths.append(stem + (sibling.upper() if extension.isupper() else sibling))
+        else:
+            file_paths.append(file_path + sibling)
+    return file_paths
+
+
+def sidecarKey(uri, file_paths, subset_string="", dtype="float32") -> dict:
+    """
+    Build the key of the cached columns of a vector layer.
+    Changing the layer files changes their size or modification time, and therefore the key.
+    :param uri: Data source URI of the layer, including the layer name of multi-layer files
+    :param file_paths: Paths of the files of the layer, e.g. a GeoPackage and its write-ahead log
+    :param subset_string: Subset string (filter) of the layer
+    :param dtype: Data type of the cached date values
+    :return: JSON serializable dictionary
+    """
+    files = []
+    for file_path in file_paths:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        files.append([os.path.abspath(file_path), int(stat.st_size), int(stat.st_mtime_ns)])
+    return {"version": SIDECAR_VERSION, "uri": uri, "files": files, "subset": subset_string or "",
+            "dtype": np.dtype(dtype).name}
+
+
+def keyDigest(key: dict) -> str:
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+class SidecarCache:
+    """
+    Directory of cached vector layer columns, stored as memory-mappable .npy files.
+
+    Each entry is a sub directory named after the digest of its key, with one .npy file per array and a header with
+    the key. Loaded entries are memory-mapped, so that reopening a large layer does not scan its features. Entries
+    whose layer files changed are not found anymore, because the key contains the size and modification time of the
+    files. The least recently used entries are deleted when the directory exceeds the size limit.
+
+    Attributes:
+        directory: Cache directory.
+        size_limit: Maximum size of the cache directory in bytes.
+    """
+    def __init__(self, directory, size_limit=4096):
+        """
+        :param directory: Cache directory, created when the first entry is saved
+        :param size_limit: int in Mb
+        """
+        self.directory = directory
+        self.size_limit = int(size_limit * 1024 * 1024)
+
+    def entryDirectory(self, key: dict) -> str:
+        return os.path.join(self.directory, keyDigest(key))
+
+    def load(self, key: dict) -> VectorColumns:
+        """
+        Load cached columns.
+        :return: VectorColumns with memory-mapped arrays, or None if the key is not cached
+        """
+        entry_directory = self.entryDirectory(key)
+        header_path = os.path.join(entry_directory, HEADER_FILE_NAME)
+        try:
+            with open(header_path) as f:
+                header = json.load(f)
+            if header.get("key") != key:
+                return None
+            arrays = {name: np.load(os.path.join(entry_directory, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+                      for name in ARRAY_NAMES}
+        except (OSError, ValueError):
+            return None
+
+        # the modification time of the header marks the last use of the entry
+        try:
+            os.utime(header_path)
+        except OSError:
+            pass
+        return VectorColumns(arrays["feature_ids"], arrays["x"], arrays["y"], arrays["values"], arrays["dates"],
+                             order=arrays["order"])
+
+    def save(self, key: dict, columns: VectorColumns) -> str:
+        """
+        Save columns and delete the least recently used entries if the cache exceeds the size limit.
+        :return: Directory of the entry or an empty string if the columns are larger than the size limit
+        """
+        arrays = {"feature_ids": columns.feature_ids, "x": columns.x, "y": columns.y, "values": columns.values,
+                  "dates": np.asarray(columns.dates, dtype="datetime64[D]"), "order": columns.order}
+        if sum(array.nbytes for array in arrays.values()) > self.size_limit:
+            return ""
+
+        entry_directory = self.entryDirectory(key)
+        tmp_directory = entry_directory + ".tmp"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_directory, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+            with open(os.path.join(tmp_directory, HEADER_FILE_NAME), "w") as f:
+                json.dump({"key": key, "count": len(columns)}, f, indent=1)
+            shutil.rmtree(entry_directory, ignore_errors=True)
+            os.replace(tmp_directory, entry_directory)
+        except OSError:
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            raise
+
+        self.enforceSizeLimit(keep=entry_directory)
+        return entry_directory
+
+    def entries(self) -> list:
+        """
+        List the cache entries.
+        :return: List of (last use, size in bytes, entry directory), least recently used first
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            entry_directory = os.path.join(self.directory, name)
+            header_path = os.path.join(entry_directory, HEADER_FILE_NAME)
+            if name.endswith(".tmp") or not os.path.isfile(header_path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(entry_directory) if entry.is_file())
+            entries.append((os.stat(header_path).st_mtime_ns, size, entry_directory))
+        return sorted(entries)
+
+    def nbytes(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def enforceSizeLimit(self, keep=None):
+        """Delete the least recently used entries until the cache fits the size limit."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_directory in entries:
+            if total <= self.size_limit:
+                break
+            if entry_directory == keep:
+                continue
+            shutil.rmtree(entry_directory, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        for _, _, entry_directory in self.entries():
+            shutil.rmtree(entry_directory, ignore_errors=True)
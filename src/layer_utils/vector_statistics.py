@@ -0,0 +1,96 @@
+import numpy as np
+from qgis.core import QgsFeatureRequest
+
+from ..qt_compat import FEATURE_REQUEST_NO_GEOMETRY
+from .date_fields import toFloat
+from .field_statistics import FieldStatistics
+from . import vector_cache as vector_cache_utils
+
+
+def computeFieldStatistics(layer, field_name, chunk_size=65536, bins=4096) -> FieldStatistics:
+    """
+    Compute the statistics of a numeric field in one pass over the features.
+    Only the field is requested from the data provider, without geometries. Layers in the vector layer cache are
+    read from memory.
+    :param layer: QgsVectorLayer
+    :param field_name: Name of the field
+    :param chunk_size: Number of values added to the statistics at once
+    :param bins: Number of histogram bins for the percentiles
+    :return: FieldStatistics, without values if the field does not exist
+    """
+    statistics = FieldStatistics(bins=bins)
+    field_index = layer.fields().indexFromName(field_name)
+    if field_index < 0:
+        return statistics
+
+    cached_values = vector_cache_utils.vector_layer_cache.fieldValues(layer, field_name)
+    if cached_values is not None:
+        for start in range(0, len(cached_values), chunk_size):
+            statistics.add(cached_values[start:start + chunk_size])
+        return statistics
+
+    request = QgsFeatureRequest().setSubsetOfAttributes([field_index])
+    request.setFlags(FEATURE_REQUEST_NO_GEOMETRY)
+    chunk = []
+    for feature in layer.getFeatures(request):
+        chunk.append(feature.attributes()[field_index])
+        if len(chunk) == chunk_size:
+            statistics.add(_chunkToFloat(chunk))
+            chunk = []
+    statistics.add(_chunkToFloat(chunk))
+    return statistics
+
+
+def _chunkToFloat(values) -> np.ndarray:
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        # NULL values, fall back to converting the values one by one
+        return np.array([toFloat(value) for value in values], dtype=np.float64)
+
+
+class FieldStatisticsCache:
+    """
+    Cache of the statistics of vector layer fields keyed by layer id, field name and subset string.
+
+    The statistics are computed on the first request for a symbology range, so that later ranges from the min and max,
+    standard deviations or percentiles of the same field are instant. The statistics of a layer are removed when its
+    features or attributes change, or when the layer is deleted.
+    """
+    def __init__(self):
+        self._statistics = {}
+        self._connected_layers = set()
+
+    def cachedStatistics(self, layer, field_name) -> FieldStatistics:
+        """Get the statistics of a field if they are cached, without computing them."""
+        return self._statistics.get((layer.id(), field_name, layer.subsetString()))
+
+    def getStatistics(self, layer, field_name) -> FieldStatistics:
+        key = (layer.id(), field_name, layer.subsetString())
+        statistics = self._statistics.get(key)
+        if statistics is None:
+            statistics = computeFieldStatistics(layer, field_name)
+            self._statistics[key] = statistics
+            self._connectLayer(layer)
+        return statistics
+
+    def _connectLayer(self, layer):
+        layer_id = layer.id()
+        if layer_id in self._connected_layers:
+            return
+        self._connected_layers.add(layer_id)
+        layer.willBeDeleted.connect(lambda: self.invalidate(layer_id, disconnect=True))
+        for signal_name in ("dataChanged", "featureAdded", "featuresDeleted", "attributeValueChanged",
+                            "updatedFields"):
+            getattr(layer, signal_name).connect(lambda *args: self.invalidate(layer_id))
+
+    def invalidate(self, layer_id, disconnect=False):
+        self._statistics = {key: value for key, value in self._statistics.items() if key[0] != layer_id}
+        if disconnect:
+            self._connected_layers.discard(layer_id)
+
+    def clear(self):
+        self._statistics = {}
+
+
+field_statistics = FieldStatisticsCache()
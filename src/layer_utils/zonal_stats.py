@@ -0,0 +1,169 @@
+import numpy as np
+
+
+def rowsPerBlock(x_count, num_bands, memory_limit=256, itemsize=4) -> int:
+    """
+    Get the number of raster rows that can be read at once within a memory limit.
+    :param x_count: Number of columns of the window
+    :param num_bands: Number of bands read at once
+    :param memory_limit: int in Mb
+    :param itemsize: Size of one value in bytes
+    :return: Number of rows, at least one
+    """
+    row_bytes = max(1, x_count * num_bands * itemsize)
+    return int(max(1, memory_limit * 1024 * 1024 // row_bytes))
+
+
+# bytes per value of a block while it is added: the float32 read and its masked copy, the float64 copy and the
+# float64 temporaries of ZonalStatistics.add() and addHistogram()
+BLOCK_BYTES_PER_VALUE = 6 * 8
+
+
+def zonalMemoryBudget(x_count, num_bands, memory_limit=256) -> (int, float):
+    """
+    Split a total memory limit between the blocks read at once with their work arrays, and the values kept by
+    ZonalStatistics for exact percentiles.
+    :param x_count: Number of columns of the window
+    :param num_bands: Number of bands read at once
+    :param memory_limit: int in Mb, total memory limit
+    :return: Number of rows per block and the memory limit of ZonalStatistics in Mb
+    """
+    values_limit = memory_limit / 2
+    return rowsPerBlock(x_count, num_bands, memory_limit - values_limit, itemsize=BLOCK_BYTES_PER_VALUE), values_limit
+
+
+class ZonalStatistics:
+    """
+    Streaming per-date statistics of the pixels of a zone.
+
+    Pixel values are added in blocks with shape (bands, pixels). Count, mean, min and max are accumulated in one pass.
+    The values are kept in memory for exact percentiles as long as they fit into the memory limit. Larger zones
+    require a second pass over the blocks, in which per-date histograms between the min and max of each date give
+    the percentiles with a resolution of (max - min) / bins.
+
+    Attributes:
+        num_bands: Number of dates.
+        percentiles: Percentiles in the range 0 to 100.
+        num_pixels: Number of pixels with at least one finite value.
+        count: Number of finite values per date.
+        min, max: Min and max per date. NaN for dates without finite values.
+    """
+    def __init__(self, num_bands, percentiles=(5, 50, 95), memory_limit=256, bins=1024):
+        """
+        :param num_bands: int, number of dates
+        :param percentiles: Percentiles in the range 0 to 100
+        :param memory_limit: int in Mb, maximum size of the values kept for exact percentiles
+        :param bins: int, number of histogram bins per date for large zones
+        """
+        self.num_bands = int(num_bands)
+        self.percentiles = tuple(percentiles)
+        self.memory_limit = int(memory_limit * 1024 * 1024)
+        self.bins = int(bins)
+        self.num_pixels = 0
+        self.count = np.zeros(self.num_bands, dtype=np.int64)
+        self._sum = np.zeros(self.num_bands, dtype=np.float64)
+        self.min = np.full(self.num_bands, np.inf)
+        self.max = np.full(self.num_bands, -np.inf)
+        self._values = []
+        self._nbytes = 0
+        self._histogram = None
+
+    def add(self, values: np.ndarray):
+        """
+        Add the values of pixels of the zone.
+        :param values: Array with shape (bands, pixels), NaN for missing values
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(self.num_bands, -1)
+        if values.shape[1] == 0:
+            return
+        finite = np.isfinite(values)
+        self.num_pixels += int(np.count_nonzero(finite.any(axis=0)))
+        self.count += finite.sum(axis=1)
+        self._sum += np.where(finite, values, 0).sum(axis=1)
+        self.min = np.fmin(self.min, np.where(finite, values, np.inf).min(axis=1))
+        self.max = np.fmax(self.max, np.where(finite, values, -np.inf).max(axis=1))
+
+        if self._values is not None:
+            self._nbytes += values.nbytes
+            if self._nbytes <= self.memory_limit:
+                self._values.append(values)
+            else:
+                self._values = None
+
+    def needsHistogramPass(self) -> bool:
+        """Return True if the values did not fit into memory and the blocks must be added again with addHistogram."""
+        return self._values is None and len(self.percentiles) > 0
+
+    def addHistogram(self, values: np.ndarray):
+        """
+        Add the values of pixels of the zone to the per-date histograms in a second pass.
+        :param values: Array with shape (bands, pixels), NaN for missing values
+        """
+        if self._histogram is None:
+            self._histogram = np.zeros((self.num_bands, self.bins), dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64).reshape(self.num_bands, -1)
+        finite = np.isfinite(values)
+        lower, width = self._binEdges()
+        bin_index = ((np.where(finite, values, lower[:, None]) - lower[:, None]) / width[:, None]).astype(np.int64)
+        bin_index = np.clip(bin_index, 0, self.bins - 1)
+        band_index = np.broadcast_to(np.arange(self.num_bands)[:, None], values.shape)
+        flat_index = band_index[finite] * self.bins + bin_index[finite]
+        self._histogram += np.bincount(flat_index, minlength=self.num_bands * self.bins).reshape(self.num_bands,
+                                                                                                 self.bins)
+
+    def _binEdges(self) -> (np.ndarray, np.ndarray):
+        lower = np.where(self.count > 0, self.min, 0.0)
+        width = np.where(self.count > 0, self.max - self.min, 0.0) / self.bins
+        return lower, np.where(width > 0, width, 1.0)
+
+    def _histogramPercentiles(self) -> np.ndarray:
+        lower, width = self._binEdges()
+        cumulative = np.cumsum(self._histogram, axis=1)
+        bands = np.arange(self.num_bands)
+        result = np.full((len(self.percentiles), self.num_bands), np.nan)
+        for i, q in enumerate(self.percentiles):
+            rank = q / 100 * np.maximum(self.count - 1, 0)
+            # first bin whose cumulative count exceeds the rank
+            bin_index = np.clip((cumulative <= rank[:, None]).sum(axis=1), 0, self.bins - 1)
+            # interpolate inside the bin containing the rank
+            before = np.where(bin_index > 0, cumulative[bands, bin_index - 1], 0)
+            in_bin = np.maximum(self._histogram[bands, bin_index], 1)
+            fraction = np.clip((rank - before + 0.5) / in_bin, 0, 1)
+            value = lower + (bin_index + fraction) * width
+            result[i] = np.clip(value, self.min, self.max)
+        return result
+
+    def result(self) -> dict:
+        """
+        Get the statistics per date.
+        :return: dict with 'count', 'mean', 'min', 'max' arrays with one value per date and 'percentiles', a dict of
+            arrays by percentile. Statistics of dates without finite values are NaN.
+        """
+        valid = self.count > 0
+        mean = np.full(self.num_bands, np.nan)
+        mean[valid] = self._sum[valid] / self.count[valid]
+        minimum = np.where(valid, self.min, np.nan)
+        maximum = np.where(valid, self.max, np.nan)
+
+        if not self.percentiles:
+            percentile_values = np.empty((0, self.num_bands))
+        elif self._values is not None:
+            if self._values:
+                values = np.concatenate(self._values, axis=1)
+                percentile_values = np.full((len(self.percentiles), self.num_bands), np.nan)
+                percentile_values[:, valid] = np.nanpercentile(values[valid], self.percentiles, axis=1)
+            else:
+                percentile_values = np.full((len(self.percentiles), self.num_bands), np.nan)
+        elif self._histogram is not None:
+            percentile_values = self._histogramPercentiles()
+            percentile_values[:, ~valid] = np.nan
+        else:
+            raise RuntimeError("The histogram pass is required for the percentiles of large zones.")
+
+        return {
+            "count": self.count.copy(),
+            "mean": mean,
+            "min": minimum,
+            "max": maximum,
+            "percentiles": {q: percentile_values[i] for i, q in enumerate(self.percentiles)},
+        }
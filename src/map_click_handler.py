@@ -14,6 +14,7 @@ from . import plot_timeseries as pts
 from .layer_utils import vector_layer as vector_layer_utils
 from .layer_utils import grd_layer as grd_layer_utils
 from .layer_utils import raster_layer as raster_layer_utils
+from .layer_utils import vector_cache as vector_cache_utils
 
 
 @dataclass
@@ -206,6 +207,24 @@ class MapClickHandler:
             canvas.scene().removeItem(self.reference_highlight)
             self.reference_highlight = None
 
+    @staticmethod
+    def searchRectangle(layer, point, canvas) -> QgsRectangle:
+        """
+        Get the rectangle around a map point in which features are searched
+        :param layer: QgsMapLayer
+        :param point: QgsPointXY in map coordinates
+        :param canvas: QgsMapCanvas
+        :return: QgsRectangle in layer coordinates
+        """
+        settings = QgsSettings()
+        radius = settings.value("/Map/searchRadiusMM", Qgis.DEFAULT_SEARCH_RADIUS_MM, type=float)
+        if radius <= 0:
+            radius = Qgis.DEFAULT_SEARCH_RADIUS_MM
+        radius = canvas.extent().width() * radius / canvas.size().width()
+        radius *= 5
+        rect = QgsRectangle(point.x() - radius, point.y() - radius, point.x() + radius, point.y() + radius)
+        return canvas.mapSettings().mapToLayerCoordinates(layer, rect)
+
     @classmethod
     def findFeatureAtPoint(cls, layer, point, canvas, only_the_closest_one=True, only_ids=False):
         """
@@ -218,25 +237,29 @@ class MapClickHandler:
         :return: closest feature or feature ID
         """
         QApplication.setOverrideCursor(QCursor(WAIT_CURSOR))
-        settings = QgsSettings()
-        radius = settings.value("/Map/searchRadiusMM", Qgis.DEFAULT_SEARCH_RADIUS_MM, type=float)
-        if radius <= 0:
-            radius = Qgis.DEFAULT_SEARCH_RADIUS_MM
-        radius = canvas.extent().width() * radius / canvas.size().width()
-        radius *= 5
-        rect = QgsRectangle(point.x() - radius, point.y() - radius, point.x() + radius, point.y() + radius)
-        rect = canvas.mapSettings().mapToLayerCoordinates(layer, rect)
+        rect = cls.searchRectangle(layer, point, canvas)
         point_map = canvas.mapSettings().mapToLayerCoordinates(layer, point)
         ret = None
 
-        if only_the_closest_one:
+        index = vector_cache_utils.point_indices.getIndex(layer)
+        if only_the_closest_one and index is not None:
+            # search the point index of the cached layer instead of the features of the data provider
+            search_distance = max(rect.width(), rect.height()) / 2
+            ids, _ = index.nearest(point_map.x(), point_map.y(), k=1, max_distance=search_distance)
+            feature_id = int(ids[0]) if len(ids) else None
+            if only_ids:
+                ret = feature_id
+            elif feature_id is not None:
+                ret = layer.getFeature(feature_id)
+        elif only_the_closest_one:
             request = QgsFeatureRequest()
             request.setFilterRect(rect)
             min_dist = -1
             feature_id = None
+            point_geometry = QgsGeometry.fromPointXY(point_map)
             for f in layer.getFeatures(request):
                 geom = f.geometry()
-                distance = geom.distance(QgsGeometry.fromPointXY(point_map))
+                distance = geom.distance(point_geometry)
                 if min_dist < 0 or distance < min_dist:
                     min_dist = distance
                     feature_id = f.id()
@@ -264,7 +287,17 @@ class TSClickHandler(MapClickHandler):
     def __init__(self, plugin, msg_signal=None):
         super().__init__(plugin, msg_signal=msg_signal)
         self.plot_ts = pts.PlotTs(self.ui)
-        self.raster_layer = raster_layer_utils.RasterTimeseries()
+        settings = QgsSettings()
+        self.raster_layer = raster_layer_utils.RasterTimeseries(
+            tile_size=settings.value("insar_explorer/raster_tile_size", 128, type=int),
+            memory_limit=settings.value("insar_explorer/raster_cache_memory_limit", 256, type=int),
+            workers=settings.value("insar_explorer/raster_read_workers", 4, type=int))
+        self.vector_cache = vector_cache_utils.vector_layer_cache
+        self.vector_cache.setMemoryLimit(settings.value("insar_explorer/vector_cache_memory_limit", 1024, type=int))
+        if settings.value("insar_explorer/vector_disk_cache_enabled", True, type=bool):
+            self.vector_cache.sidecar = vector_cache_utils.createSidecarCache(
+                directory=settings.value("insar_explorer/vector_disk_cache_directory", "", type=str),
+                size_limit=settings.value("insar_explorer/vector_disk_cache_size_limit", 4096, type=int))
         self.selected_field_name = None
 
     def reset(self):
@@ -301,33 +334,71 @@ class TSClickHandler(MapClickHandler):
             coords = None
             ref_coords = None
 
-            attributes = vector_layer_utils.getFeatureAttributes(feature)
-            date_values = vector_layer_utils.extractDateValueAttributes(attributes)
+            schema = vector_layer_utils.getDateFieldSchema(layer)
+            columns = self.vector_cache.get(layer)
+            if columns is not None:
+                values = columns.valuesOfIds([feature.id()])[0].astype(np.float64)
+            else:
+                values = vector_layer_utils.extractDateValues(feature, schema)
             if not ref:
-                ts_values = date_values[:, 1]
+                ts_values = values
                 ref_values = None
                 coords = crds
             else:
-                ref_values = date_values[:, 1]
+                ref_values = values
                 if self.selected_field_name:
+                    attributes = vector_layer_utils.getFeatureAttributes(feature)
                     self.map_reference_clicked_value = (
                         vector_layer_utils.getFeatureFieldValue(attributes, self.selected_field_name))
                 ts_values = None
                 ref_coords = crds
 
-            dates = date_values[:, 0]
+            dates = schema.dates
             self.plot_ts.plotTs(dates=dates, ts_values=ts_values, ref_values=ref_values,
                                 coords=coords, ref_coords=ref_coords)
 
+    def previewPointHovered(self, point: QgsPointXY, layer: QgsMapLayer = None) -> bool:
+        """
+        Preview the time series of the point closest to the mouse position.
+        Only layers in the vector layer cache are previewed, so that each position costs one query of the point index
+        and one row of the cached matrix instead of a request to the data provider.
+        :param point: QgsPointXY in map coordinates
+        :param layer: QgsMapLayer
+        :return: True if a time series is previewed
+        """
+        if not layer:
+            layer = self.iface.activeLayer()
+        columns = self.vector_cache.get(layer)
+        index = vector_cache_utils.point_indices.getIndex(layer) if columns is not None else None
+        if index is None:
+            self.plot_ts.clearPreview()
+            return False
+
+        canvas = self.iface.mapCanvas()
+        rect = self.searchRectangle(layer, point, canvas)
+        point_layer = canvas.mapSettings().mapToLayerCoordinates(layer, point)
+        ids, _ = index.nearest(point_layer.x(), point_layer.y(), k=1,
+                               max_distance=max(rect.width(), rect.height()) / 2)
+        if len(ids) == 0:
+            self.plot_ts.clearPreview()
+            return False
+
+        key = (layer.id(), int(ids[0]))
+        if key != self.plot_ts.preview_key:
+            values = columns.valuesOfIds([key[1]])[0].astype(np.float64)
+            schema = vector_layer_utils.getDateFieldSchema(layer)
+            self.plot_ts.plotPreview(dates=schema.dates, values=values, key=key)
+        return True
+
     def choosePointClickedRaster(self, *, point: QgsPointXY, layer: QgsMapLayer = None, ref=False):
         status, message = grd_layer_utils.checkGrdTimeseries(layer)
         if status is False:
             self.msg_signal.emit(message, "i", 0)
             return
 
-        date_values = self.raster_layer.getRasterTimeseriesAttributes(layer, point=point)
+        dates, values = self.raster_layer.getRasterTimeseriesAttributes(layer, point=point)
 
-        if date_values.size == 0:
+        if values.size == 0:
             return
 
         clicked_point = QgsGeometry.fromPointXY(point)
@@ -341,16 +412,15 @@ class TSClickHandler(MapClickHandler):
         ref_coords = None
 
         if not ref:
-            ts_values = date_values[:, 1]
+            ts_values = values
             ref_values = None
             coords = crds
         else:
-            ref_values = date_values[:, 1]
+            ref_values = values
             self.map_reference_clicked_value = self.raster_layer.getClickedPixelValue(layer, point=point)
             ts_values = None
             ref_coords = crds
 
-        dates = date_values[:, 0]
         self.plot_ts.plotTs(dates=dates, ts_values=ts_values, ref_values=ref_values,
                             coords=coords, ref_coords=ref_coords)
 
@@ -364,7 +434,7 @@ class PolygonClickHandler(MapClickHandler):
         super().__init__(plugin, msg_signal=msg_signal)
         self.polygon = None
 
-    def identifyFeaturesInPolygon(self, layer: QgsMapLayer, polygon: QgsGeometry, ref=False) -> list:
+    def identifyFeatureIdsInPolygon(self, layer: QgsMapLayer, polygon: QgsGeometry, ref=False, columns=None) -> list:
         if not layer:
             layer = self.iface.activeLayer()
 
@@ -385,24 +455,30 @@ class PolygonClickHandler(MapClickHandler):
             self.msg_signal.emit("Invalid polygon geometry.", "w", 0)
             return []
 
-        # Prepare a feature request that uses the bounding box of the polygon
-        request = QgsFeatureRequest().setFilterRect(polygon.boundingBox())
-
-        # Identify features intersecting the polygon
-        features = []
-        for feature in layer.getFeatures(request):
-            if feature.geometry().intersects(polygon):
-                features.append(feature)
-
-        if features:
-            self.msg_signal.emit(f"{len(features)} features identified.", "i", 0)
+        if columns is not None:
+            # test all cached coordinates at once instead of the features of the data provider
+            rows = columns.rowsInPolygons(vector_layer_utils.polygonRings(polygon))
+            feature_ids = columns.feature_ids[rows].tolist()
+        else:
+            # Identify features intersecting the polygon, with the polygon prepared once for all tests
+            engine = QgsGeometry.createGeometryEngine(polygon.constGet())
+            engine.prepareGeometry()
+            feature_ids = []
+            # Prepare a feature request that uses the bounding box of the polygon and reads no attributes
+            request = QgsFeatureRequest().setFilterRect(polygon.boundingBox())
+            request.setNoAttributes()
+            for feature in layer.getFeatures(request):
+                geometry = feature.geometry()
+                if not geometry.isEmpty() and engine.intersects(geometry.constGet()):
+                    feature_ids.append(feature.id())
+
+        if feature_ids:
+            self.msg_signal.emit(f"{len(feature_ids)} features identified.", "i", 0)
         else:
             self.msg_signal.emit("No features found within the polygon.", "w", 0)
-
-        if len(features) == 0:
             return None
 
-        return features
+        return feature_ids
 
     def choosePolygonDrawn(self, *, polygon: QgsGeometry, layer: QgsMapLayer = None, ref=False):
         if not layer:
@@ -414,11 +490,63 @@ class PolygonClickHandler(MapClickHandler):
         if status_vector:
             self.choosePolygonDrawnVector(layer=layer, polygon=polygon, ref=ref)
         elif status_raster:
-            pass
-            # self.choosePolygonDrawnRaster(layer=layer, ref=ref)
+            self.choosePolygonDrawnRaster(layer=layer, polygon=polygon, ref=ref)
         else:
             return
 
+    def choosePolygonDrawnRaster(self, *, layer: QgsMapLayer = None, polygon=None, ref=False):
+        if not layer:
+            layer = self.iface.activeLayer()
+
+        status, message = grd_layer_utils.checkGrdTimeseries(layer)
+        if status is False:
+            self.msg_signal.emit(message, "i", 0)
+            return
+
+        # reproject the polygon to the layer's CRS
+        project_crs = self.iface.mapCanvas().mapSettings().destinationCrs()
+        transform = QgsCoordinateTransform(project_crs, layer.crs(), QgsProject.instance())
+        polygon.transform(transform)
+
+        if not polygon or not polygon.isGeosValid():
+            self.msg_signal.emit("Invalid polygon geometry.", "w", 0)
+            return
+
+        QApplication.setOverrideCursor(QCursor(WAIT_CURSOR))
+        try:
+            dates, statistics, num_pixels = self.raster_layer.getPolygonTimeseriesStatistics(layer, polygon)
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        if num_pixels == 0:
+            self.msg_signal.emit("No pixels found within the polygon.", "w", 0)
+            return
+        self.msg_signal.emit(f"{num_pixels} pixels identified.", "i", 0)
+
+        values = statistics["mean"]
+        bounds = np.column_stack((statistics["min"], statistics["max"]))
+        valid = np.isfinite(values)
+        dates, values, bounds = dates[valid], values[valid], bounds[valid]
+
+        crds = PolygonGeometry(geom=polygon, crs=layer.crs())
+        coords = None
+        ref_coords = None
+        ts_bounds = None
+
+        if not ref:
+            ts_values = values
+            ts_bounds = bounds
+            ref_values = None
+            coords = crds
+        else:
+            ref_values = values
+            ts_values = None
+            ref_coords = crds
+            self.map_reference_clicked_value = self.raster_layer.getPolygonPixelValue(layer, polygon)
+
+        self.plot_ts.plotTs(dates=dates, ts_values=ts_values, ref_values=ref_values, coords=coords,
+                            ref_coords=ref_coords, ts_bounds=ts_bounds, plot_multiple=True)
+
     def choosePolygonDrawnVector(self, *, layer: QgsMapLayer = None, polygon=None, ref=False):
         if not layer:
             layer = self.iface.activeLayer()
@@ -428,17 +556,28 @@ class PolygonClickHandler(MapClickHandler):
             self.msg_signal.emit(message, "i", 0)
             return
 
-        features = self.identifyFeaturesInPolygon(layer=layer, polygon=polygon, ref=ref)
+        columns = self.vector_cache.get(layer)
+        feature_ids = self.identifyFeatureIdsInPolygon(layer=layer, polygon=polygon, ref=ref, columns=columns)
 
-        if features:
-            date_values = []
-            for feature in features:
-                attributes = vector_layer_utils.getFeatureAttributes(feature)
-                date_values.append(vector_layer_utils.extractDateValueAttributes(attributes))
+        if feature_ids:
+            schema = vector_layer_utils.getDateFieldSchema(layer)
+            dates = schema.dates
 
-            dates = date_values[0][:, 0]
-            values_column = [arr[:, 1] for arr in date_values]
-            values = np.stack(values_column, axis=1)
+            def reportProgress(count, total):
+                self.msg_signal.emit(f"Reading time series of {count}/{total} features...", "i", 0)
+                QApplication.processEvents()
+
+            if columns is not None:
+                matrix = columns.valuesOfIds(feature_ids)
+            else:
+                QApplication.setOverrideCursor(QCursor(WAIT_CURSOR))
+                try:
+                    # (features, dates) matrix, plotted as one column per feature without copying
+                    matrix = vector_layer_utils.extractDateValueMatrix(layer, feature_ids, schema,
+                                                                       progress_callback=reportProgress)
+                finally:
+                    QApplication.restoreOverrideCursor()
+            values = matrix.T
 
             crds = PolygonGeometry(geom=polygon, crs=layer.crs())
             coords = None
@@ -454,6 +593,7 @@ class PolygonClickHandler(MapClickHandler):
                 ref_coords = crds
 
                 if self.selected_field_name:
+                    attributes = vector_layer_utils.getFeatureAttributes(layer.getFeature(feature_ids[-1]))
                     clicked_values = vector_layer_utils.getFeatureFieldValue(attributes, self.selected_field_name)
                     self.map_reference_clicked_value = np.mean(clicked_values)
 
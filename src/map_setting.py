@@ -8,6 +8,8 @@ from osgeo import gdal
 from . import color_maps
 from .layer_utils import vector_layer as vector_layer_utils
 from .layer_utils import grd_layer as grd_layer_utils
+from .layer_utils import vector_statistics as vector_statistics_utils
+from .layer_utils import field_statistics as field_statistics_utils
 from .get_version import qgisVresion
 
 
@@ -44,7 +46,7 @@ class InsarMap:
         self.data_mean = None
         self.data_stdv = None
 
-    def setSymbologyRangeFromData(self, layer=None, n_std=None):
+    def setSymbologyRangeFromData(self, layer=None, n_std=None, percentiles=None):
         if not layer:
             layer = self.iface.activeLayer()
 
@@ -52,46 +54,61 @@ class InsarMap:
         status_raster, message = grd_layer_utils.checkGrdLayer(layer)
         if status_vector:
             self.data_type = "vector"
-            self.getDataRangeFromVectorLayer(layer, n_std)
+            self.getDataRangeFromVectorLayer(layer, n_std, percentiles)
         elif status_raster:
             self.data_type = "raster"
-            self.getDataRangeFromRasterLayer(layer, n_std)
+            self.getDataRangeFromRasterLayer(layer, n_std, percentiles)
         else:
             message = '<span style="color:red;">Invalid Layer: Please select a valid layer.</span>'
             return message
 
-    def getDataRangeFromVectorLayer(self, layer, n_std=None):
+    def getDataRangeFromVectorLayer(self, layer, n_std=None, percentiles=None):
         field_name = self.selected_field_name
         if field_name is None:
             return "layer field name is None"
 
-        if n_std is None:
-            if self.data_min is None or self.data_max is None:
-                if qgisVresion() > (3, 20):
-                    min_max = layer.minimumAndMaximumValue(layer.fields().indexFromName(field_name))
-                else:
-                    min_max = [layer.minimumValue(layer.fields().indexFromName(field_name)),
-                               layer.maximumValue(layer.fields().indexFromName(field_name))]
+        statistics = vector_statistics_utils.field_statistics.cachedStatistics(layer, field_name)
+        if n_std is None and percentiles is None and statistics is None:
+            # the min and max are served by the provider, e.g. from an index, without a pass over the features
+            field_index = layer.fields().indexFromName(field_name)
+            if qgisVresion() > (3, 20):
+                min_max = layer.minimumAndMaximumValue(field_index)
+            else:
+                min_max = [layer.minimumValue(field_index), layer.maximumValue(field_index)]
+            min_max = field_statistics_utils.providerMinMax(min_max)
+            if min_max is not None:
                 self.data_min, self.data_max = min_max
-                if self.data_min is None or self.data_max is None:
-                    values = [feature[field_name] for feature in layer.getFeatures() if feature[field_name] is not None]
-                    self.data_min = np.nanmin(values)
-                    self.data_max = np.nanmax(values)
-
+                self.min_value = self.data_min
+                self.max_value = self.data_max
+                return ""
+
+        # statistics are computed in one pass and cached per layer, field and subset, also when the provider has no
+        # min and max
+        if statistics is None:
+            statistics = vector_statistics_utils.field_statistics.getStatistics(layer, field_name)
+        if statistics.count == 0:
+            return "layer field has no values"
+        self.data_min = statistics.min
+        self.data_max = statistics.max
+        self.data_mean = statistics.mean
+        self.data_stdv = statistics.std
+
+        if percentiles is not None:
+            self.min_value, self.max_value = (float(value) for value in statistics.percentile(percentiles))
+        elif n_std is None:
             self.min_value = self.data_min
             self.max_value = self.data_max
         else:
-            if self.data_mean is None or self.data_stdv is None:
-                values = [feature[field_name] for feature in layer.getFeatures() if feature[field_name] is not None]
-                self.data_mean = np.nanmean(values)
-                self.data_stdv = np.nanstd(values)
             self.min_value = self.data_mean - n_std * self.data_stdv
             self.max_value = self.data_mean + n_std * self.data_stdv
 
         return ""
 
-    def getDataRangeFromRasterLayer(self, layer, n_std=None):
-        if n_std is None:
+    def getDataRangeFromRasterLayer(self, layer, n_std=None, percentiles=None):
+        if percentiles is not None:
+            lower, upper = percentiles
+            self.min_value, self.max_value = layer.dataProvider().cumulativeCut(1, lower / 100, upper / 100)
+        elif n_std is None:
             if self.data_min is None or self.data_max is None:
                 self.data_min = layer.dataProvider().bandStatistics(1).minimumValue
                 self.data_max = layer.dataProvider().bandStatistics(1).maximumValue
@@ -129,7 +146,14 @@ class InsarMap:
 
         return data_mean, data_stdv
 
-    def setSymbology(self, layer=None, color_ramp_name=None):
+    def setSymbology(self, layer=None, color_ramp_name=None, field_name=None, offset_value=None):
+        """
+        Set a graduated symbology of the current range.
+        :param layer: Layer, default is the active layer
+        :param color_ramp_name: Name of the color ramp, default is the selected color ramp
+        :param field_name: Field of vector layers, default is the selected field
+        :param offset_value: Offset of the classes, default is the current offset
+        """
 
         if not color_ramp_name:
             color_ramp_name = self.color_ramp_name
@@ -162,7 +186,8 @@ class InsarMap:
             max_length = max(len(f"{self.min_value:.2f}"), len(f"{self.max_value:.2f}"))
 
         if status_vector:
-            self.setSymbologyVector(layer, interval, max_length, color_ramp)
+            self.setSymbologyVector(layer, interval, max_length, color_ramp, field_name=field_name,
+                                    offset_value=offset_value)
             return ""
         elif status_raster:
             self.setSymbologyRaster(layer, interval, max_length, color_ramp)
@@ -211,7 +236,9 @@ class InsarMap:
         layer.triggerRepaint()
         self.iface.mapCanvas().refresh()
 
-    def setSymbologyVector(self, layer, interval, max_length, color_ramp):
+    def setSymbologyVector(self, layer, interval, max_length, color_ramp, field_name=None, offset_value=None):
+        if offset_value is None:
+            offset_value = self.offset_value
 
         ranges = []
         for i in range(self.num_classes):
@@ -237,13 +264,14 @@ class InsarMap:
             if i == self.num_classes - 1:
                 upper = float('inf')
 
-            lower += self.offset_value
-            upper += self.offset_value
+            lower += offset_value
+            upper += offset_value
 
             range_item = QgsRendererRange(lower, upper, symbol, label)
             ranges.append(range_item)
 
-        field_name = self.selected_field_name
+        if field_name is None:
+            field_name = self.selected_field_name
         if field_name is None:
             return "layer field name is None"
         else:
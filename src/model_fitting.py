@@ -1,6 +1,14 @@
 import numpy as np
-from scipy.optimize import curve_fit
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Optional
+
+from .models.least_squares import (
+    DAYS_PER_YEAR, ORDINAL_EPOCH, LinearFit, LinearModel, modelDesignMatrix, predictionStd, weightedFit,
+)
+from .layer_utils.batch_fit import chunkRows, fitLayerTimeSeries, robustFitChunk, velocitySummary
+
+POLYNOMIAL_DEGREES = {"poly-1": 1, "poly-2": 2, "poly-3": 3}
 
 
 def modelPoly1(x, a, b):
@@ -16,7 +24,7 @@ def modelPoly3(x, a, b, c, d):
 
 
 def modelAnnual(x, a, b):
-    return a * np.sin(x * 2 * np.pi / 365.25) + b * np.cos(x * 2 * np.pi / 365.25)
+    return a * np.sin(x * 2 * np.pi / DAYS_PER_YEAR) + b * np.cos(x * 2 * np.pi / DAYS_PER_YEAR)
 
 
 def modelExponential(x, a, b, c):
@@ -25,6 +33,8 @@ def modelExponential(x, a, b, c):
 
 def fitExponential(x, y):
     """Try fitting exponential model, if it fails, fit polynomial model. Return the best fit model."""
+    # scipy is only needed for the non-linear model
+    from scipy.optimize import curve_fit
     try:
         initial_params = [1, 1, 0.01]
         popt, pcov = curve_fit(modelExponential, x, y, p0=initial_params, maxfev=2000)
@@ -46,6 +56,20 @@ def ordinalTodates(ordinals):
     return [datetime.fromordinal(int(x)) for x in ordinals]
 
 
+@dataclass(frozen=True)
+class ModelFit:
+    """Fitted model of one series with its uncertainty, NaN or None for non-linear models."""
+    fit_y: np.ndarray
+    model_x: list
+    model_y: np.ndarray
+    result: Optional[LinearFit] = None
+    confidence_std: Optional[np.ndarray] = None
+    prediction_std: Optional[np.ndarray] = None
+    velocity: float = np.nan
+    velocity_std: float = np.nan
+    outliers: Optional[np.ndarray] = None  # bool per date of a robust fit
+
+
 class FittingModels:
     def __init__(self, x=None, y=None, model="poly-1"):
         self.x = x
@@ -54,48 +78,136 @@ class FittingModels:
 
         self.model = model
         self.ordinal_dates = self.datesToOrdinal()
+        self.result = None  # LinearFit of the last fit of a linear model
+        self.model_design = None  # design matrix of the last linear model at the dates of the model curve
+        self.degree = None  # degree of the polynomial of the last linear model
+        self.outliers = None  # outlier dates of the last robust fit
 
     def datesToOrdinal(self):
+        x = np.asarray(self.x)
+        if np.issubdtype(x.dtype, np.datetime64):
+            # days since 1970-01-01 plus the ordinal of 1970-01-01
+            return x.astype('datetime64[D]').astype(np.int64) + ORDINAL_EPOCH
         return np.array([x.toordinal() for x in self.x])
 
-    def fit(self, model=None, seasonal=False):
+    def fit(self, model=None, seasonal=False, robust=None):
+        """
+        Fit the model to the series.
+        :param model: Model name, default is the model of this instance
+        :param seasonal: bool, fit annual terms
+        :param robust: Loss of a robust fit of the linear models, "huber" or "tukey", see batch_fit.robustFitChunk().
+        The outlier dates are stored in self.outliers. The exponential model is always fitted by least squares.
+        :return: Fitted values at the dates, dates of the model curve and its values
+        """
         # normalize dates for better curve fitting and avoid overflow
         # Caution: a uniform reference should be used for date normalization
         # Caution: seasonal signal should not be normalized
         mask = self.mask
         x = self.ordinal_dates
         x_norm = normalize(x, ref=x[mask])
-        y = self.y
+        y = np.asarray(self.y, dtype=np.float64)
 
         if model is None:
             model = self.model
-        fit_models_dict = {"poly-1": modelPoly1, "poly-2": modelPoly2,
-                           "poly-3": modelPoly3, "exp": modelExponential}
-        fit_model = fit_models_dict[model]
-        if fit_model == modelExponential:
-            popt, pcov, fit_model = fitExponential(x_norm[mask], y[mask])
-        else:
-            popt, pcov = curve_fit(fit_model, x_norm[mask], y[mask])
 
         model_x_linspace = np.linspace(min(x), max(x), 100)
         model_x = ordinalTodates(model_x_linspace)
         model_x_linspace_norm = normalize(model_x_linspace, ref=x[mask])
-        model_y = fit_model(model_x_linspace_norm, *popt)
-        fit_y = fit_model(x_norm, *popt)
-
-        if seasonal:
-            residual = y - fit_y
-            popt_seasonal, _ = curve_fit(modelAnnual, x[mask], residual[mask])
-            model_y_seasonal = modelAnnual(model_x_linspace, *popt_seasonal)
-            fit_y_seasonal = modelAnnual(x, *popt_seasonal)
-            model_y += model_y_seasonal
-            fit_y += fit_y_seasonal
 
+        self.result = None
+        self.model_design = None
+        self.degree = None
+        self.outliers = None
+        if model == "exp":
+            popt, pcov, fit_model = fitExponential(x_norm[mask], y[mask])
+            model_y = fit_model(model_x_linspace_norm, *popt)
+            fit_y = fit_model(x_norm, *popt)
+            if seasonal:
+                # the annual terms of the non-linear model are fitted to its residuals
+                annual = LinearModel(modelDesignMatrix(x[mask] - ORDINAL_EPOCH, degree=0, seasonal=True)[:, 1:])
+                popt_seasonal = annual.fit((y - fit_y)[mask]).parameters
+                model_y += modelAnnual(model_x_linspace, *popt_seasonal)
+                fit_y += modelAnnual(x, *popt_seasonal)
+            return fit_y, model_x, model_y
+
+        # polynomial and annual terms are linear in their parameters and fitted jointly in closed form, with the design
+        # matrix of the layer fits in years relative to the mean date
+        degree = POLYNOMIAL_DEGREES[model]
+        days = x - ORDINAL_EPOCH
+        origin = days[mask].mean()
+        design = modelDesignMatrix(days, degree=degree, seasonal=seasonal, origin=origin)
+        if robust:
+            coefficients, weights, scale, outliers = robustFitChunk(design[mask], y[mask][np.newaxis], loss=robust)
+            # the robust scale is not inflated by the outliers, unlike the variance of the weighted residuals
+            self.result = weightedFit(design[mask], y[mask], coefficients[0], weights[0], scale=scale[0])
+            self.outliers = np.zeros(len(y), dtype=bool)
+            self.outliers[mask] = outliers[0]
+        else:
+            self.result = LinearModel(design[mask]).fit(y[mask])
+        self.model_design = modelDesignMatrix(model_x_linspace - ORDINAL_EPOCH, degree=degree, seasonal=seasonal,
+                                              origin=origin)
+        self.degree = degree
+        fit_y = design @ self.result.parameters
+        model_y = self.model_design @ self.result.parameters
         return fit_y, model_x, model_y
 
+    def fitWithUncertainty(self, model=None, seasonal=False, robust=None) -> ModelFit:
+        """
+        Fit the model and compute its confidence and prediction bands on the dates of the model curve, and the
+        velocity at the mean date with its standard deviation. Both are computed from the parameter covariance.
+        :param robust: Loss of a robust fit, see fit()
+        :return: ModelFit, without uncertainty for the exponential model
+        """
+        fit_y, model_x, model_y = self.fit(model=model, seasonal=seasonal, robust=robust)
+        if self.result is None:
+            return ModelFit(fit_y=fit_y, model_x=model_x, model_y=model_y)
+        confidence_std, prediction_std = predictionStd(self.model_design, self.result)
+        velocity, velocity_std = self.velocityOfFit()
+        return ModelFit(fit_y=fit_y, model_x=model_x, model_y=model_y, result=self.result,
+                        confidence_std=confidence_std, prediction_std=prediction_std, velocity=velocity,
+                        velocity_std=velocity_std, outliers=self.outliers)
+
+    def velocityOfFit(self):
+        """
+        Get the velocity of the last fitted polynomial at the mean date and its standard deviation.
+        :return: velocity and standard deviation per year, NaN without a linear fit
+        """
+        if self.result is None:
+            return np.nan, np.nan
+        x = self.ordinal_dates[self.mask]
+        if x.max() - x.min() <= 0:
+            return np.nan, np.nan
+        # the polynomial is in years relative to the mean date, its coefficient of degree one is the velocity there
+        velocity = float(self.result.parameters[1])
+        velocity_std = float(np.sqrt(self.result.covariance[1, 1]))
+        return velocity, velocity_std
+
+    def fitSeries(self, values, model=None, seasonal=False, robust=None, memory_limit=256):
+        """
+        Fit the model to every series of a matrix at the dates of this instance, e.g. the series of the points in a
+        polygon. The series are solved in chunks that fit in the memory limit, as the series of a layer, see
+        batch_fit.fitLayerTimeSeries(). Series with the same missing dates are solved with one shared solution.
+        The exponential model is not linear, its series are fitted with the polynomial of degree 1.
+        :param values: Matrix with shape (dates, series)
+        :param model: Model name, default is the model of this instance
+        :param seasonal: bool, fit annual terms jointly with the polynomial
+        :param robust: Loss of a robust fit, "huber" or "tukey", None for least squares
+        :param memory_limit: Memory limit of the work arrays of a chunk in Mb, see batch_fit.chunkRows()
+        :return: Arrays with one value per series by name (velocity per year, acceleration, seasonal_amplitude,
+        seasonal_phase, rmse, outliers, see batch_fit.fitLayerTimeSeries), and the summary of the velocities
+        """
+        if model is None:
+            model = self.model
+        # the chunks are converted to float64 one at a time
+        values = np.asarray(values)
+        chunk_size = chunkRows(len(values), memory_limit=memory_limit, robust=bool(robust))
+        results = fitLayerTimeSeries(np.asarray(self.x), values.T, degree=POLYNOMIAL_DEGREES.get(model, 1),
+                                     seasonal=seasonal, chunk_size=chunk_size, robust=robust)
+        return results, velocitySummary(results["velocity"])
+
     def fitVelocity(self):
         x = self.ordinal_dates
-        y = self.y
+        y = np.asarray(self.y, dtype=np.float64)
         mask = self.mask
-        popt, pcov = curve_fit(modelPoly1, x[mask], y[mask])
-        return popt[1] * 365.25
+        result = LinearModel(modelDesignMatrix(x[mask] - ORDINAL_EPOCH, degree=1)).fit(y[mask])
+        return result.parameters[1]
@@ -0,0 +1,84 @@
+"""Bounded cache of model fits keyed by the content of the fitted series."""
+
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+
+
+def fitKey(dates: Any, values: Any, model: str, seasonal: bool = False, kind: str = "mean",
+           robust: Optional[str] = None) -> str:
+    """
+    Build the key of a fit from the content of the series.
+    The values are hashed instead of keying on the selected layer and features, since a layer file can be rewritten in
+    place without a visible change of its path or modification time. Float64 values are hashed without a copy.
+    :param dates: Dates of the values
+    :param values: Fitted values, one series or a (dates, series) matrix
+    :param model: Name of the model, e.g. "poly-1"
+    :param seasonal: bool, annual terms are fitted
+    :param kind: Kind of fit, e.g. "mean" for one series and "series" for every series of a matrix
+    :param robust: Loss of a robust fit, e.g. "huber", None for least squares
+    :return: Hex digest
+    """
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(np.asarray(dates, dtype="datetime64[D]").astype(np.int64)).tobytes())
+    values = np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+    digest.update(str(values.shape).encode())
+    digest.update(values.tobytes())
+    digest.update(f"{model}|{bool(seasonal)}|{kind}|{robust}".encode())
+    return digest.hexdigest()
+
+
+class FitCache:
+    """
+    Least recently used cache of fit results.
+
+    Restyling a plot re-renders its snapshots without changing their values, so the fitted curves, residuals and
+    parameters are looked up by the content of the series instead of being fitted again.
+    """
+
+    def __init__(self, max_size: int = 128):
+        self.max_size = max(int(max_size), 0)
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, entry: Any) -> None:
+        if self.max_size == 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def getOrCompute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Get a cached entry or compute and cache it."""
+        entry = self.get(key)
+        if entry is None:
+            entry = compute()
+            self.put(key, entry)
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Number of hits, misses and entries, and the hit rate."""
+        requests = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "max_size": self.max_size,
+                "hit_rate": self.hits / requests if requests else 0.0}
@@ -0,0 +1,237 @@
+"""
+Closed-form least squares for models that are linear in their parameters.
+
+The fits of the plot, of polygon selections and of whole layers, and the velocities of re-referenced layers share the
+design matrix and the solvers of this module, so that their velocities agree.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Tuple
+
+import numpy as np
+
+DAYS_PER_YEAR = 365.25
+# ordinal of 1970-01-01, the seasonal terms are in phase with the ordinal day as in model_fitting.modelAnnual
+ORDINAL_EPOCH = datetime(1970, 1, 1).toordinal()
+POLYNOMIAL_TERMS = ("offset", "velocity", "acceleration", "jerk")
+# factor from the polynomial coefficient to the derivative, e.g. acceleration = 2 * c for c * t^2
+POLYNOMIAL_FACTORS = (1, 1, 2, 6)
+
+
+def datesToDays(dates) -> np.ndarray:
+    """
+    Convert dates to days since 1970-01-01.
+    :param dates: Sequence of datetime64 or datetime.date values
+    :return: float64 array
+    """
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64).astype(np.float64)
+
+
+def modelDesignMatrix(days: np.ndarray, degree: int, seasonal: bool = False, origin: float = None) -> np.ndarray:
+    """
+    Build the design matrix of a polynomial with optional annual terms.
+
+    The polynomial is in years relative to the origin, so that its coefficient of degree one is the velocity per year
+    at the origin. The annual terms are the sine and cosine of the ordinal day, as ``model_fitting.modelAnnual``.
+    :param days: Days since 1970-01-01, e.g. of the dates of a series or of a model curve between them
+    :param degree: Degree of the polynomial
+    :param seasonal: bool, add annual sine and cosine terms
+    :param origin: Day of the origin of the polynomial, default is the mean of the days
+    :return: Design matrix with shape (days, parameters): 1, t, ..., t^degree, then sine and cosine
+    """
+    days = np.asarray(days, dtype=np.float64)
+    if origin is None:
+        origin = days.mean()
+    years = (days - origin) / DAYS_PER_YEAR
+    columns = [years ** power for power in range(degree + 1)]
+    if seasonal:
+        angle = 2 * np.pi * (days + ORDINAL_EPOCH) / DAYS_PER_YEAR
+        columns += [np.sin(angle), np.cos(angle)]
+    return np.column_stack(columns)
+
+
+def designMatrix(dates, degree: int = 1, seasonal: bool = False) -> Tuple[np.ndarray, List[str]]:
+    """
+    Build the design matrix shared by all time series with the same dates.
+    The time is in years relative to the mean date, so the velocity of higher degree polynomials is the velocity at
+    the mean date.
+    :param dates: Dates of the time series
+    :param degree: Degree of the polynomial, 1 to 3
+    :param seasonal: bool, add annual sine and cosine terms
+    :return: Design matrix with shape (dates, parameters), and the names of the parameters
+    """
+    if degree not in (1, 2, 3):
+        raise ValueError("degree must be 1, 2 or 3")
+    names = list(POLYNOMIAL_TERMS[:degree + 1])
+    if seasonal:
+        names += ["annual_sin", "annual_cos"]
+    return modelDesignMatrix(datesToDays(dates), degree, seasonal=seasonal), names
+
+
+@dataclass(frozen=True)
+class LinearFit:
+    """Result of a least-squares fit of one or more series sharing the design matrix."""
+
+    parameters: np.ndarray
+    covariance: np.ndarray
+    residuals: np.ndarray
+    residual_variance: np.ndarray
+    dof: int
+
+
+class LinearModel:
+    """
+    Least-squares solver for a fixed design matrix.
+
+    The QR factorization of the design matrix is computed once, so that every series with the same dates is solved
+    with one matrix product and a triangular solve. The parameter covariance is scaled by the residual variance, as
+    ``scipy.optimize.curve_fit`` with ``absolute_sigma=False``.
+    """
+
+    def __init__(self, design: np.ndarray):
+        self.design = np.asarray(design, dtype=np.float64)
+        self._q, self._r = np.linalg.qr(self.design)
+        diagonal = np.abs(np.diag(self._r))
+        tolerance = diagonal.max(initial=0) * max(self.design.shape) * np.finfo(np.float64).eps
+        self.full_rank = bool(len(diagonal) == self.design.shape[1] and np.all(diagonal > tolerance))
+        if self.full_rank:
+            r_inverse = np.linalg.inv(self._r)
+            self._unscaled_covariance = r_inverse @ r_inverse.T
+        else:
+            self._unscaled_covariance = np.linalg.pinv(self.design.T @ self.design)
+
+    @property
+    def num_parameters(self) -> int:
+        return self.design.shape[1]
+
+    def solve(self, values: np.ndarray) -> np.ndarray:
+        """
+        Solve the parameters of one series of shape (n,) or of the columns of a matrix of shape (n, series).
+        Rank-deficient designs get the minimum-norm solution.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if self.full_rank:
+            return np.linalg.solve(self._r, self._q.T @ values)
+        return np.linalg.lstsq(self.design, values, rcond=None)[0]
+
+    def fit(self, values: np.ndarray) -> LinearFit:
+        """
+        Fit the model to one series of shape (n,) or to the columns of a matrix of shape (n, series).
+        :return: LinearFit with parameters of shape (parameters,) or (parameters, series) and the covariance of
+        shape (parameters, parameters) or (series, parameters, parameters)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        parameters = self.solve(values)
+        residuals = values - self.design @ parameters
+        dof = self.design.shape[0] - self.num_parameters
+        with np.errstate(invalid="ignore", divide="ignore"):
+            residual_variance = np.sum(residuals * residuals, axis=0) / dof if dof > 0 else np.full(
+                values.shape[1:], np.inf)
+        covariance = np.multiply.outer(residual_variance, self._unscaled_covariance)
+        return LinearFit(parameters=parameters, covariance=covariance, residuals=residuals,
+                         residual_variance=residual_variance, dof=dof)
+
+
+def _solveShared(design: np.ndarray, values: np.ndarray):
+    """Fit rows that have values at the same dates with one factorization of the design matrix."""
+    coefficients = LinearModel(design).solve(values.T).T
+    residuals = values - coefficients @ design.T
+    rmse = np.sqrt(np.mean(residuals * residuals, axis=1))
+    return coefficients, rmse
+
+
+def _solveMasked(design: np.ndarray, values: np.ndarray, finite: np.ndarray):
+    """Fit rows with individual missing dates with batched normal equations."""
+    num_parameters = design.shape[1]
+    weights = finite.astype(np.float64)
+    y = np.where(finite, values, 0)
+    products = (design[:, :, np.newaxis] * design[:, np.newaxis, :]).reshape(len(design), -1)
+    normal = (weights @ products).reshape(-1, num_parameters, num_parameters)
+    coefficients = np.einsum("rpq,rq->rp", np.linalg.pinv(normal), y @ design)
+    residuals = np.where(finite, y - coefficients @ design.T, 0)
+    rmse = np.sqrt((residuals * residuals).sum(axis=1) / np.maximum(finite.sum(axis=1), 1))
+    return coefficients, rmse
+
+
+def fitChunk(design: np.ndarray, values: np.ndarray, min_group_size: int = 32):
+    """
+    Fit the linear model to each row of a value matrix by least squares, ignoring NaN values.
+
+    Rows are grouped by their pattern of missing dates. Each group with at least min_group_size rows, including the
+    usual group of complete rows, is solved with one LinearModel of the design matrix restricted to its dates.
+    The remaining rows are solved with batched normal equations.
+    :param design: Design matrix with shape (dates, parameters)
+    :param values: Matrix with shape (rows, dates)
+    :param min_group_size: Minimum number of rows sharing a pattern of missing dates to be solved together
+    :return: Coefficients with shape (rows, parameters) and RMSE of the residuals per row, NaN for rows with less
+    values than parameters
+    """
+    values = np.asarray(values, dtype=np.float64)
+    num_rows, num_parameters = len(values), design.shape[1]
+    coefficients = np.full((num_rows, num_parameters), np.nan)
+    rmse = np.full(num_rows, np.nan)
+    finite = np.isfinite(values)
+    count = finite.sum(axis=1)
+
+    complete = np.flatnonzero(count == values.shape[1])
+    if len(complete):
+        coefficients[complete], rmse[complete] = _solveShared(design, values[complete])
+
+    incomplete = np.flatnonzero((count >= num_parameters) & (count < values.shape[1]))
+    if len(incomplete) == 0:
+        return coefficients, rmse
+
+    _, group_of_row, group_sizes = np.unique(np.packbits(finite[incomplete], axis=1), axis=0,
+                                             return_inverse=True, return_counts=True)
+    group_of_row = group_of_row.ravel()
+    for group in np.flatnonzero(group_sizes >= min_group_size):
+        rows = incomplete[group_of_row == group]
+        mask = finite[rows[0]]
+        coefficients[rows], rmse[rows] = _solveShared(design[mask], values[np.ix_(rows, mask)])
+    masked_rows = incomplete[group_sizes[group_of_row] < min_group_size]
+    if len(masked_rows):
+        coefficients[masked_rows], rmse[masked_rows] = _solveMasked(design, values[masked_rows],
+                                                                    finite[masked_rows])
+    return coefficients, rmse
+
+
+def weightedFit(design: np.ndarray, values: np.ndarray, parameters: np.ndarray, weights: np.ndarray,
+                scale: float = None) -> LinearFit:
+    """
+    Build the LinearFit of one series from parameters estimated with weights, e.g. by a robust fit.
+    The covariance is that of weighted least squares scaled by the residual variance. Without a scale, the variance is
+    that of the weighted residuals, so that the fit equals LinearModel.fit() if all weights are one.
+    :param design: Design matrix with shape (n, parameters)
+    :param values: Fitted values with shape (n,)
+    :param parameters: Estimated parameters
+    :param weights: Weights of the values between 0 and 1
+    :param scale: Standard deviation of the residuals, e.g. a robust estimate that is not inflated by outliers
+    :return: LinearFit
+    """
+    design = np.asarray(design, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    residuals = np.asarray(values, dtype=np.float64) - design @ parameters
+    dof = design.shape[0] - design.shape[1]
+    if scale is not None:
+        residual_variance = float(scale) ** 2
+    else:
+        residual_variance = np.sum(weights * residuals * residuals) / dof if dof > 0 else np.inf
+    covariance = residual_variance * np.linalg.pinv(design.T @ (weights[:, np.newaxis] * design))
+    return LinearFit(parameters=parameters, covariance=covariance, residuals=residuals,
+                     residual_variance=residual_variance, dof=dof)
+
+
+def predictionStd(design: np.ndarray, fit: LinearFit):
+    """
+    Standard deviations of a fitted model at the rows of a design matrix, e.g. of a grid of dates.
+    :param design: Design matrix with shape (n, parameters)
+    :param fit: LinearFit of one series
+    :return: Standard deviation of the fitted model (confidence band) and of a new observation (prediction band),
+    arrays with shape (n,)
+    """
+    design = np.asarray(design, dtype=np.float64)
+    variance = np.einsum("ij,jk,ik->i", design, fit.covariance, design)
+    return np.sqrt(variance), np.sqrt(variance + fit.residual_variance)
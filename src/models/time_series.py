@@ -30,6 +30,7 @@ class TimeSeriesData:
     min_plot_values: Optional[np.ndarray] = None
     max_plot_values: Optional[np.ndarray] = None
     residuals_values: Optional[np.ndarray] = None
+    ts_bounds: Optional[np.ndarray] = None
 
     def hasFinitePlotValues(self) -> bool:
         """Return True when at least one plotted value is finite."""
@@ -40,6 +41,8 @@ class TimeSeriesData:
 
     def dateStrings(self) -> List[str]:
         """Return dates formatted for ASCII export."""
+        if np.issubdtype(self.dates.dtype, np.datetime64):
+            return np.datetime_as_string(self.dates, unit='D').tolist()
         return [date.strftime('%Y-%m-%d') for date in self.dates]
 
     def withResiduals(self, residuals_values: Any) -> "TimeSeriesData":
@@ -74,8 +77,12 @@ class TimeSeriesGraphics:
     replicate_up: List[Any] = field(default_factory=list)
     replicate_dn: List[Any] = field(default_factory=list)
     fit_plot: Any = None
+    fit_band: List[Any] = field(default_factory=list)
+    fit_summary: Any = None
+    fit_outliers: Any = None
     residual_scatter: Any = None
     residual_line: Any = None
+    residual_outliers: Any = None
     main_y_data: List[Any] = field(default_factory=list)
     residual_y_data: List[Any] = field(default_factory=list)
 
@@ -144,8 +151,14 @@ def buildTimeSeriesData(
     ref_values: Any = None,
     coords: Any = None,
     ref_coords: Any = None,
+    ts_bounds: Any = None,
 ) -> TimeSeriesData:
-    """Normalize raw values into an immutable TimeSeriesData instance."""
+    """
+    Normalize raw values into an immutable TimeSeriesData instance.
+
+    ``ts_bounds`` is an optional (dates, 2) matrix with the min and max of a summarized time series, e.g. of all
+    raster pixels in a polygon. It replaces the min and max over the ts_values columns for the plotted range.
+    """
     if dates is None:
         raise ValueError("dates are required to build time-series data")
 
@@ -181,7 +194,22 @@ def buildTimeSeriesData(
 
     reference_mean = np.mean(prepared_ref, axis=1, keepdims=True)
     values_minus_reference = prepared_ts - reference_mean
-    if prepared_ts.shape[1] > 1:
+    prepared_bounds = None
+    if ts_bounds is not None:
+        prepared_bounds = _normalizeValueMatrix(
+            ts_bounds,
+            date_count=date_count,
+            sort_idx=sort_idx,
+            name="ts_bounds",
+            allow_scalar_expand=False,
+        )
+        if prepared_bounds.shape[1] != 2:
+            raise ValueError("ts_bounds must have one min and one max value per date")
+        bounds_minus_reference = prepared_bounds - reference_mean
+        min_plot_values = _readonlyArray(bounds_minus_reference[:, 0], dtype=float)
+        max_plot_values = _readonlyArray(bounds_minus_reference[:, 1], dtype=float)
+        plot_multiple_values = None
+    elif prepared_ts.shape[1] > 1:
         min_plot_values = _readonlyArray(np.min(values_minus_reference, axis=1), dtype=float)
         max_plot_values = _readonlyArray(np.max(values_minus_reference, axis=1), dtype=float)
         plot_multiple_values = _readonlyArray(values_minus_reference, dtype=float, ndmin=2)
@@ -201,4 +229,5 @@ def buildTimeSeriesData(
         plot_multiple_values=plot_multiple_values,
         min_plot_values=min_plot_values,
         max_plot_values=max_plot_values,
+        ts_bounds=prepared_bounds,
     )
@@ -11,6 +11,7 @@ from qgis.PyQt.QtGui import QColor, QFont
 from .model_fitting import FittingModels
 from ..external.setting_manager_ui.json_settings import JsonSettings
 from .export_plot import TimeSeriesPlotExporter
+from .models.fit_cache import FitCache, fitKey
 from .models.time_series import (
     TimeSeriesData,
     TimeSeriesGraphics,
@@ -58,12 +59,14 @@ class PlotTs():
         self.min_plot_values = None
         self.max_plot_values = None
         self.residuals_values = None
+        self.ts_bounds = None
         script_path = os.path.abspath(__file__)
         json_file = "config.json"
         self.config_file = os.path.join(os.path.dirname(script_path), 'config', json_file)
         self.series_history: List[TimeSeriesSnapshot] = []
         self.fit_models = []
         self.fit_seasonal_flag = False
+        self.fit_robust_flag = False
         self.replicate_flag = False
         self.plot_y_axis = "from_data"
         self.replicate_value = 5.6 / 2
@@ -77,6 +80,12 @@ class PlotTs():
         self.ref_coords = None
         self._y_data_ranges = {}
         self._last_replica_y_data = []
+        self.preview_item = None  # curve of the hover preview, not part of the series history
+        self.series_fit = None  # fit results of the individual series of the last fitted polygon selection
+        self.model_fit = None  # ModelFit of the last fitted series, with its uncertainty
+        self.fit_cache = FitCache(max_size=128)
+        self.fit_memory_limit = 256  # Mb of the work arrays of the fits of polygon selections
+        self.preview_key = None
 
     def modifySettings(self, block_key, value):
         params = JsonSettings(self.config_file)
@@ -171,6 +180,14 @@ class PlotTs():
         parms['line color'] = parms_ts.get(["model fit", "line color"]) or 'black'
         parms['line alpha'] = parms_ts.get(["model fit", "line alpha"]) or 1.0
         parms['line width'] = parms_ts.get(["model fit", "line width"]) or 2.0
+        parms['band'] = parms_ts.get(["model fit", "band"]) or 'none'
+        parms['band sigma'] = parms_ts.get(["model fit", "band sigma"]) or '2'
+        parms['band color'] = parms_ts.get(["model fit", "band color"]) or 'gray'
+        parms['band alpha'] = parms_ts.get(["model fit", "band alpha"]) or 0.2
+        parms['robust loss'] = parms_ts.get(["model fit", "robust loss"]) or 'huber'
+        parms['outlier marker'] = parms_ts.get(["model fit", "outlier marker"]) or 'x'
+        parms['outlier color'] = parms_ts.get(["model fit", "outlier color"]) or '#d62728'
+        parms['outlier marker size'] = parms_ts.get(["model fit", "outlier marker size"]) or 10.0
         self.parms['model fit'] = parms
 
     def clear(self):
@@ -188,14 +205,17 @@ class PlotTs():
             ref_values=self.ref_values,
             coords=self.coords,
             ref_coords=self.ref_coords,
+            ts_bounds=self.ts_bounds,
         )
         self._set_current_series(series)
 
-    def _buildTimeSeriesData(self, *, dates=None, ts_values=None, ref_values=None, coords=None, ref_coords=None) -> TimeSeriesData:
+    def _buildTimeSeriesData(self, *, dates=None, ts_values=None, ref_values=None, coords=None, ref_coords=None,
+                             ts_bounds=None) -> TimeSeriesData:
         if dates is None:
             dates = self.dates
         if ts_values is None:
             ts_values = self.ts_values
+            ts_bounds = self.ts_bounds
         if ref_values is None:
             ref_values = self.ref_values
         if coords is None:
@@ -210,6 +230,7 @@ class PlotTs():
             ref_values=ref_values,
             coords=coords,
             ref_coords=ref_coords,
+            ts_bounds=ts_bounds,
         )
 
     def _set_current_series(self, series: Optional[TimeSeriesData]):
@@ -222,6 +243,7 @@ class PlotTs():
             self.min_plot_values = None
             self.max_plot_values = None
             self.residuals_values = None
+            self.ts_bounds = None
             self.coords = None
             self.ref_coords = None
             return
@@ -233,6 +255,7 @@ class PlotTs():
         self.min_plot_values = series.min_plot_values
         self.max_plot_values = series.max_plot_values
         self.residuals_values = series.residuals_values
+        self.ts_bounds = series.ts_bounds
         self.coords = series.coords
         self.ref_coords = series.ref_coords
 
@@ -268,9 +291,11 @@ class PlotTs():
                 self.ax_residuals = None
 
     def plotTs(self, *, dates=None, ts_values=None, ref_values=None, plot_multiple=True, coords=None, ref_coords=None,
-               update=False):
+               update=False, ts_bounds=None):
         # update: flag indicating if the plot should be updated or a new one created
+        # ts_bounds: min and max per date of a summarized time series, e.g. of the raster pixels in a polygon
 
+        self.clearPreview()
         self.updateSettings()
 
         if update:
@@ -282,6 +307,7 @@ class PlotTs():
                 dates = source_data.dates
             if ts_values is None:
                 ts_values = source_data.ts_values
+                ts_bounds = source_data.ts_bounds
             if ref_values is None:
                 ref_values = source_data.ref_values
             if coords is None:
@@ -309,6 +335,7 @@ class PlotTs():
             ref_values=ref_values,
             coords=coords if coords is not None else self.coords,
             ref_coords=ref_coords if ref_coords is not None else self.ref_coords,
+            ts_bounds=ts_bounds,
         )
         self._set_current_series(series)
 
@@ -331,6 +358,44 @@ class PlotTs():
         self.add_series(snapshot)
         self._draw()
 
+    def plotPreview(self, *, dates, values, key=None):
+        """
+        Show a preview of a time series, e.g. of the point under the mouse.
+        The preview is a single curve that is updated in place. It is not stored as a snapshot, so it is not
+        exported, fitted or removed as the last plot, and the next plotted time series replaces it.
+        :param dates: Dates of the values
+        :param values: Values of one time series
+        :param key: Identifier of the previewed series, e.g. a feature id. Nothing is redrawn if it did not change.
+        """
+        if key is not None and key == self.preview_key and self.preview_item is not None:
+            return
+        series = buildTimeSeriesData(dates=dates, ts_values=values)
+        plot_values = series.plot_values
+        # show the preview relative to the reference of the plotted time series
+        if (self.dates is not None and isinstance(self.ref_values, np.ndarray)
+                and np.array_equal(np.asarray(self.dates), series.dates)):
+            plot_values = plot_values - np.mean(self.ref_values, axis=1)
+
+        if self.ax is None:
+            self.initializeAxes()
+            self.ax.enableAutoRange()
+        x = self._datesToX(series.dates)
+        if self.preview_item is None:
+            self.preview_item = self.ax.plot(x, plot_values, pen=self._pen('gray', width=1, alpha=0.8),
+                                             symbol='o', symbolSize=4, symbolPen=None,
+                                             symbolBrush=self._brush('gray', alpha=0.8), connect='finite')
+        else:
+            self.preview_item.setData(x, plot_values, connect='finite')
+        self.preview_key = key
+        self._draw()
+
+    def clearPreview(self):
+        if self.preview_item is not None:
+            self._removeItem(self.ax, self.preview_item)
+            self._draw()
+        self.preview_item = None
+        self.preview_key = None
+
     def _render_time_series(self, series: TimeSeriesData, style: TimeSeriesStyle, *, plot_multiple=True) -> Tuple[TimeSeriesGraphics, Optional[np.ndarray]]:
         items = TimeSeriesGraphics()
         main_y_data = []
@@ -501,29 +566,132 @@ class PlotTs():
         fit_line_alpha = parms['line alpha']
         fit_line_width = parms['line width']
         fit_seasonal = self.fit_seasonal_flag
+        # robust fits down-weight outliers by iteratively reweighted least squares and flag them
+        fit_robust = (parms.get('robust loss') or 'huber') if self.fit_robust_flag else None
         if len(self.fit_models) != 1:
             return None, None
         else:
             fit_model = self.fit_models[0]
-            model_values, model_x, model_y = (
-                FittingModels(series.dates, series.plot_values, model=fit_model).fit(seasonal=fit_seasonal))
+            # restyling re-renders the same series, the fits are looked up by the content of the series
+            self.model_fit = self.fit_cache.getOrCompute(
+                fitKey(series.dates, series.plot_values, fit_model, fit_seasonal, robust=fit_robust),
+                lambda: FittingModels(series.dates, series.plot_values, model=fit_model).fitWithUncertainty(
+                    seasonal=fit_seasonal, robust=fit_robust))
+            model_x = self._datesToX(self.model_fit.model_x)
+            residuals_values = series.plot_values - self.model_fit.fit_y
+            outliers = self.model_fit.outliers
+            summary_lines = []
+            if np.isfinite(self.model_fit.velocity):
+                summary_lines.append(
+                    f"velocity: {self.model_fit.velocity:.2f} ± {self.model_fit.velocity_std:.2f} /yr (1σ)")
+            if outliers is not None:
+                inliers = np.isfinite(residuals_values) & ~outliers
+                rmse = np.sqrt(np.mean(residuals_values[inliers] ** 2)) if inliers.any() else np.nan
+                summary_lines.append(f"robust ({fit_robust}): {int(outliers.sum())} outliers, "
+                                     f"RMSE without outliers: {rmse:.2f}")
+            if series.plot_multiple_values is not None and series.plot_multiple_values.shape[1] > 1:
+                # fit every series of a polygon selection, not only their mean
+                self.series_fit, summary = self.fit_cache.getOrCompute(
+                    fitKey(series.dates, series.plot_multiple_values, fit_model, fit_seasonal, kind="series",
+                           robust=fit_robust),
+                    lambda: FittingModels(series.dates, series.plot_values, model=fit_model).fitSeries(
+                        series.plot_multiple_values, seasonal=fit_seasonal, robust=fit_robust,
+                        memory_limit=self.fit_memory_limit))
+                if summary['count'] > 0:
+                    summary_lines.append(f"velocity median: {summary['median']:.2f} /yr, IQR: {summary['iqr']:.2f}"
+                                         f" /yr ({summary['count']} series)")
+            if graphics is not None:
+                graphics.fit_band = self.plotFitBands(model_x, self.model_fit, parms)
+                graphics.fit_summary = self.plotFitSummary(series, summary_lines)
+                graphics.fit_outliers = self.plotOutliers(self.ax, series.dates, series.plot_values, outliers, parms)
             fit_plot = self.ax.plot(
-                self._datesToX(model_x),
-                model_y,
+                model_x,
+                self.model_fit.model_y,
                 pen=self._pen(fit_line_color, fit_line_width, fit_line_alpha, fit_line_type)
             )
-            residuals_values = series.plot_values - model_values
-            self.plotResiduals(series, style, graphics, residuals_values)
+            self.plotResiduals(series, style, graphics, residuals_values, outliers=outliers)
             self._draw()
 
         return fit_plot, residuals_values
 
-    def plotResiduals(self, series: TimeSeriesData, style: TimeSeriesStyle, items=None, residuals_values=None):
+    def plotOutliers(self, ax, dates, values, outliers, parms):
+        """
+        Mark the outlier dates of a robust fit.
+        :param ax: Plot item, the time series or the residual plot
+        :param dates: Dates of the values
+        :param values: Plotted values, e.g. the time series or its residuals
+        :param outliers: bool per date, None without a robust fit
+        :param parms: Model fit settings with the outlier marker, color and size
+        :return: ScatterPlotItem or None
+        """
+        if ax is None or outliers is None or not outliers.any():
+            return None
+        color = parms.get('outlier color') or '#d62728'
+        item = pg.ScatterPlotItem(x=self._datesToX(dates)[outliers], y=np.asarray(values)[outliers],
+                                  symbol=self._symbol(parms.get('outlier marker') or 'x'),
+                                  size=parms.get('outlier marker size') or 10.0,
+                                  pen=self._pen(color, 2.0), brush=self._brush(color))
+        # the outliers do not widen the y range of the residual plot
+        ax.addItem(item, ignoreBounds=True)
+        return item
+
+    def plotFitBands(self, x, model_fit, parms):
+        """
+        Plot the confidence and/or prediction band of a fitted model.
+        :param x: x values of the model curve
+        :param model_fit: ModelFit with the standard deviations of the model curve
+        :param parms: Model fit settings with the band type, its width in sigma, color and alpha
+        :return: List of plot items
+        """
+        band = parms.get('band') or 'none'
+        if band == 'none' or model_fit.confidence_std is None:
+            return []
+        n_sigma = float(parms.get('band sigma') or 2)
+        stds = []
+        if band in ('prediction', 'both'):
+            stds.append((model_fit.prediction_std, 0.5 if band == 'both' else 1.0))
+        if band in ('confidence', 'both'):
+            stds.append((model_fit.confidence_std, 1.0))
+
+        items = []
+        for std, alpha_factor in stds:
+            lower_line = pg.PlotCurveItem(x, model_fit.model_y - n_sigma * std, pen=None)
+            upper_line = pg.PlotCurveItem(x, model_fit.model_y + n_sigma * std, pen=None)
+            fill = pg.FillBetweenItem(lower_line, upper_line,
+                                      brush=self._brush(parms.get('band color'),
+                                                        (parms.get('band alpha') or 0.2) * alpha_factor))
+            for item in (lower_line, upper_line, fill):
+                self.ax.addItem(item)
+            items.extend([lower_line, upper_line, fill])
+        return items
+
+    def plotFitSummary(self, series: TimeSeriesData, lines: list):
+        """Show the velocity of the fit and the summary of the velocities of the fitted series."""
+        if not lines:
+            return None
+        y_range = self._finiteRange([series.plot_values, series.max_plot_values])
+        if y_range is None:
+            return None
+        item = pg.TextItem("\n".join(lines), color=self._color('black'), anchor=(0, 0))
+        item.setPos(self._dateToX(series.dates[0]), y_range[1])
+        self.ax.addItem(item, ignoreBounds=True)
+        return item
+
+    def plotResiduals(self, series: TimeSeriesData, style: TimeSeriesStyle, items=None, residuals_values=None,
+                      outliers=None):
+        """
+        Plot the residuals of the fitted model.
+        :param outliers: bool per date of a robust fit, the outliers are marked and excluded from the y range
+        """
         if items is None:
             items = TimeSeriesGraphics()
         if residuals_values is None:
             residuals_values = series.residuals_values
         if self.plot_residuals_flag and self.ax_residuals is not None and residuals_values is not None:
+            items.residual_outliers = self.plotOutliers(self.ax_residuals, series.dates, residuals_values, outliers,
+                                                        style.params['model fit'])
+            if outliers is not None:
+                residuals_values = np.where(outliers, np.nan, residuals_values)
             parms = style.params['residual plot']
             marker = parms['marker']
             marker_size = parms['marker size']
@@ -620,8 +788,8 @@ class PlotTs():
         """
         if not ax:
             ax = self.ax
-        min_date = np.nanmin(self.dates)
-        max_date = np.nanmax(self.dates)
+        min_date = self._toDatetime(np.nanmin(self.dates))
+        max_date = self._toDatetime(np.nanmax(self.dates))
 
         if use_data_xlim:
             x_min = self._dateToX(min_date - timedelta(days=padding))
@@ -751,6 +919,8 @@ class PlotTs():
         self.ax_residuals = None
         self._y_data_ranges = {}
         self._last_replica_y_data = []
+        self.preview_item = None
+        self.preview_key = None
 
     def _draw(self):
         self.ui.plot_widget.update()
@@ -801,12 +971,12 @@ class PlotTs():
     def _remove_snapshot_graphics(self, snapshot):
         """Remove all plot items owned by a stored time-series snapshot."""
         graphics = snapshot.graphics
-        for item in (graphics.scatter, graphics.line, graphics.fit_plot):
+        for item in (graphics.scatter, graphics.line, graphics.fit_plot, graphics.fit_summary, graphics.fit_outliers):
             self._removeItem(self.ax, item)
-        for item in (graphics.residual_scatter, graphics.residual_line):
+        for item in (graphics.residual_scatter, graphics.residual_line, graphics.residual_outliers):
             self._removeItem(self.ax_residuals, item)
         for item_list in (graphics.plot_multiple_fill, graphics.plot_multiple_lines,
-                          graphics.replicate_up, graphics.replicate_dn):
+                          graphics.replicate_up, graphics.replicate_dn, graphics.fit_band):
             for item in item_list or []:
                 self._removeItem(self.ax, item)
 
@@ -825,13 +995,19 @@ class PlotTs():
         if isinstance(axis, FormattedDateAxisItem):
             axis.date_format = parms.get('date format')
 
-    def _dateToX(self, value):
+    def _toDatetime(self, value):
         if isinstance(value, np.datetime64):
             value = value.astype('datetime64[ms]').astype(datetime)
-        return value.timestamp()
+        return value
+
+    def _dateToX(self, value):
+        return self._toDatetime(value).timestamp()
 
     def _datesToX(self, values):
-        return np.array([self._dateToX(value) for value in values], dtype=float)
+        if isinstance(values, np.ndarray) and np.issubdtype(values.dtype, np.datetime64):
+            # one conversion of the whole array instead of one per date
+            values = values.astype('datetime64[ms]').astype(datetime)
+        return np.array([value.timestamp() for value in values], dtype=float)
 
     def _symbol(self, marker):
         return {
@@ -885,6 +1061,8 @@ class PlotTs():
         return self.series_history.pop(index)
 
     def _dateStrings(self):
+        if isinstance(self.dates, np.ndarray) and np.issubdtype(self.dates.dtype, np.datetime64):
+            return np.datetime_as_string(self.dates, unit='D').tolist()
         date_strings = []
         for d in self.dates:
             date_strings.append(d.strftime('%Y-%m-%d'))
@@ -899,7 +1077,8 @@ class PlotTs():
             if self.dates is None or self.plot_values is None:
                 return
             series = self._buildTimeSeriesData(dates=self.dates, ts_values=self.ts_values, ref_values=self.ref_values,
-                                               coords=self.coords, ref_coords=self.ref_coords)
+                                               coords=self.coords, ref_coords=self.ref_coords,
+                                               ts_bounds=self.ts_bounds)
         if series.dates is None or series.plot_values is None:
             return
 
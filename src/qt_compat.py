@@ -5,15 +5,17 @@ of branching on Qt binding versions or using enum aliases directly.
 """
 
 try:
-    from qgis.PyQt.QtCore import Qt
+    from qgis.PyQt.QtCore import QStandardPaths, Qt
     from qgis.PyQt.QtWidgets import QColorDialog, QMessageBox
 except ImportError:
-    from PySide6.QtCore import Qt
+    from PySide6.QtCore import QStandardPaths, Qt
     from PySide6.QtWidgets import QColorDialog, QMessageBox
 
 try:
-    from qgis.core import QgsMapLayer, QgsWkbTypes
+    from qgis.core import Qgis, QgsFeatureRequest, QgsMapLayer, QgsWkbTypes
 except ImportError:
+    Qgis = None
+    QgsFeatureRequest = None
     QgsMapLayer = None
     QgsWkbTypes = None
 
@@ -55,11 +57,18 @@ MESSAGE_BUTTON_OK = _enum_value(QMessageBox, "StandardButton", "Ok")
 # QColorDialog enums
 DONT_USE_NATIVE_DIALOG = _enum_value(QColorDialog, "ColorDialogOption", "DontUseNativeDialog")
 
+# QStandardPaths enums
+CACHE_LOCATION = _enum_value(QStandardPaths, "StandardLocation", "CacheLocation")
+
 # QGIS enums with scoped/legacy compatibility. These are only available inside QGIS.
 POLYGON_GEOMETRY = (
     _enum_value(QgsWkbTypes, "GeometryType", "PolygonGeometry")
     if QgsWkbTypes is not None else None
 )
+POINT_GEOMETRY = (
+    _enum_value(QgsWkbTypes, "GeometryType", "PointGeometry")
+    if QgsWkbTypes is not None else None
+)
 VECTOR_LAYER = (
     _enum_value(QgsMapLayer, "LayerType", "VectorLayer")
     if QgsMapLayer is not None else None
@@ -68,6 +77,10 @@ RASTER_LAYER = (
     _enum_value(QgsMapLayer, "LayerType", "RasterLayer")
     if QgsMapLayer is not None else None
 )
+FEATURE_REQUEST_NO_GEOMETRY = (
+    Qgis.FeatureRequestFlag.NoGeometry if hasattr(Qgis, "FeatureRequestFlag")
+    else QgsFeatureRequest.NoGeometry
+) if QgsFeatureRequest is not None else None
 
 
 def exec_dialog(dialog):
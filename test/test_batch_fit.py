@@ -0,0 +1,83 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.layer_utils.batch_fit import (designMatrix, fitChunk, fitLayerTimeSeries, flagOutliers, robustFitChunk,
+                                      robustScale)
+
+
+def _dates(num_dates=60):
+    return np.datetime64("2018-01-05") + np.arange(num_dates) * 12
+
+
+def test_fit_recovers_velocity_acceleration_and_seasonal_terms():
+    dates = _dates()
+    design, names = designMatrix(dates, degree=2, seasonal=True)
+    assert names == ["offset", "velocity", "acceleration", "annual_sin", "annual_cos"]
+    truth = np.array([[1.0, -4.0, 0.5, 2.0, 1.5], [0.0, 3.0, -1.0, 0.0, 0.5]])
+    values = (truth @ design.T).astype(np.float32)
+
+    results = fitLayerTimeSeries(dates, values, degree=2, seasonal=True, chunk_size=1)
+
+    np.testing.assert_allclose(results["velocity"], truth[:, 1], atol=1e-4)
+    np.testing.assert_allclose(results["acceleration"], 2 * truth[:, 2], atol=1e-4)
+    np.testing.assert_allclose(results["seasonal_amplitude"], np.hypot(truth[:, 3], truth[:, 4]), atol=1e-4)
+    np.testing.assert_allclose(results["seasonal_phase"], np.arctan2(truth[:, 4], truth[:, 3]), atol=1e-4)
+    np.testing.assert_allclose(results["rmse"], 0, atol=1e-5)
+
+
+def test_grouped_and_masked_rows_match_individual_fits():
+    rng = np.random.default_rng(1)
+    dates = _dates()
+    design, _ = designMatrix(dates, degree=1, seasonal=True)
+    values = rng.normal(size=(200, len(dates)))
+    values[:100, [2, 9]] = np.nan  # one shared pattern of missing dates
+    values[100:150, :][rng.random((50, len(dates))) < 0.1] = np.nan  # individual patterns
+    values[150, 3:] = np.nan  # too few values
+
+    coefficients, rmse = fitChunk(design, values, min_group_size=32)
+
+    for row in (0, 99, 120, 149, 199):
+        finite = np.isfinite(values[row])
+        expected, *_ = np.linalg.lstsq(design[finite], values[row, finite], rcond=None)
+        np.testing.assert_allclose(coefficients[row], expected, atol=1e-9)
+        residuals = values[row, finite] - design[finite] @ expected
+        np.testing.assert_allclose(rmse[row], np.sqrt(np.mean(residuals ** 2)), atol=1e-9)
+    assert np.isnan(coefficients[150]).all() and np.isnan(rmse[150])
+
+
+def test_robust_fit_ignores_and_flags_outliers():
+    rng = np.random.default_rng(2)
+    dates = _dates(100)
+    design, _ = designMatrix(dates, degree=1, seasonal=True)
+    truth = np.array([[2.0, 5.0, 1.0, -1.0], [0.0, -3.0, 0.0, 2.0], [1.0, 1.0, 0.5, 0.5]])
+    values = truth @ design.T + rng.normal(0, 0.5, (3, len(dates)))
+    values[:, [10, 40, 70]] += 30
+    values[1, 20:25] = np.nan
+
+    for loss in ("huber", "tukey"):
+        coefficients, weights, scale, outliers = robustFitChunk(design, values, loss=loss)
+        np.testing.assert_allclose(coefficients, truth, atol=0.3)
+        np.testing.assert_allclose(scale, 0.5, rtol=0.3)
+        assert outliers[:, [10, 40, 70]].all() and outliers.sum() <= 3 * 3 + 3
+        assert np.all(weights[:, [10, 40, 70]] < 0.1) and np.all(weights[1, 20:25] == 0)
+
+    results = fitLayerTimeSeries(dates, values, degree=1, seasonal=True, robust="tukey")
+    np.testing.assert_allclose(results["velocity"], truth[:, 1], atol=0.3)
+    assert np.all(results["outliers"] >= 3) and np.all(results["rmse"] < 1)
+    assert np.all(fitLayerTimeSeries(dates, values, degree=1, seasonal=True)["rmse"] > 3)
+
+
+def test_zero_scale_of_quantized_residuals_flags_no_outliers():
+    # more than half of the residuals of the first row are exactly zero, so its robust scale is zero
+    residuals = np.array([[0, 0, 0, 0, 0, 0.5, -0.5, np.nan], [0.1, -0.2, 0.1, 0.0, -0.1, 0.2, 5.0, 0.1]])
+    finite = np.isfinite(residuals)
+    scale = robustScale(residuals, finite)
+    assert scale[0] == 0 and scale[1] > 0
+
+    outliers = flagOutliers(residuals, scale, finite)
+    assert not outliers[0].any()
+    assert outliers[1].tolist() == [False] * 6 + [True, False]
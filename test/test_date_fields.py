@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.date_fields import attributesToFloat, buildDateFieldSchema
+
+
+class _NullVariant:
+    def isNull(self):
+        return True
+
+
+def test_schema_finds_date_fields_and_sorts_them_by_date():
+    schema = buildDateFieldSchema(["id", "VEL", "D20200301", "20200101", "D_20200201", "D2020", "height"])
+
+    assert len(schema) == 3
+    np.testing.assert_array_equal(schema.field_indices, [3, 4, 2])
+    assert schema.field_names == ("20200101", "D_20200201", "D20200301")
+    np.testing.assert_array_equal(schema.dates, np.array(["2020-01-01", "2020-02-01", "2020-03-01"],
+                                                         dtype="datetime64[D]"))
+
+
+def test_schema_without_date_fields_is_empty():
+    schema = buildDateFieldSchema(["id", "VEL"])
+
+    assert len(schema) == 0
+    assert schema.dates.dtype == np.dtype("datetime64[D]")
+
+
+def test_attributes_are_gathered_in_schema_order():
+    schema = buildDateFieldSchema(["id", "D20200301", "D20200101"])
+
+    values = attributesToFloat([7, 3.0, 1], schema.field_indices)
+
+    assert values.dtype == np.float64
+    np.testing.assert_array_equal(values, [1.0, 3.0])
+
+
+def test_null_attributes_are_nan():
+    values = attributesToFloat([None, _NullVariant(), 2.5, "x"], [0, 1, 2, 3])
+
+    assert np.isnan(values[[0, 1, 3]]).all()
+    assert values[2] == 2.5
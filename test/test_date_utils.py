@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.date_utils import datesFromStrings, datesFromTimeValues
+
+
+def test_dates_from_strings():
+    dates = datesFromStrings(["20200103", "19991231"])
+
+    assert dates.dtype == np.dtype("datetime64[D]")
+    np.testing.assert_array_equal(dates, np.array(["2020-01-03", "1999-12-31"], dtype="datetime64[D]"))
+
+
+def test_dates_from_netcdf_time_values():
+    np.testing.assert_array_equal(
+        datesFromTimeValues([0, 1.5, 366], "days since 2020-1-1 00:00:00"),
+        np.array(["2020-01-01", "2020-01-02", "2021-01-01"], dtype="datetime64[D]"))
+    np.testing.assert_array_equal(
+        datesFromTimeValues([86400 * 2], "seconds since 1970-01-01T00:00:00"),
+        np.array(["1970-01-03"], dtype="datetime64[D]"))
+
+
+def test_unsupported_time_units_return_none():
+    assert datesFromTimeValues([1, 2], "months since 2000-01-01") is None
+    assert datesFromTimeValues([1, 2], None) is None
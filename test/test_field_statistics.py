@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.field_statistics import FieldStatistics, providerMinMax
+
+
+def test_streamed_chunks_match_numpy():
+    rng = np.random.default_rng(0)
+    # chunks with growing ranges force the histogram range to double on both sides
+    chunks = [rng.normal(0, 1, 1000), rng.normal(5, 3, 5000), rng.normal(-20, 1, 200), np.array([np.nan, np.inf])]
+    values = np.concatenate(chunks[:3])
+    statistics = FieldStatistics(bins=4096)
+    for chunk in chunks:
+        statistics.add(chunk)
+
+    assert statistics.count == values.size
+    np.testing.assert_allclose(statistics.mean, values.mean())
+    np.testing.assert_allclose(statistics.std, values.std())
+    assert statistics.min == values.min() and statistics.max == values.max()
+    resolution = (values.max() - values.min()) / 4096 * 4
+    np.testing.assert_allclose(statistics.percentile([2, 50, 98]), np.percentile(values, [2, 50, 98]),
+                               atol=resolution)
+    assert statistics.percentile(0) == values.min() and statistics.percentile(100) == values.max()
+
+
+def test_constant_and_empty_fields():
+    statistics = FieldStatistics()
+    assert np.isnan(statistics.percentile(50))
+    assert np.isnan(statistics.std)
+
+    statistics.add(np.full(10, 3.5))
+    assert statistics.std == 0
+    assert statistics.percentile(2) == 3.5 and statistics.percentile(98) == 3.5
+
+
+class _Null:
+    """NULL attribute value of QGIS, which cannot be converted to float."""
+    def __float__(self):
+        raise TypeError("NULL")
+
+
+def test_provider_without_min_max_falls_back_to_the_values_of_the_features():
+    feature_values = np.array([np.nan, 2.5, -1.0, np.nan, 4.0])  # field with NULL values
+
+    for min_max in (None, (None, None), (_Null(), _Null()), (np.nan, 4.0), ("", "")):
+        assert providerMinMax(min_max) is None
+    # the range is then taken from the streaming statistics of the feature values
+    statistics = FieldStatistics()
+    statistics.add(feature_values)
+    assert (statistics.min, statistics.max) == (-1.0, 4.0)
+
+    assert providerMinMax((-1, 4.0)) == (-1.0, 4.0)
+    assert providerMinMax(("-1.5", "4")) == (-1.5, 4.0)
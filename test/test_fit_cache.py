@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from models.fit_cache import FitCache, fitKey
+
+
+def test_key_depends_on_series_content_and_model():
+    dates = np.datetime64("2020-01-01") + np.arange(10) * 6
+    values = np.arange(10, dtype=float)
+
+    key = fitKey(dates, values, "poly-1")
+    assert key == fitKey(list(dates.astype(object)), values.copy(), "poly-1")
+    assert key != fitKey(dates, values, "poly-2")
+    assert key != fitKey(dates, values, "poly-1", seasonal=True)
+    assert key != fitKey(dates, values, "poly-1", kind="series")
+    changed = values.copy()
+    changed[3] = np.nan
+    assert key != fitKey(dates, changed, "poly-1")
+
+
+def test_key_changes_when_the_data_of_the_same_selection_changes():
+    # the same pixel of a raster layer whose file was rewritten in place
+    dates = np.datetime64("2020-01-01") + np.arange(10) * 6
+    values = np.linspace(-3, 3, 10)
+    rewritten = values.copy()
+    rewritten[-1] += 1e-6
+    matrix = np.column_stack([values, values])
+    rewritten_matrix = np.column_stack([values, rewritten])
+
+    assert fitKey(dates, values, "poly-1") != fitKey(dates, rewritten, "poly-1")
+    assert (fitKey(dates, matrix, "poly-1", kind="series", robust="huber")
+            != fitKey(dates, rewritten_matrix, "poly-1", kind="series", robust="huber"))
+
+
+def test_least_recently_used_fits_are_evicted_and_counted():
+    cache = FitCache(max_size=2)
+    computed = []
+
+    def compute(name):
+        return lambda: computed.append(name) or name
+
+    assert cache.getOrCompute("a", compute("a")) == "a"
+    assert cache.getOrCompute("b", compute("b")) == "b"
+    assert cache.getOrCompute("a", compute("a")) == "a"  # hit, "a" is now the most recently used
+    cache.getOrCompute("c", compute("c"))  # evicts "b"
+    cache.getOrCompute("b", compute("b"))
+
+    assert computed == ["a", "b", "c", "b"]
+    assert cache.stats() == {"hits": 1, "misses": 4, "size": 2, "max_size": 2, "hit_rate": 0.2}
@@ -0,0 +1,124 @@
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.grd_cube import GrdCube, compileGrdCube, findCompiledCube
+
+
+class _ArrayBand:
+    def __init__(self, nodata):
+        self.nodata = nodata
+
+    def GetNoDataValue(self):
+        return self.nodata
+
+
+class _ArrayDataset:
+    """Minimal stand-in for a GDAL VRT dataset backed by a (bands, rows, cols) array."""
+
+    def __init__(self, data, nodata=None):
+        self.data = data
+        self.RasterCount, self.RasterYSize, self.RasterXSize = data.shape
+        self.nodata = nodata
+
+    def GetRasterBand(self, i):
+        return _ArrayBand(self.nodata)
+
+    def GetGeoTransform(self):
+        return (100.0, 10.0, 0.0, 500.0, 0.0, -10.0)
+
+    def GetProjection(self):
+        return ""
+
+    def ReadAsArray(self, x_off, y_off, x_count, y_count):
+        return self.data[:, y_off:y_off + y_count, x_off:x_off + x_count].copy()
+
+
+class _Stack:
+    def __init__(self, directory, data, nodata=None):
+        self.directory = str(directory)
+        self.dataset = _ArrayDataset(data, nodata=nodata)
+        self.band_names = [f"D202001{day:02d}" for day in range(1, data.shape[0] + 1)]
+        self.signature = tuple((os.path.join(self.directory, f"{name[1:]}_disp.grd"), 1, 2)
+                               for name in self.band_names)
+
+    def readWindow(self, x_off, y_off, x_count, y_count):
+        return self.dataset.ReadAsArray(x_off, y_off, x_count, y_count)
+
+
+def _data(bands=4, rows=11, cols=13):
+    return np.arange(bands * rows * cols, dtype=np.float32).reshape(bands, rows, cols)
+
+
+def test_compiled_cube_pixel_reads_match_stack(tmp_path):
+    data = _data()
+    stack = _Stack(tmp_path, data)
+
+    header_path = compileGrdCube(stack, block_size=4, memory_limit=0)
+    cube = GrdCube(header_path)
+
+    for px, py in [(0, 0), (12, 10), (5, 7), (3, 4)]:
+        np.testing.assert_array_equal(cube.readPixel(px, py), data[:, py, px])
+    np.testing.assert_array_equal(cube.dates, np.arange('2020-01-01', '2020-01-05', dtype='datetime64[D]'))
+
+
+def test_compiled_cube_window_reads_span_blocks(tmp_path):
+    data = _data()
+    header_path = compileGrdCube(_Stack(tmp_path, data), block_size=4)
+    cube = GrdCube(header_path)
+
+    np.testing.assert_array_equal(cube.readWindow(2, 3, 9, 6), data[:, 3:9, 2:11])
+
+
+def test_compiled_cube_replaces_nodata_with_nan(tmp_path):
+    data = _data()
+    data[1, 2, 3] = -9999
+    cube = GrdCube(compileGrdCube(_Stack(tmp_path, data, nodata=-9999), block_size=4))
+
+    assert np.isnan(cube.readPixel(3, 2)[1])
+
+
+def test_pixel_from_point_uses_geotransform(tmp_path):
+    cube = GrdCube(compileGrdCube(_Stack(tmp_path, _data()), block_size=4))
+
+    assert cube.pixelFromPoint(100.0, 500.0) == (0, 0)
+    assert cube.pixelFromPoint(125.0, 455.0) == (2, 4)
+    assert cube.pixelFromPoint(99.0, 500.0) == (None, None)
+
+
+def test_find_compiled_cube_ignores_cube_from_other_files(tmp_path):
+    stack = _Stack(tmp_path, _data())
+    compileGrdCube(stack, block_size=4)
+
+    assert findCompiledCube(str(tmp_path), stack.signature) is not None
+    changed_signature = stack.signature[:-1] + ((stack.signature[-1][0], 5, 2),)
+    assert findCompiledCube(str(tmp_path), changed_signature) is None
+
+
+def test_cancelled_compilation_leaves_no_cube(tmp_path):
+    stack = _Stack(tmp_path, _data())
+
+    assert compileGrdCube(stack, block_size=4, progress_callback=lambda progress: False) == ""
+    assert findCompiledCube(str(tmp_path)) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_compilation_removes_the_partial_cube(tmp_path):
+    stack = _Stack(tmp_path, _data())
+    reads = []
+
+    def readWindow(x_off, y_off, x_count, y_count):
+        if reads:
+            raise IOError("read error")
+        reads.append(1)
+        return stack.dataset.ReadAsArray(x_off, y_off, x_count, y_count)
+    stack.readWindow = readWindow
+
+    with pytest.raises(IOError):
+        compileGrdCube(stack, block_size=4, memory_limit=0)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.layer_capabilities import LayerCapabilityCache
+
+
+class _Signal:
+    def __init__(self):
+        self.slots = []
+
+    def connect(self, slot):
+        self.slots.append(slot)
+
+    def emit(self, *args):
+        for slot in self.slots:
+            slot(*args)
+
+
+class _Layer:
+    def __init__(self, layer_id, source):
+        self._id = layer_id
+        self._source = source
+        self.willBeDeleted = _Signal()
+        self.dataChanged = _Signal()
+
+    def id(self):
+        return self._id
+
+    def source(self):
+        return self._source
+
+    def type(self):
+        return 1
+
+
+def test_capabilities_are_reused_until_the_file_changes(tmp_path):
+    file_path = tmp_path / "vel.grd"
+    file_path.write_bytes(b"1")
+    layer = _Layer("vel", str(file_path))
+    cache = LayerCapabilityCache()
+
+    capabilities = cache.get(layer, str(file_path))
+    capabilities.grd_status = (True, "")
+    assert cache.get(layer, str(file_path)).grd_status == (True, "")
+
+    (tmp_path / "20200101_disp.grd").write_bytes(b"1")
+    assert cache.get(layer, str(file_path)).grd_status is None
+
+
+def test_capabilities_are_invalidated_by_layer_signals(tmp_path):
+    layer = _Layer("vel", str(tmp_path / "vel.grd"))
+    cache = LayerCapabilityCache()
+
+    cache.get(layer, layer.source()).grd_status = (True, "")
+    layer.dataChanged.emit()
+    assert cache.get(layer, layer.source()).grd_status is None
+
+    cache.get(layer, layer.source()).grd_status = (True, "")
+    layer.willBeDeleted.emit()
+    assert len(cache) == 0
+    assert len(layer.willBeDeleted.slots) == 1
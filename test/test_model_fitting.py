@@ -0,0 +1,129 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+from scipy.optimize import curve_fit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.layer_utils.batch_fit import chunkRows, fitLayerTimeSeries  # noqa: E402
+from src.model_fitting import (  # noqa: E402
+    FittingModels, modelAnnual, modelPoly1, modelPoly2, modelPoly3,
+)
+
+
+def _series(num_dates=80, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64("2017-03-01") + np.sort(rng.choice(2500, num_dates, replace=False))
+    fitting = FittingModels(dates, np.zeros(num_dates))
+    x = fitting.ordinal_dates
+    y = 3 - 0.01 * (x - x[0]) + 4 * np.sin(x * 2 * np.pi / 365.25 + 1) + rng.normal(0, 1, num_dates)
+    y[[4, 17]] = np.nan
+    return dates, y
+
+
+def test_polynomial_fits_match_curve_fit():
+    dates, y = _series()
+    fitting = FittingModels(dates, y)
+    mask = fitting.mask
+    x = fitting.ordinal_dates
+    years = (x - x[mask].mean()) / 365.25
+
+    for name, model in (("poly-1", modelPoly1), ("poly-2", modelPoly2), ("poly-3", modelPoly3)):
+        fit_y, model_x, model_y = fitting.fit(model=name)
+        popt, pcov = curve_fit(model, years[mask], y[mask])
+        np.testing.assert_allclose(fitting.result.parameters, popt, rtol=1e-6, atol=1e-6)
+        np.testing.assert_allclose(fitting.result.covariance, pcov, rtol=1e-5, atol=1e-8)
+        np.testing.assert_allclose(fit_y, model(years, *popt), atol=1e-6)
+        assert len(model_x) == len(model_y) == 100
+
+    velocity = FittingModels(dates, y).fitVelocity()
+    popt, _ = curve_fit(modelPoly1, x[mask], y[mask])
+    np.testing.assert_allclose(velocity, popt[1] * 365.25, rtol=1e-6)
+
+
+def test_seasonal_terms_are_fitted_jointly_with_the_polynomial():
+    dates, y = _series(seed=1)
+    fitting = FittingModels(dates, y)
+    mask = fitting.mask
+    x = fitting.ordinal_dates
+    years = (x - x[mask].mean()) / 365.25
+
+    fit_y, _, _ = fitting.fit(model="poly-1", seasonal=True)
+
+    def joint(index, a, b, c, d):
+        index = index.astype(int)
+        return modelPoly1(years[index], a, b) + modelAnnual(x[index], c, d)
+
+    popt, _ = curve_fit(joint, np.flatnonzero(mask).astype(float), y[mask])
+    np.testing.assert_allclose(fitting.result.parameters, popt, rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(fit_y, joint(np.arange(len(x)).astype(float), *popt), atol=1e-5)
+
+
+def test_polygon_series_are_fitted_at_once():
+    dates, y = _series(seed=2)
+    rng = np.random.default_rng(2)
+    values = y[:, np.newaxis] + np.outer(np.arange(len(dates)), rng.normal(0, 0.01, 300))
+    values[rng.random(values.shape) < 0.02] = np.nan
+    fitting = FittingModels(list(dates.astype(object)), y)
+
+    results, summary = fitting.fitSeries(values, model="poly-1")
+
+    for column in (0, 150, 299):
+        expected = FittingModels(dates, values[:, column]).fitVelocity()
+        np.testing.assert_allclose(results["velocity"][column], expected, rtol=1e-6)
+    assert summary["count"] == 300
+    np.testing.assert_allclose(summary["median"], np.median(results["velocity"]))
+    np.testing.assert_allclose(summary["iqr"], np.subtract(*np.percentile(results["velocity"], [75, 25])))
+
+
+def test_polygon_series_are_fitted_in_chunks_of_the_memory_limit():
+    dates, y = _series(seed=5)
+    rng = np.random.default_rng(5)
+    values = (y[:, np.newaxis] + rng.normal(0, 1, (len(dates), 2500))).astype(np.float32)
+    assert chunkRows(len(dates), memory_limit=1, robust=True) < values.shape[1]
+
+    for robust in (None, "huber"):
+        results, summary = FittingModels(dates, y).fitSeries(values, model="poly-1", seasonal=True, robust=robust,
+                                                             memory_limit=1)
+        expected = fitLayerTimeSeries(dates, values.T, degree=1, seasonal=True, chunk_size=values.shape[1],
+                                      robust=robust)
+        for name in expected:
+            np.testing.assert_allclose(results[name], expected[name], rtol=1e-6, atol=1e-9)
+        assert summary["count"] == values.shape[1]
+
+
+def test_velocity_uncertainty_and_bands_follow_the_parameter_covariance():
+    dates, y = _series(seed=3)
+    fitting = FittingModels(dates, y)
+    mask = fitting.mask
+    x = fitting.ordinal_dates
+
+    model_fit = fitting.fitWithUncertainty(model="poly-1")
+
+    popt, pcov = curve_fit(modelPoly1, x[mask] - x[mask].mean(), y[mask])
+    np.testing.assert_allclose(model_fit.velocity, popt[1] * 365.25, rtol=1e-6)
+    np.testing.assert_allclose(model_fit.velocity_std, np.sqrt(pcov[1, 1]) * 365.25, rtol=1e-5)
+
+    # the confidence band is narrowest at the mean date and the prediction band adds the residual variance
+    grid = np.linspace(x.min(), x.max(), 100)
+    expected = np.sqrt(pcov[0, 0] + (grid - x[mask].mean()) ** 2 * pcov[1, 1])
+    np.testing.assert_allclose(model_fit.confidence_std, expected, rtol=1e-5)
+    residual_variance = np.sum((y[mask] - modelPoly1(x[mask] - x[mask].mean(), *popt)) ** 2) / (mask.sum() - 2)
+    np.testing.assert_allclose(model_fit.prediction_std ** 2 - model_fit.confidence_std ** 2, residual_variance,
+                               rtol=1e-6)
+    assert FittingModels(dates, y).fitWithUncertainty(model="exp").confidence_std is None
+
+
+def test_robust_fit_flags_outliers_and_matches_least_squares_without_them():
+    dates, y = _series(seed=4)
+    y_outliers = y.copy()
+    y_outliers[[10, 30, 50]] += 40
+
+    model_fit = FittingModels(dates, y_outliers).fitWithUncertainty(model="poly-1", seasonal=True, robust="huber")
+    assert model_fit.outliers.dtype == bool and len(model_fit.outliers) == len(y)
+    assert model_fit.outliers[[10, 30, 50]].all() and not model_fit.outliers[[4, 17]].any()
+    least_squares = FittingModels(dates, y).fitWithUncertainty(model="poly-1", seasonal=True)
+    np.testing.assert_allclose(model_fit.velocity, least_squares.velocity, atol=3 * least_squares.velocity_std)
+    assert abs(model_fit.velocity_std / least_squares.velocity_std - 1) < 0.3
+    assert FittingModels(dates, y).fitWithUncertainty(model="poly-1").outliers is None
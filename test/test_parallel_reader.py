@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("osgeo")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.parallel_reader import ParallelStackReader  # noqa: E402
+
+
+class _Band:
+    def __init__(self, value, fail=False):
+        self.value = value
+        self.fail = fail
+
+    def ReadAsArray(self, x_off, y_off, x_count, y_count, buf_obj=None):
+        if self.fail:
+            return None
+        buf_obj[...] = self.value
+        return buf_obj
+
+    def GetNoDataValue(self):
+        return None
+
+
+def _reader(bands, workers):
+    reader = ParallelStackReader([f"file_{i}.grd" for i in range(len(bands))], workers=workers)
+    reader._band = lambda chunk_index, file_index: bands[file_index]
+    return reader
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_failed_band_read_raises_instead_of_returning_uninitialized_values(workers):
+    reader = _reader([_Band(1.0), _Band(2.0), _Band(3.0)], workers)
+    np.testing.assert_array_equal(reader.readPixel(0, 0), [1.0, 2.0, 3.0])
+
+    reader = _reader([_Band(1.0), _Band(2.0, fail=True), _Band(3.0)], workers)
+    with pytest.raises(IOError, match="file_1.grd"):
+        reader.readWindow(0, 0, 2, 2)
+    reader.close()
+
+
+def test_closed_reader_raises_instead_of_reopening_the_files():
+    reader = _reader([_Band(1.0), _Band(2.0)], 2)
+    reader.close()
+    with pytest.raises(IOError, match="closed"):
+        reader.readPixel(0, 0)
@@ -0,0 +1,90 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.point_in_polygon import pointsInPolygon, pointsInPolygons
+from layer_utils.vector_columns import VectorColumns
+
+# The expected results are those of QgsGeometry.intersects (GEOS), which includes points on the boundary.
+
+SQUARE_WITH_HOLE = [
+    [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)],
+    [(4, 4), (6, 4), (6, 6), (4, 6), (4, 4)],
+]
+
+# comb with horizontal edges at the heights of the test points, so that rays run along edges and through vertices
+COMB = [[(0, 0), (6, 0), (6, 4), (5, 4), (5, 2), (4, 2), (4, 4), (3, 4), (3, 2), (2, 2), (2, 4), (0, 4)]]
+
+
+def _check(rings_or_polygons, cases, multi=False):
+    points = np.array([point for point, _ in cases], dtype=np.float64)
+    expected = np.array([inside for _, inside in cases])
+    if multi:
+        result = pointsInPolygons(points[:, 0], points[:, 1], rings_or_polygons)
+    else:
+        result = pointsInPolygon(points[:, 0], points[:, 1], rings_or_polygons)
+    for (point, inside), found in zip(cases, result):
+        assert found == inside, f"point {point}: expected {inside}, found {found}"
+
+
+def test_square_with_hole():
+    _check(SQUARE_WITH_HOLE, [
+        ((1, 1), True),
+        ((5, 5), False),     # inside the hole
+        ((4, 5), True),      # on the hole boundary
+        ((6, 6), True),      # on a hole vertex
+        ((0, 5), True),      # on the exterior boundary
+        ((10, 10), True),    # on an exterior vertex
+        ((5, 10), True),     # on a horizontal edge
+        ((11, 5), False),
+        ((-1, 4), False),    # ray through the hole vertices
+        ((2, 4), True),      # ray along the bottom edge of the hole
+        ((5, 0.0000001), True),
+        ((5, -0.0000001), False),
+    ])
+
+
+def test_comb_with_rays_along_edges_and_through_vertices():
+    _check(COMB, [
+        ((1, 2), True),      # ray along the horizontal edges of the teeth
+        ((2.5, 2), True),    # on a horizontal edge
+        ((2.5, 3), False),   # in a gap between two teeth
+        ((3.5, 3), True),
+        ((4.5, 3), False),
+        ((-1, 2), False),
+        ((-1, 4), False),    # ray along the top edges
+        ((1, 4), True),      # on a top edge
+        ((2.5, 4), False),   # above a gap, level with the tops of the teeth
+        ((3, 3), True),      # on a vertical edge
+        ((6, 0), True),
+        ((7, 2), False),
+    ])
+
+
+def test_multi_polygon_and_diagonal_edges():
+    triangle = [[(20, 0), (30, 0), (20, 10)]]
+    _check([SQUARE_WITH_HOLE, triangle], [
+        ((1, 1), True),
+        ((5, 5), False),
+        ((21, 1), True),
+        ((25, 5), True),     # on the diagonal edge
+        ((25.5, 5), False),
+        ((15, 5), False),
+    ], multi=True)
+
+
+def test_columns_select_rows_with_and_without_point_index():
+    rng = np.random.default_rng(0)
+    x = np.concatenate((rng.uniform(-2, 12, 5000), np.arange(11.0), np.full(11, 4.0)))
+    y = np.concatenate((rng.uniform(-2, 12, 5000), np.full(11, 10.0), np.arange(11.0)))
+    feature_ids = np.arange(len(x)) + 100
+    columns = VectorColumns(feature_ids, x, y, np.zeros((len(x), 1), dtype=np.float32), None)
+    expected = np.flatnonzero(pointsInPolygon(x, y, SQUARE_WITH_HOLE))
+
+    np.testing.assert_array_equal(columns.rowsInPolygons([SQUARE_WITH_HOLE]), expected)
+    columns.buildPointIndex()
+    np.testing.assert_array_equal(columns.rowsInPolygons([SQUARE_WITH_HOLE]), expected)
+    assert len(columns.rowsInPolygons([])) == 0
@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("osgeo")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from osgeo import ogr, osr  # noqa: E402
+
+from layer_utils.point_layer import SOURCE_ID_FIELD, writePointGeoPackage  # noqa: E402
+
+
+def _crsWkt():
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(32633)
+    return srs.ExportToWkt()
+
+
+def test_columns_are_written_in_chunks_with_null_values_and_geometries(tmp_path):
+    file_path = str(tmp_path / "points.gpkg")
+    feature_ids = np.array([10, 11, 12, 13, 14], dtype=np.int64)
+    x = np.array([1.0, 2.0, np.nan, 4.0, 5.0])
+    y = np.array([6.0, 7.0, 8.0, 9.0, 10.0])
+    velocity = np.array([-1.5, np.nan, 0.0, 2.5, 3.0], dtype=np.float32)
+    progress = []
+
+    written = writePointGeoPackage(file_path, _crsWkt(), feature_ids, x, y, {"velocity": velocity},
+                                   progress_callback=progress.append, chunk_size=2)
+
+    assert written
+    assert progress == [40, 80, 100]
+    dataset = ogr.Open(file_path)
+    layer = dataset.GetLayer(0)
+    assert layer.GetSpatialRef().GetAuthorityCode(None) == "32633"
+    rows = []
+    for feature in layer:
+        geometry = feature.GetGeometryRef()
+        rows.append((feature.GetField(SOURCE_ID_FIELD), feature.GetField("velocity"),
+                     None if geometry is None else (geometry.GetX(), geometry.GetY())))
+    assert rows == [(10, -1.5, (1.0, 6.0)), (11, None, (2.0, 7.0)), (12, 0.0, None), (13, 2.5, (4.0, 9.0)),
+                    (14, 3.0, (5.0, 10.0))]
+    assert layer.GetExtent() == (1.0, 5.0, 6.0, 10.0)
+
+
+def test_writing_stops_when_canceled(tmp_path):
+    file_path = str(tmp_path / "points.gpkg")
+    ids = np.arange(6)
+    values = np.arange(6, dtype=float)
+
+    written = writePointGeoPackage(file_path, _crsWkt(), ids, values, values, {"velocity": values},
+                                   progress_callback=lambda value: False, chunk_size=2)
+
+    assert not written
+    assert ogr.Open(file_path).GetLayer(0).GetFeatureCount() == 0
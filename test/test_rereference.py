@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.layer_utils.batch_fit import fitLayerTimeSeries  # noqa: E402
+from src.layer_utils.rereference import referenceSeries, rereferencedVelocity  # noqa: E402
+
+
+def _series(num_rows=50, num_dates=30):
+    rng = np.random.default_rng(3)
+    dates = np.datetime64("2019-01-03") + np.sort(rng.choice(1500, num_dates, replace=False))
+    values = rng.normal(size=(num_rows, num_dates)).astype(np.float32)
+    return dates, values
+
+
+def _years(dates):
+    days = dates.astype("datetime64[D]").astype(np.int64).astype(np.float64)
+    return (days - days.mean()) / 365.25
+
+
+def test_velocity_matches_polyfit_with_missing_values():
+    dates, values = _series()
+    values[3, [0, 5, 7]] = np.nan
+    values[4, 1:] = np.nan
+    years = _years(dates)
+
+    velocity = rereferencedVelocity(dates, values, np.zeros(len(dates)))
+
+    for row in (0, 3, 10):
+        finite = np.isfinite(values[row])
+        expected = np.polyfit(years[finite], values[row, finite].astype(np.float64), 1)[0]
+        np.testing.assert_allclose(velocity[row], expected, rtol=1e-9)
+    assert np.isnan(velocity[4])
+
+
+def test_rereferenced_velocity_is_relative_to_the_reference():
+    dates, values = _series()
+    reference_values = values[[7, 8]].T  # polygon reference with two series, shape (dates, series)
+    reference = referenceSeries(reference_values)
+
+    velocity = rereferencedVelocity(dates, values, reference, chunk_size=16)
+
+    years = _years(dates)
+    expected = np.polyfit(years, (values - reference).T, 1)[0]
+    np.testing.assert_allclose(velocity, expected, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(velocity[7], -velocity[8], atol=1e-9)
+
+
+def test_velocity_matches_the_layer_fits():
+    dates, values = _series()
+    values[[2, 9], 4] = np.nan
+
+    velocity = rereferencedVelocity(dates, values, np.zeros(len(dates)))
+
+    np.testing.assert_allclose(velocity, fitLayerTimeSeries(dates, values)["velocity"], rtol=1e-9)
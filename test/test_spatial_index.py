@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.spatial_index import GridIndex
+
+
+def _points(num_points=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    # dense clusters and sparse background, like persistent scatterers
+    x = np.concatenate((rng.normal(100.0, 0.5, num_points // 2), rng.uniform(0.0, 1000.0, num_points // 2)))
+    y = np.concatenate((rng.normal(200.0, 0.5, num_points // 2), rng.uniform(0.0, 500.0, num_points // 2)))
+    return x, y
+
+
+def test_nearest_and_radius_match_brute_force():
+    x, y = _points()
+    ids = np.arange(len(x)) * 3 + 7
+    index = GridIndex(x, y, ids=ids)
+
+    for query_x, query_y in [(100.2, 199.9), (500.0, 250.0), (-50.0, 900.0), (1000.0, 0.0)]:
+        distances = np.hypot(x - query_x, y - query_y)
+        order = np.argsort(distances)
+
+        found_ids, found_distances = index.nearest(query_x, query_y, k=5)
+        np.testing.assert_array_equal(found_ids, ids[order[:5]])
+        np.testing.assert_allclose(found_distances, distances[order[:5]])
+
+        found_ids, _ = index.radius(query_x, query_y, 25.0)
+        np.testing.assert_array_equal(np.sort(found_ids), np.sort(ids[distances <= 25.0]))
+
+
+def test_nearest_respects_max_distance_and_empty_index():
+    index = GridIndex([0.0, 10.0], [0.0, 0.0])
+
+    ids, _ = index.nearest(4.0, 0.0, k=1, max_distance=1.0)
+    assert len(ids) == 0
+    ids, distances = index.nearest(4.0, 0.0, k=3)
+    np.testing.assert_array_equal(ids, [0, 1])
+    np.testing.assert_allclose(distances, [4.0, 6.0])
+
+    assert len(GridIndex([], []).nearest(0.0, 0.0)[0]) == 0
+
+
+def test_edits_are_found_before_and_after_rebuild():
+    x, y = _points(500)
+    index = GridIndex(x, y)
+
+    index.remove([0, 1])
+    index.insert([1, 9999], [500.0, 501.0], [250.0, 250.0])
+    assert len(index) == 500
+    ids, _ = index.nearest(500.0, 250.0, k=2)
+    np.testing.assert_array_equal(ids, [1, 9999])
+
+    index.rebuild()
+    ids, _ = index.nearest(500.0, 250.0, k=2)
+    np.testing.assert_array_equal(ids, [1, 9999])
+    assert 0 not in index.radius(x[0], y[0], 1e-9)[0]
+
+    # many edits trigger rebuilding the grid
+    index.remove(np.arange(2, 300))
+    assert len(index) == 202
+    ids, _ = index.radius(500.0, 250.0, 2.0)
+    np.testing.assert_array_equal(ids, [1, 9999])
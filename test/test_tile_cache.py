@@ -0,0 +1,86 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.tile_cache import TileCache
+
+
+def _tile(value, size=1024):
+    return np.full(size // 8, value, dtype=np.float64)  # size bytes
+
+
+def test_least_recently_used_tile_is_evicted_when_budget_is_exceeded():
+    cache = TileCache(memory_limit=3 * 1024 / (1024 * 1024))
+    for key in "abc":
+        cache.put(key, _tile(1))
+    cache.get("a")  # "b" is now the least recently used tile
+    cache.put("d", _tile(1))
+
+    assert "b" not in cache
+    assert all(key in cache for key in "acd")
+    assert cache.nbytes == 3 * 1024
+
+
+def test_get_tile_counts_hits_and_misses_and_reads_once():
+    cache = TileCache()
+    reads = []
+
+    def read():
+        reads.append(1)
+        return _tile(5)
+
+    cache.getTile(("stack", 0, 0), read)
+    tile = cache.getTile(("stack", 0, 0), read)
+
+    assert len(reads) == 1
+    assert tile[0] == 5
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_hits_and_misses_of_concurrent_requests_are_all_counted():
+    cache = TileCache()
+    cache.put("a", _tile(1))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(cache.get, ["a", "b"] * 2000))
+
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 2000
+
+
+def test_tile_larger_than_budget_is_returned_but_not_cached():
+    cache = TileCache(memory_limit=512 / (1024 * 1024))
+
+    tile = cache.getTile("big", lambda: _tile(1))
+
+    assert tile is not None
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+
+
+def test_tile_window_is_clipped_to_raster_size():
+    cache = TileCache(tile_size=128)
+
+    assert cache.tileIndex(300, 130) == (1, 2)
+    assert cache.tileWindow(1, 2, 300, 200) == (256, 128, 44, 72)
+
+
+def test_read_points_reads_each_tile_once():
+    cache = TileCache(tile_size=4)
+    data = np.arange(3 * 10 * 9, dtype=np.float32).reshape(3, 10, 9)
+    windows = []
+
+    def read(x_off, y_off, x_count, y_count):
+        windows.append((x_off, y_off, x_count, y_count))
+        return data[:, y_off:y_off + y_count, x_off:x_off + x_count]
+
+    px = np.array([0, 3, 5, 8, 1])
+    py = np.array([0, 2, 9, 9, 1])
+    values = cache.readPoints("band", read, px, py, 9, 10, band_index=2)
+
+    np.testing.assert_array_equal(values, data[2, py, px])
+    assert sorted(windows) == [(0, 0, 4, 4), (4, 8, 4, 2), (8, 8, 1, 2)]
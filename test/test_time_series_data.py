@@ -38,6 +38,25 @@ def test_build_time_series_data_sorts_dates_and_reorders_values():
     np.testing.assert_allclose(series.plot_values, [0.9, 1.8, 2.7])
 
 
+def test_datetime64_dates_are_sorted_and_formatted():
+    dates = np.array(["2020-01-03", "2020-01-01", "2020-01-02"], dtype="datetime64[D]")
+    series = buildTimeSeriesData(dates=dates, ts_values=np.array([3.0, 1.0, 2.0]), ref_values=0)
+
+    assert series.dates.dtype == np.dtype("datetime64[D]")
+    assert series.dateStrings() == ["2020-01-01", "2020-01-02", "2020-01-03"]
+    np.testing.assert_allclose(series.plot_values, [1.0, 2.0, 3.0])
+
+
+def test_ts_bounds_replace_min_max_of_summarized_series():
+    series = buildTimeSeriesData(dates=_dates(), ts_values=[3.0, 1.0, 2.0], ref_values=[0.3, 0.1, 0.2],
+                                 ts_bounds=[[2.0, 4.0], [0.0, 2.0], [1.0, 3.0]])
+
+    np.testing.assert_allclose(series.plot_values, [0.9, 1.8, 2.7])
+    np.testing.assert_allclose(series.min_plot_values, [-0.1, 0.8, 1.7])
+    np.testing.assert_allclose(series.max_plot_values, [1.9, 2.8, 3.7])
+    assert series.plot_multiple_values is None
+
+
 def test_single_series_with_scalar_zero_reference():
     series = buildTimeSeriesData(dates=_dates(), ts_values=[3.0, 1.0, 2.0], ref_values=0)
 
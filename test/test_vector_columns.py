@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.vector_columns import VectorColumns, columnsBytes
+
+
+def _columns():
+    feature_ids = np.array([12, 3, 7, 40])
+    x = np.array([0.0, 1.0, 2.0, 10.0])
+    y = np.array([0.0, 1.0, 0.0, 10.0])
+    values = np.arange(8, dtype=np.float32).reshape(4, 2)
+    dates = np.array(["2020-01-01", "2020-01-13"], dtype="datetime64[D]")
+    return VectorColumns(feature_ids, x, y, values, dates)
+
+
+def test_values_are_looked_up_by_feature_id():
+    columns = _columns()
+
+    np.testing.assert_array_equal(columns.rowsOfIds([7, 12, 5, 41]), [2, 0, -1, -1])
+    values = columns.valuesOfIds([40, 5])
+    np.testing.assert_array_equal(values[0], [6.0, 7.0])
+    assert np.isnan(values[1]).all()
+
+
+def test_rectangle_and_point_index_queries():
+    columns = _columns()
+
+    np.testing.assert_array_equal(columns.rowsInRectangle(0.0, 0.0, 2.0, 1.0), [0, 1, 2])
+    ids, _ = columns.buildPointIndex().nearest(1.8, 0.1)
+    np.testing.assert_array_equal(ids, [7])
+
+
+def test_size_estimate_matches_the_arrays():
+    columns = _columns()
+
+    columns.buildPointIndex()
+
+    assert columnsBytes(4, 2, itemsize=4) >= columns.nbytes
+    assert columnsBytes(4, 200, itemsize=4) - columnsBytes(4, 100, itemsize=4) == 4 * 100 * 4
@@ -0,0 +1,86 @@
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.vector_columns import VectorColumns
+from layer_utils.vector_sidecar import SidecarCache, layerDataFiles, sidecarKey
+
+
+def _columns(num_features=100, num_dates=20):
+    rng = np.random.default_rng(0)
+    feature_ids = rng.permutation(num_features) + 1
+    values = rng.normal(size=(num_features, num_dates)).astype(np.float32)
+    dates = np.datetime64("2020-01-01") + np.arange(num_dates) * 12
+    return VectorColumns(feature_ids, rng.uniform(size=num_features), rng.uniform(size=num_features), values, dates)
+
+
+def test_saved_columns_are_memory_mapped_on_load(tmp_path):
+    layer_file = tmp_path / "points.gpkg"
+    layer_file.write_bytes(b"layer")
+    cache = SidecarCache(str(tmp_path / "cache"))
+    key = sidecarKey(f"{layer_file}|layername=points", [str(layer_file)], subset_string="VEL > 0")
+    columns = _columns()
+
+    assert cache.load(key) is None
+    cache.save(key, columns)
+    loaded = cache.load(key)
+
+    assert isinstance(loaded.values, np.memmap)
+    np.testing.assert_array_equal(loaded.values, columns.values)
+    np.testing.assert_array_equal(loaded.dates, columns.dates)
+    np.testing.assert_array_equal(loaded.valuesOfIds([5, 7]), columns.valuesOfIds([5, 7]))
+    assert cache.load(sidecarKey(f"{layer_file}|layername=points", [str(layer_file)])) is None
+
+
+def test_changed_layer_file_invalidates_the_entry(tmp_path):
+    layer_file = tmp_path / "points.shp"
+    layer_file.write_bytes(b"layer")
+    cache = SidecarCache(str(tmp_path / "cache"))
+    cache.save(sidecarKey(str(layer_file), [str(layer_file)]), _columns())
+
+    layer_file.write_bytes(b"edited layer")
+    os.utime(layer_file, ns=(0, 10 ** 18))
+
+    assert cache.load(sidecarKey(str(layer_file), [str(layer_file)])) is None
+
+
+def test_style_and_metadata_files_do_not_change_the_key(tmp_path):
+    layer_file = tmp_path / "points.shp"
+    for extension in (".shp", ".dbf", ".shx", ".prj"):
+        layer_file.with_suffix(extension).write_bytes(b"layer")
+    assert layerDataFiles(str(layer_file)) == [str(layer_file.with_suffix(extension))
+                                               for extension in (".shp", ".dbf", ".shx", ".prj", ".cpg")]
+    key = sidecarKey(str(layer_file), layerDataFiles(str(layer_file)))
+
+    for name in ("points.qml", "points.qmd", "points.shp.aux.xml", "points_export.csv"):
+        (tmp_path / name).write_bytes(b"style")
+    assert sidecarKey(str(layer_file), layerDataFiles(str(layer_file))) == key
+
+    layer_file.with_suffix(".dbf").write_bytes(b"edited attributes")
+    os.utime(layer_file.with_suffix(".dbf"), ns=(0, 10 ** 18))
+    assert sidecarKey(str(layer_file), layerDataFiles(str(layer_file))) != key
+
+    geopackage = str(tmp_path / "points.gpkg")
+    assert layerDataFiles(geopackage) == [geopackage, geopackage + "-wal"]
+
+
+def test_least_recently_used_entries_are_deleted(tmp_path):
+    cache = SidecarCache(str(tmp_path / "cache"))
+    keys = [sidecarKey(f"layer{i}", []) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.save(key, _columns())
+        header = os.path.join(cache.entryDirectory(key), "header.json")
+        os.utime(header, ns=(i * 10 ** 9, i * 10 ** 9))
+    entry_size = cache.entries()[0][1]
+
+    cache.load(keys[0])  # most recently used now
+    cache.size_limit = 2 * entry_size
+    cache.enforceSizeLimit()
+
+    assert cache.load(keys[0]) is not None
+    assert cache.load(keys[1]) is None
+    assert cache.load(keys[2]) is not None
@@ -0,0 +1,89 @@
+import sys
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from layer_utils.zonal_stats import ZonalStatistics, rowsPerBlock, zonalMemoryBudget
+
+
+def _values(bands=3, pixels=20000):
+    values = np.random.default_rng(0).normal(size=(bands, pixels))
+    values[1, :100] = np.nan
+    return values
+
+
+def _addBlocks(statistics, values, blocks=7):
+    for block in np.array_split(values, blocks, axis=1):
+        statistics.add(block)
+    if statistics.needsHistogramPass():
+        for block in np.array_split(values, blocks, axis=1):
+            statistics.addHistogram(block)
+    return statistics.result()
+
+
+def test_streamed_statistics_match_numpy():
+    values = _values()
+    result = _addBlocks(ZonalStatistics(3), values)
+
+    np.testing.assert_array_equal(result["count"], np.isfinite(values).sum(axis=1))
+    np.testing.assert_allclose(result["mean"], np.nanmean(values, axis=1))
+    np.testing.assert_allclose(result["min"], np.nanmin(values, axis=1))
+    np.testing.assert_allclose(result["max"], np.nanmax(values, axis=1))
+    for q in (5, 50, 95):
+        np.testing.assert_allclose(result["percentiles"][q], np.nanpercentile(values, q, axis=1))
+
+
+def test_histogram_percentiles_for_zones_larger_than_memory_limit():
+    values = _values()
+    statistics = ZonalStatistics(3, memory_limit=0.01, bins=1024)
+    result = _addBlocks(statistics, values)
+
+    resolution = (np.nanmax(values, axis=1) - np.nanmin(values, axis=1)) / 1024
+    for q in (5, 50, 95):
+        error = np.abs(result["percentiles"][q] - np.nanpercentile(values, q, axis=1))
+        assert np.all(error <= 2 * resolution)
+    np.testing.assert_allclose(result["mean"], np.nanmean(values, axis=1))
+
+
+def test_dates_without_valid_values_are_nan():
+    values = _values()
+    values[2] = np.nan
+    statistics = ZonalStatistics(3)
+    result = _addBlocks(statistics, values)
+
+    assert result["count"][2] == 0
+    assert np.isnan(result["mean"][2]) and np.isnan(result["min"][2]) and np.isnan(result["percentiles"][50][2])
+    assert statistics.num_pixels == values.shape[1]
+
+
+def test_rows_per_block_respects_memory_limit():
+    assert rowsPerBlock(1000, 256, memory_limit=1) == 1
+    assert rowsPerBlock(1000, 100, memory_limit=4) == 10
+    assert rowsPerBlock(10**7, 1000, memory_limit=1) == 1
+
+
+def test_blocks_and_kept_values_stay_within_the_total_memory_limit():
+    x_count, num_bands, memory_limit = 200, 40, 4
+    block_rows, values_limit = zonalMemoryBudget(x_count, num_bands, memory_limit)
+    rng = np.random.default_rng(1)
+    statistics = ZonalStatistics(num_bands, memory_limit=values_limit)
+
+    def blocks():
+        for _ in range(12):
+            # read a float32 block and mask the pixels of the zone, as computePolygonStatistics
+            block = rng.normal(size=(num_bands, block_rows, x_count)).astype(np.float32)
+            yield block[:, np.ones((block_rows, x_count), dtype=bool)]
+
+    tracemalloc.start()
+    for values in blocks():
+        statistics.add(values)
+    assert statistics.needsHistogramPass()
+    for values in blocks():
+        statistics.addHistogram(values)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert peak <= memory_limit * 1024 * 1024